@@ -2,87 +2,425 @@ import cv2
 import mediapipe as mp
 import time
 import math
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
 import numpy as np
 
+NUM_LANDMARKS = 21
+_xyz = operator.attrgetter("x", "y", "z")
+
+# A serialised NormalizedLandmark with x, y and z set: 0a 0f (message, 15
+# bytes), then 0d <x f32> 15 <y f32> 1d <z f32>. Reading attributes off the
+# protobuf objects costs far more than serialising them.
+_LM_WIRE = 17
+_LM_TAGS = ((0, b"\x0a"), (1, b"\x0f"), (2, b"\x0d"), (7, b"\x15"), (12, b"\x1d"))
+
+
+def _wireLandmarks(hands):
+    """(len(hands) * 21, 3) float32 view of the hands' serialised x, y, z, or
+    None if they aren't protobufs in the fixed layout above."""
+    try:
+        raw = b"".join([hand.SerializeToString() for hand in hands])
+    except AttributeError:
+        return None
+    count = len(hands) * NUM_LANDMARKS
+    if len(raw) != count * _LM_WIRE:
+        return None
+    for offset, tag in _LM_TAGS:
+        if raw[offset::_LM_WIRE] != tag * count:
+            return None
+    return np.ndarray((count, 3), dtype="<f4", buffer=raw, offset=3, strides=(_LM_WIRE, 5))
+
+
+def _closeBuiltModel(future):
+    # Done-callback for a graph that was superseded while it loaded
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
 class handDetector:
-    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, trackCon=0.5):
+    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, trackCon=0.5,
+                 outSize=(640, 480), inferSize=None, metrics=None,
+                 motionThreshold=None, maxReuse=5, modelComplexity=1):
         self.mode = mode
         self.maxHands = maxHands
         self.detectionCon = float(detectionCon)  # Ensure it's a float
         self.trackCon = float(trackCon)  # Ensure it's a float
+        self.modelComplexity = modelComplexity  # 0 = lite landmark model, 1 = full
+        # outSize is the (w, h) of the frame findHands returns and landmarks are
+        # mapped to. inferSize, if set, is a smaller (w, h) MediaPipe runs on;
+        # landmarks are normalised so they still land on full-res coordinates.
+        self.outSize = tuple(outSize)
+        self.inferSize = tuple(inferSize) if inferSize else None
+        # Optional pipeline_metrics.PipelineMetrics; findHands records the
+        # "color", "inference" and "landmarks" stages into it
+        self.metrics = metrics
+        # Motion-gated inference cache: when the mean grey-level change inside
+        # the last hand bbox stays below motionThreshold, the previous landmarks
+        # are reused instead of running MediaPipe, for at most maxReuse frames
+        # in a row. None disables the gate. The reference only moves on real
+        # inference, so slow drift can hide under the threshold for a few
+        # frames; callers that track the hand continuously (the cursor) set
+        # motionPaused to force inference on every frame.
+        self.motionThreshold = motionThreshold
+        self.maxReuse = maxReuse
+        self.motionPaused = False
+
+        # Reused destination buffers so findHands doesn't allocate per frame
+        self._outBuf = None
+        self._inferBuf = None
+        self._rgbBuf = None
 
         self.mpHands = mp.solutions.hands
-        self.hands = self.mpHands.Hands(
-            # static_image_mode=self.mode,
-            static_image_mode=True,
+        self.hands = self._createModel()
+        self._graphComplexity = modelComplexity  # Complexity self.hands was built with
+        self._modelBuilder = None  # Single thread that builds replacement graphs
+        self._pendingModel = None  # Future of the graph setModelComplexity asked for
+        self.mpDraw = mp.solutions.drawing_utils
+        self.recorder = None  # Optional landmark_cache.LandmarkRecorder
+        self.tipIds = [4, 8, 12, 16, 20]
+        self._tipIdx = np.array(self.tipIds)
+        # Joint each tip is compared against: thumb uses the joint below (x),
+        # fingers use the joint two below (y)
+        self._refIdx = self._tipIdx - 2
+        self._refIdx[0] = self.tipIds[0] - 1
+
+        # Array-backed landmarks, filled once per frame by findHands:
+        # lmArray[hand, id] = normalised (x, y, z) as MediaPipe reports them,
+        # valid for hand < numHands. This is also what the worker process,
+        # the landmark cache and the recorder exchange.
+        self.lmArray = np.zeros((self.maxHands, NUM_LANDMARKS, 3), dtype=np.float32)
+        self._lmFlat = self.lmArray.reshape(-1)
+        self._lmRows = self.lmArray.reshape(-1, 3)
+        # (w, h) of the frame landmarks map to. float64 so pixels truncate
+        # exactly like the original int(lm.x * w).
+        self._scale = np.ones(2)
+        self._scaleShape = None
+        self.numHands = 0
+        self.handNo = 0  # Hand selected by the last findPosition call
+        self.lmPixels = np.zeros((0, 2), dtype=np.int32)
+        self.lmList = []
+        self.results = None
+        # Pixel landmarks, written by one multiply per frame in _scaleLandmarks:
+        # lmInt[hand, id] = (id, x px, y px). One tolist() of it is every
+        # hand's lmList, and cv2.boundingRect gives a bbox in one call. At 21
+        # points each NumPy call costs as much as a few landmarks of Python,
+        # so the per-frame path is kept to as few calls as possible.
+        self.lmInt = np.zeros((self.maxHands, NUM_LANDMARKS, 3), dtype=np.int32)
+        self.lmInt[:, :, 0] = np.arange(NUM_LANDMARKS)
+        self._lmLists = []
+        self._fingerCache = {}
+        self._bboxCache = {}
+
+        # Tracking statistics
+        self.frameCount = 0      # Frames passed through findHands
+        self.detectionCount = 0  # Frames on which palm detection had to run
+        self.lostCount = 0       # Times a tracked hand was lost (forces re-detection)
+        self.prevHandCount = 0
+
+        # Motion cache state and statistics
+        self._motionRef = None     # Signature of the last inferred frame
+        self._motionRegion = None  # (x0, y0, x1, y1) the signature covers
+        self._reuseAge = 0         # Consecutive frames served from the cache
+        self._inferCost = 0.0      # EWMA of color + inference seconds
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self.cacheSaved = 0.0      # Estimated seconds of inference skipped
+        self.cacheOverhead = 0.0   # Seconds spent computing signatures
+
+    def _createModel(self, modelComplexity=None):
+        # mode=False is tracking mode: palm detection runs once, then the hand is
+        # followed from the previous landmarks' ROI until tracking confidence
+        # drops below trackCon. mode=True re-runs palm detection on every frame.
+        return self.mpHands.Hands(
+            static_image_mode=self.mode,
             max_num_hands=self.maxHands,
+            model_complexity=self.modelComplexity if modelComplexity is None else modelComplexity,
             min_detection_confidence=self.detectionCon,
             min_tracking_confidence=self.trackCon
         )
-        self.mpDraw = mp.solutions.drawing_utils
-        self.tipIds = [4, 8, 12, 16, 20]
+
+    def setModelComplexity(self, modelComplexity):
+        """
+        Swaps between the lite (0) and full (1) landmark model.
+
+        Building and warming up a graph stalls for tens of milliseconds, so
+        the new one is prepared on a background thread; findHands keeps using
+        the current graph and swaps the new one in on the first frame after
+        it is ready.
+        """
+        if modelComplexity == self.modelComplexity:
+            return
+        self.modelComplexity = modelComplexity
+        self._discardPendingModel()
+        if modelComplexity == self._graphComplexity:
+            return  # Switched back before the swap: keep the running graph
+        if self._modelBuilder is None:
+            self._modelBuilder = ThreadPoolExecutor(1, thread_name_prefix="hands-model")
+        self._pendingModel = self._modelBuilder.submit(self._warmModel, modelComplexity)
+
+    def _warmModel(self, modelComplexity):
+        # Builder thread: the graph only loads its models on the first
+        # process() call, so run a blank frame through it before the swap
+        hands = self._createModel(modelComplexity)
+        w, h = self.inferSize or self.outSize
+        hands.process(np.zeros((h, w, 3), dtype=np.uint8))
+        return hands
+
+    @property
+    def modelSwapPending(self):
+        """True while a graph requested by setModelComplexity is still loading."""
+        return self._pendingModel is not None
+
+    def _discardPendingModel(self):
+        future, self._pendingModel = self._pendingModel, None
+        if future is not None and not future.cancel():
+            future.add_done_callback(_closeBuiltModel)  # Closes it once built
+
+    def _installPendingModel(self):
+        future, self._pendingModel = self._pendingModel, None
+        try:
+            hands = future.result()
+        except Exception as e:
+            print(f"⚠️ Could not load the model_complexity={self.modelComplexity} hand model ({e}); "
+                  f"keeping model_complexity={self._graphComplexity}.", flush=True)
+            self.modelComplexity = self._graphComplexity
+            return
+        if self.hands is not None:
+            self._modelBuilder.submit(self.hands.close)  # Closing joins the graph's threads
+        self.hands = hands
+        self._graphComplexity = self.modelComplexity
+        self.prevHandCount = 0  # The new graph starts with palm detection
+
+    def _buffer(self, buf, shape):
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+        return buf
 
     def findHands(self, img, draw=True):
-        img = cv2.resize(img, (640, 480))  # Resize input frame
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
+        """
+        Runs hand detection on a BGR frame.
+
+        Returns the frame resized to outSize (the input itself if it already
+        matches). When a resize was needed the returned array is an internal
+        buffer that is overwritten on the next call.
+        """
+        w, h = self.outSize
+        if img.shape[1] != w or img.shape[0] != h:
+            self._outBuf = self._buffer(self._outBuf, (h, w, 3))
+            img = cv2.resize(img, self.outSize, dst=self._outBuf)
 
-        if self.results.multi_hand_landmarks:
+        if not self._reuseIfStatic(img):
+            start = time.perf_counter()
+            self._detect(img)
+            self._inferCost += 0.1 * ((time.perf_counter() - start) - self._inferCost)
+            self._updateMotionRef(img)
+
+        if draw and self.results is not None and self.results.multi_hand_landmarks:
             for handLms in self.results.multi_hand_landmarks:
-                if draw:
-                    self.mpDraw.draw_landmarks(img, handLms, self.mpHands.HAND_CONNECTIONS)
+                self.mpDraw.draw_landmarks(img, handLms, self.mpHands.HAND_CONNECTIONS)
         return img
 
-    def findPosition(self, img, handNo=0, draw=True):
-        xList, yList = [], []
-        self.lmList = []
+    _SIG_SIZE = (16, 16)
+
+    def _motionSignature(self, img, region):
+        # Cheap frame fingerprint: the hand region, sampled every 4th pixel and
+        # area-averaged down to 16x16 grey
+        x0, y0, x1, y1 = region
+        small = cv2.resize(img[y0:y1:4, x0:x1:4], self._SIG_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
 
-        if self.results.multi_hand_landmarks:
-            myHand = self.results.multi_hand_landmarks[handNo]
-            for id, lm in enumerate(myHand.landmark):
-                h, w, c = img.shape
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                xList.append(cx)
-                yList.append(cy)
-                self.lmList.append([id, cx, cy])
-                if draw:
-                    cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
-
-        # Ensure xList and yList are not empty before calling min() and max()
-        if xList and yList:
-            xmin, xmax = min(xList), max(xList)
-            ymin, ymax = min(yList), max(yList)
-            bbox = (xmin, ymin, xmax, ymax)
-
-            if draw:
-                cv2.rectangle(img, (xmin - 20, ymin - 20), (xmax + 20, ymax + 20), (0, 255, 0), 2)
+    def _updateMotionRef(self, img):
+        self._reuseAge = 0
+        if self.motionThreshold is None or self.numHands == 0:
+            self._motionRef = None
+            return
+        start = time.perf_counter()
+        pts = self.lmInt[:self.numHands, :, 1:].reshape(-1, 2)
+        h, w = img.shape[:2]
+        x0, y0 = np.clip(pts.min(axis=0).astype(int) - 20, 0, (w - 1, h - 1)).tolist()
+        x1, y1 = np.clip(pts.max(axis=0).astype(int) + 20, 1, (w, h)).tolist()
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            self._motionRef = None
         else:
-            bbox = (0, 0, 0, 0)
+            self._motionRegion = (x0, y0, x1, y1)
+            self._motionRef = self._motionSignature(img, self._motionRegion)
+        self.cacheOverhead += time.perf_counter() - start
 
-        return self.lmList, bbox
+    def _reuseIfStatic(self, img):
+        # True if the previous landmarks were reused for this frame
+        if self.motionThreshold is None or self.motionPaused:
+            return False
+        if self._motionRef is None or self._reuseAge >= self.maxReuse:
+            self.cacheMisses += 1
+            return False
+        start = time.perf_counter()
+        sig = self._motionSignature(img, self._motionRegion)
+        sad = float(np.abs(sig - self._motionRef).mean())
+        elapsed = time.perf_counter() - start
+        self.cacheOverhead += elapsed
+        if self.metrics is not None:
+            self.metrics.record("motion_gate", elapsed)
+        if sad >= self.motionThreshold:
+            self.cacheMisses += 1
+            return False
 
-    def fingersUp(self):
-        fingers = []
-        if len(self.lmList) == 0:
-            return fingers
+        self._reuseAge += 1
+        self.cacheHits += 1
+        self.cacheSaved += self._inferCost
+        if self.recorder is not None:
+            self.recorder.write(self.lmArray[:self.numHands])
+        return True
 
-        # Thumb
-        if self.lmList[self.tipIds[0]][1] > self.lmList[self.tipIds[0] - 1][1]:
-            fingers.append(1)
-        else:
-            fingers.append(0)
+    def motionCacheStats(self):
+        """Hit rate and estimated CPU time saved by the motion-gated cache."""
+        total = self.cacheHits + self.cacheMisses
+        return {
+            "hits": self.cacheHits,
+            "misses": self.cacheMisses,
+            "hitRate": self.cacheHits / total if total else 0.0,
+            "savedMs": self.cacheSaved * 1000,
+            "overheadMs": self.cacheOverhead * 1000,
+            "threshold": self.motionThreshold,
+            "maxReuse": self.maxReuse,
+        }
 
-        # Fingers
-        for id in range(1, 5):
-            if self.lmList[self.tipIds[id]][2] < self.lmList[self.tipIds[id] - 2][2]:
-                fingers.append(1)
+    def _detect(self, img):
+        """
+        Fills self.results, self.lmArray and self.numHands for a frame that is
+        already at outSize. Subclasses override this to replace MediaPipe.
+        """
+        if self._pendingModel is not None and self._pendingModel.done():
+            self._installPendingModel()
+        t0 = time.perf_counter()
+        src = img
+        if self.inferSize and self.inferSize != self.outSize:
+            iw, ih = self.inferSize
+            self._inferBuf = self._buffer(self._inferBuf, (ih, iw, 3))
+            src = cv2.resize(img, self.inferSize, dst=self._inferBuf, interpolation=cv2.INTER_AREA)
+
+        self._rgbBuf = self._buffer(self._rgbBuf, src.shape)
+        self._rgbBuf.flags.writeable = True
+        imgRGB = cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=self._rgbBuf)
+        imgRGB.flags.writeable = False  # Lets MediaPipe use the data without copying
+        t1 = time.perf_counter()
+        self.results = self.hands.process(imgRGB)
+        t2 = time.perf_counter()
+        self._updateTrackingStats()
+        self._fillLandmarks(img.shape)
+        if self.metrics is not None:
+            t3 = time.perf_counter()
+            self.metrics.record("color", t1 - t0)
+            self.metrics.record("inference", t2 - t1)
+            self.metrics.record("landmarks", t3 - t2)
+
+    def _updateTrackingStats(self):
+        # MediaPipe only runs palm detection while fewer than maxHands hands are
+        # being tracked, so the previous frame's hand count tells us whether this
+        # frame paid for a detection or was served by the landmark tracker.
+        handCount = len(self.results.multi_hand_landmarks or [])
+        self.frameCount += 1
+        if self.mode or self.prevHandCount < self.maxHands:
+            self.detectionCount += 1
+        if handCount < self.prevHandCount:
+            self.lostCount += 1
+        self.prevHandCount = handCount
+
+    def trackingStats(self):
+        """Returns how often palm detection ran versus landmark tracking."""
+        rate = self.detectionCount / self.frameCount if self.frameCount else 0.0
+        return {
+            "frames": self.frameCount,
+            "detections": self.detectionCount,
+            "lost": self.lostCount,
+            "detectionRate": rate,
+        }
+
+    def _fillLandmarks(self, shape):
+        # Copies every detected hand into the preallocated buffer with one
+        # conversion and scales normalised coordinates to pixels.
+        hands = self.results.multi_hand_landmarks if self.results else None
+        self.numHands = min(len(hands), self.maxHands) if hands else 0
+        if self.numHands:
+            hands = hands[:self.numHands]
+            wire = _wireLandmarks(hands)
+            if wire is not None:
+                self._lmRows[:len(wire)] = wire
             else:
-                fingers.append(0)
+                landmarks = chain.from_iterable(hand.landmark for hand in hands)
+                self._lmFlat[:self.numHands * NUM_LANDMARKS * 3] = list(chain.from_iterable(map(_xyz, landmarks)))
+        if self.recorder is not None:
+            self.recorder.write(self.lmArray[:self.numHands])
+        self._scaleLandmarks(shape)
+
+    def _scaleLandmarks(self, shape):
+        # Normalised lmArray -> lmInt pixels of a frame with `shape`
+        if shape[:2] != self._scaleShape:
+            h, w = self._scaleShape = shape[:2]
+            self._scale[:] = (w, h)
+        if self.numHands:
+            # The unsafe cast truncates, like int()
+            np.multiply(self.lmArray[:self.numHands, :, :2], self._scale,
+                        out=self.lmInt[:self.numHands, :, 1:], casting="unsafe")
+        self._lmLists = self.lmInt[:self.numHands].tolist()
+        self._fingerCache.clear()
+        self._bboxCache.clear()
 
-        return fingers
+    def findPosition(self, img, handNo=0, draw=True):
+        self.handNo = handNo
+        if handNo >= self.numHands:
+            self.lmPixels = np.zeros((0, 2), dtype=np.int32)
+            self.lmList = []
+            return self.lmList, (0, 0, 0, 0)
+
+        self.lmPixels = self.lmInt[handNo, :, 1:]
+        self.lmList = self._lmLists[handNo]
+        bbox = self._bboxCache.get(handNo)
+        if bbox is None:
+            x, y, w, h = cv2.boundingRect(np.ascontiguousarray(self.lmPixels))
+            bbox = self._bboxCache[handNo] = (x, y, x + w - 1, y + h - 1)
+
+        if draw:
+            xmin, ymin, xmax, ymax = bbox
+            for _, cx, cy in self.lmList:
+                cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
+            cv2.rectangle(img, (xmin - 20, ymin - 20), (xmax + 20, ymax + 20), (0, 255, 0), 2)
+
+        return self.lmList, bbox
+
+    def fingersUpAll(self):
+        """
+        Finger states for every detected hand at once.
+
+        Returns:
+            np.ndarray: (numHands, 5) int array, 1 = finger up. Column 0 is the thumb.
+        """
+        return self._fingerStates(self.lmInt[:self.numHands, :, 1:])
+
+    def _fingerStates(self, pts):
+        # pts: (..., 21, 2) pixel landmarks
+        tips = pts[..., self._tipIdx, :]
+        refs = pts[..., self._refIdx, :]
+        up = tips[..., 1] < refs[..., 1]
+        up[..., 0] = tips[..., 0, 0] > refs[..., 0, 0]
+        return up.astype(np.int32)
+
+    def fingersUp(self):
+        if len(self.lmPixels) == 0:
+            return []
+        fingers = self._fingerCache.get(self.handNo)
+        if fingers is None:
+            lm = self.lmList
+            thumb = self.tipIds[0]
+            fingers = [1 if lm[thumb][1] > lm[thumb - 1][1] else 0]  # Thumb: x against the joint below
+            fingers += [1 if lm[tip][2] < lm[tip - 2][2] else 0 for tip in self.tipIds[1:]]
+            self._fingerCache[self.handNo] = fingers
+        return list(fingers)
 
     def findDistance(self, p1, p2, img, draw=True, r=15, t=3):
-        if len(self.lmList) == 0:
+        if len(self.lmPixels) == 0:
             return 0, img, [0, 0, 0, 0, 0, 0]
 
         x1, y1 = self.lmList[p1][1:]
@@ -98,10 +436,37 @@ class handDetector:
 
         return length, img, [x1, y1, x2, y2, cx, cy]
 
+    def pairwiseDistances(self, handNo=None):
+        """
+        Pixel distances between all landmark pairs.
+
+        Returns:
+            np.ndarray: (21, 21) float matrix for handNo (default: the hand
+            from the last findPosition), or (numHands, 21, 21) if handNo="all".
+        """
+        pts = self.lmArray[:self.numHands, :, :2] * self._scale
+        if handNo != "all":
+            pts = pts[self.handNo if handNo is None else handNo]
+        diff = pts[..., :, None, :] - pts[..., None, :, :]
+        return np.sqrt((diff * diff).sum(axis=-1))
+
+    def findAngle(self, p1, p2, p3, handNo=None):
+        """
+        Angle in degrees at landmark p2 between p2->p1 and p2->p3. The ids may
+        be ints or equal-length arrays of ids to compute many angles at once.
+        """
+        pts = self.lmArray[self.handNo if handNo is None else handNo, :, :2] * self._scale
+        v1 = pts[np.asarray(p1)] - pts[np.asarray(p2)]
+        v2 = pts[np.asarray(p3)] - pts[np.asarray(p2)]
+        cross = v1[..., 0] * v2[..., 1] - v1[..., 1] * v2[..., 0]
+        dot = (v1 * v2).sum(axis=-1)
+        return np.degrees(np.abs(np.arctan2(cross, dot)))
+
 def main():
-    cap = cv2.VideoCapture(0)
-    cap.set(3, 640)  # Set width
-    cap.set(4, 480)  # Set height
+    import sys
+    from frame_sources import open_frame_source
+    # Optional argument: webcam index, video file or directory of frames
+    cap = open_frame_source(sys.argv[1] if len(sys.argv) > 1 else 0, 640, 480)
     # detector = handDetector(detectionCon=0.7, trackCon=0.7)
     detector = handDetector(detectionCon=0.9, trackCon=0.8)
     pTime = 0
@@ -129,6 +494,7 @@ def main():
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
+    print("Tracking stats:", detector.trackingStats())
     cap.release()
     cv2.destroyAllWindows()
     cv2.waitKey(0)  # Wait for a final key press before closing the window
@@ -0,0 +1,224 @@
+import collections
+import queue
+import threading
+import time
+
+# A queued input action. kind is "scroll", "press", "hotkey" or "move"; target
+# is the key name (press), a tuple of keys (hotkey), an (x, y) screen position
+# (move) or None (scroll); amount is the scroll distance or the number of key
+# presses.
+Action = collections.namedtuple("Action", "kind target amount submitted")
+
+_STOP = object()  # Sentinel that shuts the worker down
+
+
+class ActionDispatcher:
+    """
+    Executes input actions on a worker thread so the vision loop never blocks
+    on pyautogui.
+
+    Each submit is rate-limited by a per-action cooldown measured with
+    timestamps (instead of time.sleep), and commands that pile up while the
+    worker is busy are merged, e.g. N pending scroll(80) become one
+    scroll(N*80) and only the newest of several pending cursor moves runs.
+
+    Args:
+        backend: Object providing scroll(amount), press(key, presses=n),
+            hotkey(*keys) and moveTo(x, y). Defaults to the pyautogui module.
+        max_queue (int): Max pending commands; further submits are dropped.
+        metrics (PipelineMetrics): Optional; backend call time is recorded as
+            "inject" and submit-to-injected time as "inject_latency".
+        synchronous (bool): Execute actions inline in submit() instead of on
+            the worker. Used by replays so the emitted sequence is deterministic.
+    """
+
+    def __init__(self, backend=None, max_queue=32, metrics=None, synchronous=False):
+        if backend is None:
+            import pyautogui
+            backend = pyautogui
+        self.backend = backend
+        self.metrics = metrics
+        self.synchronous = synchronous
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_fired = {}  # cooldown key -> timestamp of last accepted submit
+        self._thread = None
+
+        # Metrics
+        self.submitted = 0
+        self.executed = 0
+        self.merged = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.errors = 0
+        self._latencies = collections.deque(maxlen=256)  # submit -> injected, seconds
+        self.latency_ewma = 0.0  # Smoothed submit -> injected seconds
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        """Starts the worker thread."""
+        if self.synchronous:
+            return self
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="ActionDispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """Stops the worker after the commands already queued have run."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    # ---------- Submitting ----------
+
+    def submit(self, kind, target=None, amount=1, cooldown=0.0, key=None, now=None):
+        """
+        Queues an action unless its cooldown has not elapsed yet.
+
+        Args:
+            kind (str): "scroll", "press", "hotkey" or "move".
+            target: Key name for press, tuple of keys for hotkey, (x, y) for
+                move, None for scroll.
+            amount (int): Scroll distance or number of presses.
+            cooldown (float): Minimum seconds between accepted submits sharing `key`.
+            key (str): Cooldown group. Defaults to kind + target.
+            now (float): Timestamp to use instead of time.monotonic().
+
+        Returns:
+            bool: True if the action was queued.
+        """
+        if now is None:
+            now = time.monotonic()
+        if key is None:
+            key = f"{kind}:{target}"
+
+        last = self._last_fired.get(key)
+        if last is not None and now - last < cooldown:
+            self.throttled += 1
+            return False
+
+        action = Action(kind, target, amount, time.monotonic())
+        if self.synchronous:
+            self._execute(action)
+        else:
+            try:
+                self._queue.put_nowait(action)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        self._last_fired[key] = now
+        self.submitted += 1
+        return True
+
+    def scroll(self, amount, cooldown=0.0, key="scroll", now=None):
+        return self.submit("scroll", None, amount, cooldown, key, now)
+
+    def press(self, key_name, presses=1, cooldown=0.0, key=None, now=None):
+        return self.submit("press", key_name, presses, cooldown, key, now)
+
+    def hotkey(self, *keys, cooldown=0.0, key=None, now=None):
+        return self.submit("hotkey", tuple(keys), 1, cooldown, key, now)
+
+    def move(self, x, y, cooldown=0.0, now=None):
+        return self.submit("move", (x, y), 1, cooldown, "move", now)
+
+    # ---------- Worker ----------
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stopping = False
+            # Drain whatever piled up while we were injecting
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            for action in self._merge(batch):
+                self._execute(action)
+            if stopping:
+                return
+
+    def _merge(self, batch):
+        """Merges consecutive scroll / same-key press commands and cursor moves."""
+        merged = []
+        for action in batch:
+            prev = merged[-1] if merged else None
+            if prev is not None and action.kind == prev.kind == "move":
+                # Only the newest cursor position matters
+                merged[-1] = action
+                self.merged += 1
+            elif prev is not None and action.kind == prev.kind \
+                    and action.kind in ("scroll", "press") and action.target == prev.target:
+                # Keep the older submit time so latency covers the whole batch
+                merged[-1] = prev._replace(amount=prev.amount + action.amount)
+                self.merged += 1
+            else:
+                merged.append(action)
+        return merged
+
+    def _execute(self, action):
+        start = time.perf_counter()
+        try:
+            if action.kind == "scroll":
+                self.backend.scroll(action.amount)
+            elif action.kind == "press":
+                self.backend.press(action.target, presses=action.amount)
+            elif action.kind == "hotkey":
+                self.backend.hotkey(*action.target)
+            elif action.kind == "move":
+                self.backend.moveTo(*action.target)
+            else:
+                raise ValueError(f"Unknown action kind: {action.kind}")
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Action {action.kind} {action.target} failed: {e}", flush=True)
+            return
+        self.executed += 1
+        latency = time.monotonic() - action.submitted
+        self._latencies.append(latency)
+        self.latency_ewma += 0.1 * (latency - self.latency_ewma)
+        if self.metrics is not None:
+            self.metrics.record("inject", time.perf_counter() - start)
+            self.metrics.record("inject_latency", latency)
+
+    # ---------- Metrics ----------
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """Returns counters, current queue depth and injection latency (ms)."""
+        latencies = sorted(self._latencies)
+        if latencies:
+            mean = sum(latencies) / len(latencies) * 1000
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+            worst = latencies[-1] * 1000
+        else:
+            mean = p95 = worst = 0.0
+        return {
+            "queue_depth": self.queue_depth(),
+            "submitted": self.submitted,
+            "executed": self.executed,
+            "merged": self.merged,
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "latency_mean_ms": mean,
+            "latency_p95_ms": p95,
+            "latency_max_ms": worst,
+        }
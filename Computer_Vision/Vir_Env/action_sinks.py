@@ -0,0 +1,371 @@
+"""
+Pluggable action sinks: where ActionDispatcher sends scroll/press/hotkey.
+
+A sink provides scroll(amount), press(key, presses=n), hotkey(*keys),
+moveTo(x, y), moveRel(dx, dy), size() -> (width, height) and close(), the
+same calls the dispatcher makes on pyautogui. Key names are pyautogui's
+("ctrl", "tab", "volumeup", "a", "f5", ...).
+
+On Linux the native sinks skip pyautogui's per-call cost: pyautogui sleeps
+PAUSE (0.1 s) after every call unless told not to and sends one event per
+request, while XTestSink and UinputSink queue all events of an action and
+send them in one flush / one write(). open_sink("auto") picks the first that
+works, falling back to pyautogui (with PAUSE disabled).
+"""
+import json
+import os
+import struct
+import sys
+import time
+
+
+class PyAutoGuiSink:
+    """Real input injection through pyautogui, without its PAUSE sleeps."""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pg = pyautogui
+
+    def size(self):
+        return self._pg.size()
+
+    def scroll(self, amount):
+        self._pg.scroll(amount, _pause=False)
+
+    def press(self, key, presses=1):
+        self._pg.press(key, presses=presses, _pause=False)
+
+    def hotkey(self, *keys):
+        self._pg.hotkey(*keys, _pause=False)
+
+    def moveTo(self, x, y):
+        self._pg.moveTo(x, y, _pause=False)  # Cursor moves must not sleep PAUSE
+
+    def moveRel(self, dx, dy):
+        self._pg.moveRel(dx, dy, _pause=False)
+
+    def close(self):
+        pass
+
+
+# ========== Native Linux sinks ==========
+
+# pyautogui key name -> X keysym name, where they differ
+_X_KEYSYMS = {
+    "ctrl": "Control_L", "ctrlleft": "Control_L", "ctrlright": "Control_R",
+    "alt": "Alt_L", "altleft": "Alt_L", "altright": "Alt_R",
+    "shift": "Shift_L", "shiftleft": "Shift_L", "shiftright": "Shift_R",
+    "win": "Super_L", "winleft": "Super_L", "winright": "Super_R", "super": "Super_L", "command": "Super_L",
+    "enter": "Return", "return": "Return", "esc": "Escape", "escape": "Escape", "tab": "Tab",
+    "space": "space", "backspace": "BackSpace", "delete": "Delete", "del": "Delete", "insert": "Insert",
+    "up": "Up", "down": "Down", "left": "Left", "right": "Right", "home": "Home", "end": "End",
+    "pageup": "Prior", "pgup": "Prior", "pagedown": "Next", "pgdn": "Next",
+    "volumeup": "XF86_AudioRaiseVolume", "volumedown": "XF86_AudioLowerVolume",
+    "volumemute": "XF86_AudioMute", "playpause": "XF86_AudioPlay",
+    "nexttrack": "XF86_AudioNext", "prevtrack": "XF86_AudioPrev",
+}
+
+# pyautogui key name -> evdev KEY_* name, where it isn't "KEY_" + name.upper()
+_EVDEV_KEYS = {
+    "ctrl": "KEY_LEFTCTRL", "ctrlleft": "KEY_LEFTCTRL", "ctrlright": "KEY_RIGHTCTRL",
+    "alt": "KEY_LEFTALT", "altleft": "KEY_LEFTALT", "altright": "KEY_RIGHTALT",
+    "shift": "KEY_LEFTSHIFT", "shiftleft": "KEY_LEFTSHIFT", "shiftright": "KEY_RIGHTSHIFT",
+    "win": "KEY_LEFTMETA", "winleft": "KEY_LEFTMETA", "winright": "KEY_RIGHTMETA",
+    "super": "KEY_LEFTMETA", "command": "KEY_LEFTMETA",
+    "return": "KEY_ENTER", "escape": "KEY_ESC", "del": "KEY_DELETE",
+    "pgup": "KEY_PAGEUP", "pgdn": "KEY_PAGEDOWN",
+    "volumemute": "KEY_MUTE", "nexttrack": "KEY_NEXTSONG", "prevtrack": "KEY_PREVIOUSSONG",
+    " ": "KEY_SPACE", "\t": "KEY_TAB", "\n": "KEY_ENTER",
+}
+
+
+class XTestSink:
+    """
+    X11 injection through the XTEST extension (needs python-xlib). All fake
+    events of one action are buffered and sent with a single flush.
+
+    Args:
+        display (str): X display name; defaults to $DISPLAY (e.g. an Xvfb).
+    """
+
+    name = "xtest"
+
+    def __init__(self, display=None):
+        try:
+            from Xlib import X, XK, display as xdisplay
+            from Xlib.ext import xtest
+        except ImportError:
+            raise ImportError("XTestSink needs python-xlib: pip install python-xlib")
+        self._X, self._xtest = X, xtest
+        self._display = xdisplay.Display(display)
+        if not self._display.has_extension("XTEST"):
+            self._display.close()
+            raise OSError("X server has no XTEST extension")
+        XK.load_keysym_group("xf86")
+        self._XK = XK
+        self._keycodes = {}
+        screen = self._display.screen()
+        self._size = (screen.width_in_pixels, screen.height_in_pixels)
+
+    def _keycode(self, key):
+        code = self._keycodes.get(key)
+        if code is None:
+            name = _X_KEYSYMS.get(key.lower(), key)
+            keysym = self._XK.string_to_keysym(name) or self._XK.string_to_keysym(name.capitalize())
+            code = self._display.keysym_to_keycode(keysym) if keysym else 0
+            if not code:
+                raise ValueError(f"No keycode for key {key!r}")
+            self._keycodes[key] = code
+        return code
+
+    def _fake(self, event, detail=0, x=0, y=0):
+        self._xtest.fake_input(self._display, event, detail, x=x, y=y)
+
+    def size(self):
+        return self._size
+
+    def scroll(self, amount):
+        button = 4 if amount > 0 else 5  # Wheel up / down, one click per unit as in pyautogui
+        for _ in range(abs(int(amount))):
+            self._fake(self._X.ButtonPress, button)
+            self._fake(self._X.ButtonRelease, button)
+        self._display.flush()
+
+    def press(self, key, presses=1):
+        code = self._keycode(key)
+        for _ in range(presses):
+            self._fake(self._X.KeyPress, code)
+            self._fake(self._X.KeyRelease, code)
+        self._display.flush()
+
+    def hotkey(self, *keys):
+        codes = [self._keycode(key) for key in keys]
+        for code in codes:
+            self._fake(self._X.KeyPress, code)
+        for code in reversed(codes):
+            self._fake(self._X.KeyRelease, code)
+        self._display.flush()
+
+    def moveTo(self, x, y):
+        self._fake(self._X.MotionNotify, x=int(x), y=int(y))
+        self._display.flush()
+
+    def moveRel(self, dx, dy):
+        self._fake(self._X.MotionNotify, detail=1, x=int(dx), y=int(dy))  # detail=1: relative
+        self._display.flush()
+
+    def close(self):
+        self._display.close()
+
+
+def _drm_screen_size():
+    """First connected display mode from /sys/class/drm, e.g. (1920, 1080)."""
+    try:
+        for card in sorted(os.listdir("/sys/class/drm")):
+            path = os.path.join("/sys/class/drm", card)
+            try:
+                with open(os.path.join(path, "status")) as f:
+                    if f.read().strip() != "connected":
+                        continue
+                with open(os.path.join(path, "modes")) as f:
+                    w, h = f.readline().strip().split("x")[:2]
+                return int(w), int("".join(c for c in h if c.isdigit()))
+            except (OSError, ValueError):
+                continue
+    except OSError:
+        pass
+    return None
+
+
+class UinputSink:
+    """
+    Kernel-level injection through /dev/uinput (needs python-evdev and write
+    access to /dev/uinput, e.g. via the input group). Works under X11,
+    Wayland and the console. moveTo() drives an absolute device like a VM
+    tablet, so it lands exactly; moveRel() drives a separate relative mouse
+    with REL_X/REL_Y, so it adds to wherever the pointer really is (uinput
+    can't read it back, and the physical mouse may have moved it). Each
+    action's events go out in one write().
+
+    Args:
+        screen_size (tuple): Pointer range; defaults to the first connected
+            DRM mode, else 1920x1080.
+    """
+
+    name = "uinput"
+    _EVENT = struct.Struct("llHHi")  # struct input_event: timeval, type, code, value
+
+    def __init__(self, screen_size=None):
+        try:
+            from evdev import AbsInfo, UInput, ecodes
+        except ImportError:
+            raise ImportError("UinputSink needs python-evdev: pip install evdev")
+        self._e = ecodes
+        self._size = tuple(screen_size or _drm_screen_size() or (1920, 1080))
+        w, h = self._size
+        keys = [code for name, code in ecodes.ecodes.items() if name.startswith("KEY_") and code < 0x200]
+        self._keyboard = UInput({ecodes.EV_KEY: keys}, name="airmouse-keyboard")
+        self._pointer = UInput({
+            ecodes.EV_KEY: [ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE],
+            ecodes.EV_REL: [ecodes.REL_WHEEL],
+            ecodes.EV_ABS: [(ecodes.ABS_X, AbsInfo(0, 0, w - 1, 0, 0, 0)),
+                            (ecodes.ABS_Y, AbsInfo(0, 0, h - 1, 0, 0, 0))],
+        }, name="airmouse-pointer")
+        # BTN_LEFT makes udev/libinput classify it as a mouse
+        self._mouse = UInput({
+            ecodes.EV_KEY: [ecodes.BTN_LEFT],
+            ecodes.EV_REL: [ecodes.REL_X, ecodes.REL_Y],
+        }, name="airmouse-mouse")
+        self._codes = {}
+
+    def _code(self, key):
+        code = self._codes.get(key)
+        if code is None:
+            name = _EVDEV_KEYS.get(key.lower(), "KEY_" + key.upper())
+            code = self._e.ecodes.get(name)
+            if code is None:
+                raise ValueError(f"No evdev key code for key {key!r}")
+            self._codes[key] = code
+        return code
+
+    def _write(self, device, events):
+        """Sends (type, code, value) events, each report closed by SYN, in one write()."""
+        pack = self._EVENT.pack
+        os.write(device.fd, b"".join(pack(0, 0, t, c, v) for t, c, v in events))
+
+    def size(self):
+        return self._size
+
+    def scroll(self, amount):
+        e = self._e
+        self._write(self._pointer, [(e.EV_REL, e.REL_WHEEL, int(amount)), (e.EV_SYN, e.SYN_REPORT, 0)])
+
+    def press(self, key, presses=1):
+        e, code = self._e, self._code(key)
+        events = []
+        for _ in range(presses):
+            events += [(e.EV_KEY, code, 1), (e.EV_SYN, e.SYN_REPORT, 0),
+                       (e.EV_KEY, code, 0), (e.EV_SYN, e.SYN_REPORT, 0)]
+        self._write(self._keyboard, events)
+
+    def hotkey(self, *keys):
+        e = self._e
+        codes = [self._code(key) for key in keys]
+        events = []
+        for value, order in ((1, codes), (0, codes[::-1])):
+            for code in order:
+                events += [(e.EV_KEY, code, value), (e.EV_SYN, e.SYN_REPORT, 0)]
+        self._write(self._keyboard, events)
+
+    def moveTo(self, x, y):
+        e = self._e
+        w, h = self._size
+        x, y = min(max(int(x), 0), w - 1), min(max(int(y), 0), h - 1)
+        self._write(self._pointer, [(e.EV_ABS, e.ABS_X, x), (e.EV_ABS, e.ABS_Y, y),
+                                    (e.EV_SYN, e.SYN_REPORT, 0)])
+
+    def moveRel(self, dx, dy):
+        e = self._e
+        self._write(self._mouse, [(e.EV_REL, e.REL_X, int(dx)), (e.EV_REL, e.REL_Y, int(dy)),
+                                  (e.EV_SYN, e.SYN_REPORT, 0)])
+
+    def close(self):
+        self._keyboard.close()
+        self._pointer.close()
+        self._mouse.close()
+
+
+class RecordingSink:
+    """
+    Records actions instead of injecting them, for replays and CI.
+
+    Args:
+        screen_size (tuple): What size() reports.
+        clock (callable): Returns the timestamp stored with each action.
+            Replays point this at the source's media time.
+    """
+
+    name = "record"
+
+    def __init__(self, screen_size=(1920, 1080), clock=time.monotonic):
+        self.screen_size = screen_size
+        self.clock = clock
+        self.actions = []
+
+    def size(self):
+        return self.screen_size
+
+    def _record(self, kind, target, amount):
+        self.actions.append([round(self.clock(), 3), kind, target, amount])
+
+    def scroll(self, amount):
+        self._record("scroll", None, amount)
+
+    def press(self, key, presses=1):
+        self._record("press", key, presses)
+
+    def hotkey(self, *keys):
+        self._record("hotkey", list(keys), 1)
+
+    def moveTo(self, x, y):
+        self._record("move", [int(x), int(y)], 1)
+
+    def moveRel(self, dx, dy):
+        self._record("move_rel", [int(dx), int(dy)], 1)
+
+    def close(self):
+        pass
+
+    def save(self, path):
+        """Writes the recorded actions as a JSON golden file."""
+        with open(path, "w") as f:
+            json.dump(self.actions, f, indent=1)
+
+
+SINKS = {"xtest": XTestSink, "uinput": UinputSink, "pyautogui": PyAutoGuiSink, "record": RecordingSink}
+
+
+def open_sink(spec="auto"):
+    """
+    Opens an action sink by name: "xtest", "uinput", "pyautogui", "record",
+    or "auto" for the first native Linux backend that works (XTest when
+    $DISPLAY is set, then uinput), falling back to pyautogui.
+    """
+    if spec != "auto":
+        if spec not in SINKS:
+            raise ValueError(f"Unknown input backend: {spec!r}")
+        return SINKS[spec]()
+    candidates = []
+    if sys.platform.startswith("linux"):
+        if os.environ.get("DISPLAY"):
+            candidates.append(XTestSink)
+        candidates.append(UinputSink)
+    for sinkClass in candidates:
+        try:
+            return sinkClass()
+        except Exception as e:  # Missing module, no X server, no /dev/uinput access...
+            print(f"⚠️ Input backend {sinkClass.name} unavailable ({e}).", flush=True)
+    return PyAutoGuiSink()
+
+
+def load_golden(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_actions(actual, expected, time_tolerance=0.05):
+    """
+    Compares two action sequences.
+
+    Returns:
+        list[str]: Human-readable mismatches (empty if they match).
+    """
+    problems = []
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        if a[1:] != e[1:] or abs(a[0] - e[0]) > time_tolerance:
+            problems.append(f"#{i}: got {a}, expected {e}")
+    if len(actual) != len(expected):
+        problems.append(f"got {len(actual)} actions, expected {len(expected)}")
+    return problems
@@ -0,0 +1,1006 @@
+"""
+Offline benchmarks for the gesture pipeline.
+
+Usage:
+    python benchmark.py tracking <clip.mp4> [<clip2.mp4> ...]
+    python benchmark.py landmarks [--iterations N]
+    python benchmark.py replay <clip.mp4 | frames_dir> [--landmarks cache.bin]
+        [--record-landmarks cache.bin] [--golden actions.json [--update-golden]]
+    python benchmark.py cursor <clip.mp4 | frames_dir> [--landmarks cache.bin]
+    python benchmark.py workers <clip.mp4 | frames_dir> [--loops N]
+    python benchmark.py switch [--trials N] [--transport unix|udp]
+    python benchmark.py imu [--rates 1000 2000 8000] [--seconds S]
+    python benchmark.py startup <clip.mp4 | frames_dir | webcam index>
+    python benchmark.py quality <clip.mp4 | frames_dir> [--budget-ms 33] [--load 3.0]
+    python benchmark.py controller [--toggles N] [--start-ms 800] [--stop-ms 300]
+    xvfb-run python benchmark.py inject [--backends pyautogui-pause pyautogui xtest uinput] [--repeats N]
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+import HandTrackingModule as htm
+from action_sinks import RecordingSink, compare_actions, load_golden
+from cursor_control import CursorMapper
+
+
+def bench_tracking(clip_path, maxHands=1, detectionCon=0.75, trackCon=0.6):
+    """
+    Runs a recorded clip through handDetector in per-frame detection mode
+    (the old static_image_mode=True behaviour) and in tracking mode.
+
+    Returns:
+        dict: mode name -> {"fps": float, "frames": int, **trackingStats}
+    """
+    report = {}
+    for label, mode in (("detect-every-frame", True), ("tracking", False)):
+        cap = cv2.VideoCapture(clip_path)
+        if not cap.isOpened():
+            raise IOError(f"Cannot open clip: {clip_path}")
+        detector = htm.handDetector(mode=mode, maxHands=maxHands,
+                                    detectionCon=detectionCon, trackCon=trackCon)
+        elapsed = 0.0
+        while True:
+            success, img = cap.read()
+            if not success:
+                break
+            start = time.perf_counter()
+            detector.findHands(img, draw=False)
+            detector.findPosition(img, draw=False)
+            elapsed += time.perf_counter() - start
+        cap.release()
+
+        stats = detector.trackingStats()
+        stats["fps"] = stats["frames"] / elapsed if elapsed > 0 else 0.0
+        report[label] = stats
+    return report
+
+
+def _print_tracking(clip_path, report):
+    print(f"\n=== {clip_path} ===")
+    for label, stats in report.items():
+        print(f"{label:>20}: {stats['fps']:7.1f} FPS | frames={stats['frames']} "
+              f"detections={stats['detections']} ({stats['detectionRate']:.1%}) "
+              f"lost={stats['lost']}")
+    before = report["detect-every-frame"]["fps"]
+    after = report["tracking"]["fps"]
+    if before > 0:
+        print(f"{'speed-up':>20}: {after / before:.2f}x")
+
+
+def _synthetic_results(numHands, seed=0):
+    """
+    Builds an object shaped like MediaPipe's Hands results, with the same
+    NormalizedLandmarkList protobufs, so attribute access costs the same.
+    """
+    from mediapipe.framework.formats import landmark_pb2
+
+    rng = np.random.default_rng(seed)
+    hands = []
+    for _ in range(numHands):
+        hand = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z in rng.uniform(0.2, 0.8, size=(htm.NUM_LANDMARKS, 3)).tolist():
+            hand.landmark.add(x=x, y=y, z=z)
+        hands.append(hand)
+    return SimpleNamespace(multi_hand_landmarks=hands)
+
+
+def _legacy_landmarks(results, img, handNo=0):
+    """The original per-landmark Python loop, kept as the baseline."""
+    xList, yList, lmList = [], [], []
+    for id, lm in enumerate(results.multi_hand_landmarks[handNo].landmark):
+        h, w, c = img.shape
+        cx, cy = int(lm.x * w), int(lm.y * h)
+        xList.append(cx)
+        yList.append(cy)
+        lmList.append([id, cx, cy])
+    bbox = (min(xList), min(yList), max(xList), max(yList))
+
+    tipIds = [4, 8, 12, 16, 20]
+    fingers = [1 if lmList[4][1] > lmList[3][1] else 0]
+    for id in range(1, 5):
+        fingers.append(1 if lmList[tipIds[id]][2] < lmList[tipIds[id] - 2][2] else 0)
+    x1, y1 = lmList[4][1:]
+    x2, y2 = lmList[8][1:]
+    length = math.hypot(x2 - x1, y2 - y1)
+    return lmList, bbox, fingers, length
+
+
+def bench_landmarks(iterations=5000, repeats=5):
+    """
+    Per-frame cost of landmark extraction + bbox + fingersUp + findDistance,
+    for 1 and 2 hands, on synthetic MediaPipe results (no inference). Each
+    figure is the best of `repeats` runs, which keeps scheduler noise out.
+
+    Returns:
+        dict: numHands -> {"legacy_us": float, "array_us": float}
+    """
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    detector = htm.handDetector(maxHands=2)
+    report = {}
+    for numHands in (1, 2):
+        results = _synthetic_results(numHands)
+        detector.results = results
+
+        def legacy():
+            for handNo in range(numHands):
+                _legacy_landmarks(results, img, handNo)
+
+        def array():
+            detector._fillLandmarks(img.shape)
+            for handNo in range(numHands):
+                detector.findPosition(img, handNo=handNo, draw=False)
+                detector.fingersUp()
+                detector.findDistance(4, 8, img, draw=False)
+
+        report[numHands] = {}
+        for name, step in (("legacy_us", legacy), ("array_us", array)):
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    step()
+                best = min(best, (time.perf_counter() - start) / iterations)
+            report[numHands][name] = best * 1e6
+    return report
+
+
+def bench_replay(source, landmarks=None, record_landmarks=None):
+    """
+    Replays a recorded session through the full GestureEngine as fast as
+    possible, headless, with actions going to a RecordingSink.
+
+    Args:
+        source: Video file or image directory.
+        landmarks (str): Landmark cache to replay instead of running MediaPipe.
+        record_landmarks (str): Write a landmark cache while replaying.
+
+    Returns:
+        dict: frames, fps, per-frame latency summary, per-stage summaries and
+        the emitted action sequence.
+    """
+    import gesture_logic
+
+    sink = RecordingSink()
+    engine = gesture_logic.GestureEngine(source=source, sink=sink, headless=True,
+                                         landmark_cache=landmarks, record_landmarks=record_landmarks,
+                                         synchronous_actions=True)
+    sink.clock = lambda: engine.frame_now  # Stamp actions with media time
+    if not engine.warm_up():
+        raise IOError(f"Cannot replay {source}")
+    engine.resume()
+    start = time.perf_counter()
+    engine.run()
+    elapsed = time.perf_counter() - start
+    snapshot = engine.metrics.snapshot()
+    engine.close()
+
+    frames = snapshot["stages"]["frame"]["count"]
+    return {
+        "frames": frames,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "latency": snapshot["stages"]["frame"],
+        "stages": snapshot["stages"],
+        "actions": sink.actions,
+    }
+
+
+def _fingertip_track(source, landmarks=None):
+    """Index fingertip (t, x, y) for every frame with a hand, plus per-frame detector seconds."""
+    from frame_sources import open_frame_source
+    from landmark_cache import CachedLandmarkDetector
+
+    src = open_frame_source(source)
+    if landmarks:
+        detector = CachedLandmarkDetector(landmarks, maxHands=1)
+    else:
+        detector = htm.handDetector(maxHands=1, detectionCon=0.75, trackCon=0.6)
+    track, costs = [], []
+    while True:
+        success, img = src.read()
+        if not success:
+            break
+        start = time.perf_counter()
+        img = detector.findHands(img, draw=False)
+        lmList, _ = detector.findPosition(img, draw=False)
+        costs.append(time.perf_counter() - start)
+        if lmList:
+            track.append((src.frame_time, *lmList[8][1:]))
+    src.release()
+    return np.array(track, dtype=np.float64).reshape(-1, 3), costs
+
+
+def _lag_seconds(raw, out, dt, max_lag=15):
+    """Delay of `out` behind `raw`, from the peak of their velocity cross-correlation."""
+    v_raw, v_out = np.diff(raw, axis=0), np.diff(out, axis=0)
+    if len(v_raw) <= max_lag:
+        return 0.0
+    n = len(v_raw)
+    lags = range(-max_lag, max_lag + 1)
+    scores = [float((v_raw[max(0, -k):n - max(0, k)] * v_out[max(0, k):n - max(0, -k)]).sum())
+              for k in lags]
+    i = int(np.argmax(scores))
+    lag = float(lags[i])
+    if 0 < i < len(scores) - 1:  # Parabolic refinement for sub-frame resolution
+        a, b, c = scores[i - 1], scores[i], scores[i + 1]
+        denom = a - 2 * b + c
+        if denom != 0:
+            lag += 0.5 * (a - c) / denom
+    return lag * dt
+
+
+def bench_cursor(source, landmarks=None, screen_size=(1920, 1080), inject_ms=1.0, still_speed=150.0):
+    """
+    Replays a session's index-fingertip track through the cursor filters and
+    reports lag, jitter and an estimated motion-to-photon latency for each.
+
+    Jitter is the RMS frame-to-frame cursor movement (px) on frames where the
+    hand is still (smoothed raw speed below `still_speed` px/s). Motion-to-
+    photon = detector p50 + `inject_ms` + filter lag - prediction lead.
+
+    Returns:
+        dict: filter name -> {"lag_ms", "jitter_px", "motion_to_photon_ms"}
+    """
+    track, costs = _fingertip_track(source, landmarks)
+    if len(track) < 3:
+        raise ValueError("Not enough frames with a hand to evaluate the cursor")
+    t = track[:, 0]
+    dt = float(np.median(np.diff(t)))
+    pipeline = float(np.median(costs)) + inject_ms / 1000.0
+
+    mapper = CursorMapper((640, 480), screen_size)
+    raw = np.array([mapper.map_raw(x, y) for _, x, y in track])
+
+    outputs = {"raw": raw}
+    # Old fixed smoothening: ploc + (target - ploc) / 5 every frame
+    fixed, ploc = [], raw[0]
+    for target in raw:
+        ploc = ploc + (target - ploc) / 5
+        fixed.append(ploc)
+    outputs["fixed /5"] = np.array(fixed)
+    for name, lead in (("one-euro", 0.0), ("one-euro + predict", pipeline)):
+        mapper = CursorMapper((640, 480), screen_size)
+        outputs[name] = np.array([mapper.update(x, y, ts, lead) for ts, x, y in track], dtype=np.float64)
+
+    speed = np.hypot(*np.diff(raw, axis=0).T) / np.maximum(np.diff(t), 1e-6)
+    speed = np.convolve(speed, np.ones(5) / 5, mode="same")
+    still = speed < still_speed
+
+    report = {}
+    for name, out in outputs.items():
+        steps = np.hypot(*np.diff(out, axis=0).T)
+        jitter = float(np.sqrt((steps[still] ** 2).mean())) if still.any() else 0.0
+        lag = _lag_seconds(raw, out, dt)
+        lead = pipeline if name.endswith("predict") else 0.0
+        report[name] = {
+            "lag_ms": lag * 1000,
+            "jitter_px": jitter,
+            "motion_to_photon_ms": max(0.0, pipeline + lag - lead) * 1000,
+        }
+    return report
+
+
+def _listener_probe(stop, interval=0.005):
+    """
+    Stand-in for the pynput listener: wakes every `interval` seconds and runs a
+    click-handler sized bit of Python. Returns (wake-up lateness, callback time)
+    lists in seconds; both grow when the vision thread holds the GIL.
+    """
+    late, busy = [], []
+    due = time.perf_counter() + interval
+    while not stop.is_set():
+        time.sleep(max(0.0, due - time.perf_counter()))
+        woke = time.perf_counter()
+        late.append(woke - due)
+        clicks = [woke - k * 0.05 for k in range(3)]  # Triple-click check as in on_click
+        _ = all(a - b < 0.2 for a, b in zip(clicks, clicks[1:]))
+        busy.append(time.perf_counter() - woke)
+        due = max(due + interval, woke)
+    return late, busy
+
+
+def bench_workers(source, loops=3):
+    """
+    Runs the detector over a clip on a background thread, as pyconnect does,
+    with MediaPipe in-process ("thread") and in an inference_worker process
+    ("process"), while the main thread plays the mouse listener.
+
+    Returns:
+        dict: mode -> {"fps", "frames", "late_p50_ms", "late_p95_ms",
+        "late_max_ms", "callback_p95_ms"}
+    """
+    from frame_sources import open_frame_source
+    from inference_worker import ProcessDetector
+
+    src = open_frame_source(source)
+    frames = []
+    while True:
+        success, img = src.read()
+        if not success:
+            break
+        frames.append(cv2.resize(img, (640, 480)))
+    src.release()
+    if not frames:
+        raise IOError(f"No frames in {source}")
+
+    report = {}
+    for mode, detectorClass in (("thread", htm.handDetector), ("process", ProcessDetector)):
+        detector = detectorClass(maxHands=1, detectionCon=0.75, trackCon=0.6)
+        detector.findHands(frames[0].copy(), draw=False)  # Load the model / start the worker
+        stop = threading.Event()
+        counted = []
+
+        def vision():
+            start = time.perf_counter()
+            for _ in range(loops):
+                for img in frames:
+                    img = detector.findHands(img.copy(), draw=True)
+                    detector.findPosition(img, draw=False)
+                    detector.fingersUp()
+            counted.append(time.perf_counter() - start)
+            stop.set()
+
+        thread = threading.Thread(target=vision, daemon=True)
+        thread.start()
+        late, busy = _listener_probe(stop)
+        thread.join()
+        if hasattr(detector, "close"):
+            detector.close()
+
+        late.sort()
+        busy.sort()
+        n = len(frames) * loops
+        report[mode] = {
+            "frames": n,
+            "fps": n / counted[0],
+            "late_p50_ms": late[len(late) // 2] * 1000,
+            "late_p95_ms": late[int(len(late) * 0.95)] * 1000,
+            "late_max_ms": late[-1] * 1000,
+            "callback_p95_ms": busy[int(len(busy) * 0.95)] * 1000,
+        }
+    return report
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    n = len(samples)
+    if not n:
+        return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+    return {"p50_ms": samples[n // 2] * 1000, "p95_ms": samples[min(n - 1, int(n * 0.95))] * 1000,
+            "max_ms": samples[-1] * 1000}
+
+
+def bench_switch(trials=100, transport="unix", click_delay=0.040, ble_interval=0.030, seed=0):
+    """
+    End-to-end mode-switch latency, from the glove deciding to switch to the
+    host's switch handler running, for the control channel and for the
+    triple middle-click fallback.
+
+    The channel path sends real MODE_SWITCH frames over a local socket. The
+    click path replays esp32.ino's timing (click, 40 ms, click, 40 ms, click)
+    with each click delivered after a random wait for the next BLE connection
+    event (0..ble_interval), through ClickSequenceDetector.
+
+    Returns:
+        dict: path -> {"p50_ms", "p95_ms", "max_ms", "missed", "leaked_clicks"}
+    """
+    import os
+    import queue
+    import random
+    import tempfile
+
+    import control_channel as cc
+
+    # ---------- Control channel ----------
+    switched = queue.Queue()
+    if transport == "udp":
+        rx = cc.UdpTransport(0, host="127.0.0.1")
+        tx = cc.UdpTransport(peer=("127.0.0.1", rx.port))
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "airmouse-bench.sock")
+        rx = cc.UnixSocketTransport(path)
+        tx = cc.UnixSocketTransport(path, bind=False)
+    channel = cc.ControlChannel(rx, lambda mode, msg: switched.put(time.perf_counter())).start()
+    channel_lat, missed = [], 0
+    for seq in range(trials):
+        sent = time.perf_counter()
+        tx.send(cc.encode_frame(cc.MODE_SWITCH, seq, mode=cc.MODE_TOGGLE))
+        try:
+            channel_lat.append(switched.get(timeout=1.0) - sent)
+        except queue.Empty:
+            missed += 1
+        time.sleep(0.005)
+    tx.close()
+    channel.stop()
+    report = {"control channel (" + transport + ")": dict(_percentiles(channel_lat), missed=missed,
+                                                          leaked_clicks=0)}
+
+    # ---------- Triple middle click ----------
+    rng = random.Random(seed)
+    clicks = queue.Queue()
+    detector = cc.ClickSequenceDetector()
+    click_lat, missed = [], 0
+
+    def listener():
+        while True:
+            item = clicks.get()
+            if item is None:
+                return
+            pressed_at, last = item
+            if detector.click() and last:
+                switched.put(time.perf_counter() - pressed_at)
+
+    thread = threading.Thread(target=listener, daemon=True)
+    thread.start()
+    for _ in range(trials):
+        pressed_at = time.perf_counter()
+        for k in range(3):
+            # Firmware sends click k at k*click_delay; BLE delivers it at the next connection event
+            due = pressed_at + k * click_delay + rng.uniform(0, ble_interval)
+            time.sleep(max(0.0, due - time.perf_counter()))
+            clicks.put((pressed_at, k == 2))
+        try:
+            click_lat.append(switched.get(timeout=1.0))
+        except queue.Empty:
+            missed += 1
+        time.sleep(detector.threshold)  # Let the sequence expire between trials
+    clicks.put(None)
+    thread.join()
+    report["triple middle click"] = dict(_percentiles(click_lat), missed=missed, leaked_clicks=3 * trials)
+    return report
+
+
+def _firmware_pointer(samples, rate, loop_ms=10, sensitivity=650):
+    """esp32.ino airmouse_mode(): one sample per loop, -(gz / 650), gx / 650 in C integer maths."""
+    idx = np.arange(0, len(samples), max(1, int(rate * loop_ms / 1000)))
+    gx = samples["gx"][idx].astype(np.int64)
+    gz = samples["gz"][idx].astype(np.int64)
+    dx = -np.trunc(gz / sensitivity)
+    dy = np.trunc(gx / sensitivity)
+    return idx, np.cumsum(dx), np.cumsum(dy)
+
+
+def bench_imu(rates=(1000, 2000, 8000), seconds=10.0, batch_ms=10, gain=20.0):
+    """
+    IMU fusion throughput and pointer accuracy on synthetic glove data at
+    several sample rates, against the firmware's integer mapping.
+
+    Pointer error is the distance (px) between the cumulative pointer
+    position and the intended one (gain x upright rotation angle), sampled at
+    every batch end.
+
+    Returns:
+        dict: rate -> {"samples_per_s", "ingest_per_s", "rms_px", "end_px",
+        "firmware_rms_px", "firmware_end_px"}
+    """
+    from imu_fusion import AirMouseFusion, BatchDecoder, SyntheticSource, encode_batch
+
+    report = {}
+    for rate in rates:
+        source = SyntheticSource(rate=rate, seconds=seconds, batch=max(1, int(rate * batch_ms / 1000)))
+        batches = list(source.batches())
+        intended = gain * source.truth * np.array([-1.0, 1.0])  # Same signs as the firmware
+
+        fusion = AirMouseFusion(gain=gain)
+        start = time.perf_counter()
+        deltas = [fusion.process(b) for b in batches]
+        fuse_s = time.perf_counter() - start
+
+        # Wire path: decode the records from one byte stream, then fuse
+        stream = b"".join(encode_batch(b) for b in batches)
+        fusion2 = AirMouseFusion(gain=gain)
+        decoder = BatchDecoder()
+        start = time.perf_counter()
+        for i in range(0, len(stream), 4096):
+            for batch in decoder.feed(stream[i:i + 4096]):
+                fusion2.process(batch)
+        ingest_s = time.perf_counter() - start
+
+        ends = np.cumsum([len(b) for b in batches]) - 1
+        host = np.cumsum(np.array(deltas, dtype=np.float64), axis=0)
+        err = np.hypot(*(host - intended[ends]).T)
+        idx, fx, fy = _firmware_pointer(source.samples, rate)
+        ferr = np.hypot(fx - intended[idx, 0], fy - intended[idx, 1])
+
+        n = len(source.samples)
+        report[rate] = {
+            "samples_per_s": n / fuse_s,
+            "ingest_per_s": n / ingest_s,
+            "rms_px": float(np.sqrt((err ** 2).mean())),
+            "end_px": float(err[-1]),
+            "firmware_rms_px": float(np.sqrt((ferr ** 2).mean())),
+            "firmware_end_px": float(ferr[-1]),
+        }
+    return report
+
+
+# Runs in a fresh interpreter (benchmark.py itself imports cv2/mediapipe).
+# argv: mode ("eager" | "lazy"), frame source
+_STARTUP_CHILD = r'''
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+mode, source = sys.argv[1], sys.argv[2]
+t0 = time.perf_counter()
+if mode == "eager":
+    import gesture_logic  # What pyconnect used to do at module load
+import pyconnect
+imported = time.perf_counter() - t0
+pyconnect.GESTURE_SOURCE = source
+pyconnect.HEADLESS_MODE = True
+pyconnect.PREWARM_GESTURE_ENGINE = False  # Time the first toggle from cold
+pyconnect.start_mode_controller()
+
+listener = None
+try:
+    from pynput import mouse
+    listener = mouse.Listener(on_click=pyconnect.on_click)
+    listener.start()
+    listener.wait()
+except Exception:
+    listener = None  # No display / input permissions: time up to the listener's imports
+report = {"mode": mode, "import_s": imported, "listener_started": listener is not None,
+          "listener_ready_s": pyconnect.seconds_since_start(), "listener_ready_rss_mb": rss_mb()}
+
+pyconnect.set_cv_mode(True, "benchmark")
+pyconnect.mode_controller.wait_idle(120)
+engine = pyconnect.gesture_engine
+deadline = time.monotonic() + 120
+while engine is not None and engine.toggle_metrics["first_frame_ms"] is None and time.monotonic() < deadline:
+    time.sleep(0.005)
+report["first_frame_s"] = pyconnect.seconds_since_start()
+report["first_frame_rss_mb"] = rss_mb()
+pyconnect.mode_controller.stop()
+pyconnect.shutdown_cv_processing()
+if listener is not None:
+    listener.stop()
+print("STARTUP " + json.dumps(report), flush=True)
+'''
+
+
+def bench_startup(source, repeats=3):
+    """
+    Startup cost of pyconnect with the vision stack imported eagerly (old
+    behaviour) and lazily, each in a fresh interpreter: time and RSS when the
+    mouse listener is ready and when the first gesture frame is processed
+    after an immediate toggle.
+
+    Returns:
+        dict: mode -> median of the child reports
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = {}
+    for mode in ("eager", "lazy"):
+        runs = []
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, "-c", _STARTUP_CHILD, mode, str(source)], cwd=here,
+                                 capture_output=True, text=True, timeout=300).stdout
+            line = next((l for l in out.splitlines() if l.startswith("STARTUP ")), None)
+            if line is None:
+                raise RuntimeError(f"Startup child ({mode}) failed:\n{out}")
+            runs.append(json.loads(line[len("STARTUP "):]))
+        report[mode] = {key: (float(np.median([r[key] for r in runs]))
+                              if isinstance(runs[0][key], float) else runs[0][key])
+                        for key in runs[0]}
+    return report
+
+
+def _time_model_swap(detector, frames, modelComplexity):
+    # Requests a model swap and keeps feeding frames until the new graph is in,
+    # as the vision thread does when the quality governor changes level.
+    # blocking_ms is what building and warming the graph inline would stall
+    # it for.
+    start = time.perf_counter()
+    graph = detector._warmModel(modelComplexity)
+    blocking = time.perf_counter() - start
+    graph.close()
+
+    previous = detector.modelComplexity
+    start = time.perf_counter()
+    detector.setModelComplexity(modelComplexity)
+    call = time.perf_counter() - start
+    samples = []
+    while detector.modelSwapPending:
+        t = time.perf_counter()
+        detector.findHands(frames[len(samples) % len(frames)].copy(), draw=False)
+        samples.append(time.perf_counter() - t)
+    return {"from": previous, "to": modelComplexity, "blocking_ms": blocking * 1000,
+            "call_ms": call * 1000, "ready_ms": (time.perf_counter() - start) * 1000,
+            "frames": len(samples), "max_frame_ms": max(samples, default=0.0) * 1000}
+
+
+def bench_quality(source, budget_ms=33.0, load=3.0, fps=30.0, seconds=(10.0, 10.0, 20.0)):
+    """
+    Measures the per-frame cost of every quality level on a clip, then drives
+    a QualityGovernor with those costs on a simulated clock: normal load,
+    `load` x slower (a busy laptop) and normal again.
+
+    Returns:
+        dict: {"levels": name -> {"p50_ms", "p90_ms", "amortised_ms"},
+        "swaps": [{"from", "to", "blocking_ms", "call_ms", "ready_ms",
+        "frames", "max_frame_ms"}, ...],
+        "phases": [{"load", "level", "over_budget", "changes"}, ...]} where
+        swaps times each model complexity change (frames is how many were
+        detected on the old graph while the new one loaded, max_frame_ms the
+        slowest of them, including the swap itself) and
+        over_budget is the fraction of frames whose cost, amortised over the
+        frames the level skips, exceeded the budget.
+    """
+    from frame_sources import open_frame_source
+    from quality_governor import QUALITY_LEVELS, QualityGovernor
+
+    src = open_frame_source(source)
+    frames = []
+    while True:
+        success, img = src.read()
+        if not success:
+            break
+        frames.append(cv2.resize(img, (640, 480)))
+    src.release()
+    if not frames:
+        raise IOError(f"No frames in {source}")
+
+    costs, report = {}, {"levels": {}, "swaps": [], "phases": []}
+    detector = htm.handDetector(maxHands=1, detectionCon=0.75, trackCon=0.6)
+    for level in QUALITY_LEVELS:
+        detector.inferSize = level.inferSize
+        if level.modelComplexity != detector.modelComplexity:
+            report["swaps"].append(_time_model_swap(detector, frames, level.modelComplexity))
+        detector.findHands(frames[0].copy(), draw=False)  # Graph warm-up
+        samples = []
+        for img in frames:
+            start = time.perf_counter()
+            img = detector.findHands(img.copy(), draw=level.draw)
+            detector.findPosition(img, draw=False)
+            samples.append(time.perf_counter() - start)
+        costs[level.name] = np.array(samples)
+        report["levels"][level.name] = {
+            "p50_ms": float(np.median(samples)) * 1000,
+            "p90_ms": float(np.percentile(samples, 90)) * 1000,
+            "amortised_ms": float(np.median(samples)) * 1000 / (level.skip + 1),
+        }
+    if detector.modelComplexity != QUALITY_LEVELS[0].modelComplexity:
+        report["swaps"].append(_time_model_swap(detector, frames, QUALITY_LEVELS[0].modelComplexity))
+
+    clock = SimpleNamespace(now=0.0)
+    governor = QualityGovernor(budget_ms, clock=lambda: clock.now)
+    rng = np.random.default_rng(0)
+    for factor, duration in zip((1.0, load, 1.0), seconds):
+        end, over, processed, changes = clock.now + duration, 0, 0, governor.changes
+        while clock.now < end:
+            level = governor.level
+            cost = float(rng.choice(costs[level.name])) * factor
+            over += cost / (level.skip + 1) > governor.budget
+            processed += 1
+            governor.record(cost)
+            # Wait for the next camera frame, plus the frames the level skips
+            clock.now += max(cost, 1.0 / fps) + level.skip / fps
+        report["phases"].append({"load": factor, "level": governor.level.name,
+                                 "over_budget": over / processed,
+                                 "changes": governor.changes - changes})
+    return report
+
+
+def bench_controller(toggles=20, start_ms=800.0, stop_ms=300.0, event_hz=500.0, seed=0):
+    """
+    Mouse listener callback time while Gesture Mode is toggled with triple
+    middle clicks, when the switch runs inside the callback (the old on_click)
+    and when it goes through a ModeController. start/stop sleep start_ms /
+    stop_ms, standing in for a cold model load and a camera release.
+
+    Between toggles the listener also sees ordinary mouse events at event_hz,
+    and some toggles are doubled mid-transition; the controller must end in
+    the state the parity of the accepted toggles asks for.
+
+    Returns:
+        dict: mode -> {"callback_p50_us", "callback_p99_us", "callback_max_us",
+        "stalled_events", "transitions", "final_ok"}
+    """
+    import queue
+    import random
+
+    from control_channel import ClickSequenceDetector
+    from mode_controller import GESTURE, ModeController
+
+    def start():
+        time.sleep(start_ms / 1000)
+        return True
+
+    def stop():
+        time.sleep(stop_ms / 1000)
+
+    report = {}
+    for mode in ("inline", "controller"):
+        rng = random.Random(seed)
+        events = queue.Queue()
+        callback_times = []
+        state = {"active": False, "transitions": 0}
+        clicks = ClickSequenceDetector()
+        controller = ModeController(start, stop, ClickSequenceDetector()).start() if mode == "controller" else None
+
+        def on_click(middle):
+            t0 = time.perf_counter()
+            if middle:
+                if controller is not None:
+                    controller.click(time.monotonic())
+                elif clicks.click():
+                    state["active"] = not state["active"]  # Old path: switch inside the callback
+                    state["transitions"] += 1
+                    if state["active"]:
+                        start()
+                    else:
+                        stop()
+            callback_times.append(time.perf_counter() - t0)
+
+        def listener():
+            while True:
+                item = events.get()
+                if item is None:
+                    return
+                on_click(item[1])
+                item[2].append(time.perf_counter() - item[0])  # Posted -> handled
+
+        thread = threading.Thread(target=listener, daemon=True)
+        thread.start()
+        delays, expected = [], False
+        for _ in range(toggles):
+            repeats = 2 if rng.random() < 0.3 else 1  # Second toggle lands mid-transition
+            for _ in range(repeats):
+                for _ in range(3):
+                    events.put((time.perf_counter(), True, delays))
+                    time.sleep(0.04)
+                time.sleep(clicks.threshold)  # Let the sequence expire
+                expected = not expected
+            for _ in range(int(event_hz * 0.2)):  # Ordinary mouse traffic
+                events.put((time.perf_counter(), False, delays))
+                time.sleep(1 / event_hz)
+        events.put(None)
+        thread.join()
+        if controller is not None:
+            controller.wait_idle(60)
+            controller.stop()
+            final, transitions = controller.state == GESTURE, controller.transitions
+        else:
+            final, transitions = state["active"], state["transitions"]
+        callback_times.sort()
+        report[mode] = {
+            "callback_p50_us": callback_times[len(callback_times) // 2] * 1e6,
+            "callback_p99_us": callback_times[int(len(callback_times) * 0.99)] * 1e6,
+            "callback_max_us": callback_times[-1] * 1e6,
+            "stalled_events": sum(d > 0.05 for d in delays),  # Waited > 50 ms behind a callback
+            "transitions": transitions,
+            "final_ok": final == expected,
+        }
+    return report
+
+
+# Gesture-shaped actions with harmless keys, since uinput events reach the
+# real session: (kind, args, input events), where a key or wheel click is a
+# press and a release. The two scrolls cancel out.
+_INJECT_ACTIONS = (
+    ("press", ("shift", 3), 6),        # Volume: press(key, presses=3)
+    ("hotkey", ("shift", "ctrl"), 4),  # Next tab / window change
+    ("scroll", (80,), 160),
+    ("scroll", (-80,), 160),
+    ("moveTo", None, 1),               # Cursor; arguments filled in from size()
+)
+
+
+def bench_inject(backends=("pyautogui-pause", "pyautogui", "xtest", "uinput"), repeats=20, moves=2000,
+                 move_seconds=2.0):
+    """
+    Input injection cost per backend. "pyautogui-pause" is the pyautogui
+    module called directly (the old path, sleeping PAUSE after every call);
+    the others are action_sinks backends. Backends that can't open are
+    reported with their error. The move stream is up to `moves` moveTo()
+    calls, cut off after `move_seconds`.
+
+    Returns:
+        dict: backend -> {"actions": {kind: {"p50_ms", "p95_ms", "max_ms"}},
+        "moves_per_s", "events_per_s"} or {"error": str}
+    """
+    from action_sinks import open_sink
+
+    report = {}
+    for backend in backends:
+        try:
+            if backend == "pyautogui-pause":
+                import pyautogui as sink
+            else:
+                sink = open_sink(backend)
+        except Exception as e:
+            report[backend] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        w, h = sink.size()
+        centre = (w // 2, h // 2)
+        timings = {}
+        events = 0
+        busy = 0.0
+        for _ in range(repeats):
+            for kind, args, count in _INJECT_ACTIONS:
+                start = time.perf_counter()
+                getattr(sink, kind)(*(args or centre))
+                elapsed = time.perf_counter() - start
+                timings.setdefault(kind, []).append(elapsed)
+                events += count
+                busy += elapsed
+        start = time.perf_counter()
+        moved = 0
+        while moved < moves and time.perf_counter() - start < move_seconds:  # PAUSE makes moves slow
+            sink.moveTo(centre[0] + moved % 50, centre[1])
+            moved += 1
+        move_time = time.perf_counter() - start
+        sink.moveTo(*centre)
+        if hasattr(sink, "close") and backend != "pyautogui-pause":
+            sink.close()
+        report[backend] = {
+            "actions": {kind: _percentiles(samples) for kind, samples in timings.items()},
+            "moves_per_s": moved / move_time,
+            "events_per_s": (events + moved) / (busy + move_time),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gesture pipeline benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("tracking", help="Per-frame detection vs tracking mode FPS")
+    p.add_argument("clips", nargs="+", help="Recorded video clips")
+
+    p = sub.add_parser("landmarks", help="Per-frame landmark post-processing cost")
+    p.add_argument("--iterations", type=int, default=5000)
+
+    p = sub.add_parser("replay", help="Replay a recorded session and check its actions")
+    p.add_argument("source", help="Video file or directory of frames")
+    p.add_argument("--landmarks", help="Replay cached landmarks instead of running MediaPipe")
+    p.add_argument("--record-landmarks", help="Write a landmark cache while replaying")
+    p.add_argument("--golden", help="Expected action sequence (JSON)")
+    p.add_argument("--update-golden", action="store_true", help="Overwrite --golden with this run's actions")
+
+    p = sub.add_parser("cursor", help="Cursor filter lag/jitter on a recorded session")
+    p.add_argument("source", help="Video file or directory of frames")
+    p.add_argument("--landmarks", help="Use cached landmarks instead of running MediaPipe")
+
+    p = sub.add_parser("workers", help="Thread vs worker-process inference: FPS and listener latency")
+    p.add_argument("source", help="Video file or directory of frames")
+    p.add_argument("--loops", type=int, default=3, help="Passes over the clip per mode")
+
+    p = sub.add_parser("switch", help="Mode-switch latency: control channel vs triple middle click")
+    p.add_argument("--trials", type=int, default=100)
+    p.add_argument("--transport", choices=("unix", "udp"), default="unix")
+
+    p = sub.add_parser("imu", help="Host IMU fusion throughput and pointer accuracy vs firmware maths")
+    p.add_argument("--rates", type=float, nargs="+", default=[1000, 2000, 8000], help="Sample rates (Hz)")
+    p.add_argument("--seconds", type=float, default=10.0)
+
+    p = sub.add_parser("startup", help="pyconnect import time and RSS: eager vs lazy vision stack")
+    p.add_argument("source", help="Frame source for the first gesture frame (clip, frames dir or webcam index)")
+    p.add_argument("--repeats", type=int, default=3)
+
+    p = sub.add_parser("controller", help="Listener callback time and stalls: inline switching vs ModeController")
+    p.add_argument("--toggles", type=int, default=20)
+    p.add_argument("--start-ms", type=float, default=800.0, help="Simulated Gesture Mode start time")
+    p.add_argument("--stop-ms", type=float, default=300.0, help="Simulated Gesture Mode stop time")
+
+    p = sub.add_parser("inject", help="Input injection latency and events/s per backend (use a throwaway X server)")
+    p.add_argument("--backends", nargs="+", default=["pyautogui-pause", "pyautogui", "xtest", "uinput"])
+    p.add_argument("--repeats", type=int, default=20)
+
+    p = sub.add_parser("quality", help="Per-level cost and quality governor behaviour under a load spike")
+    p.add_argument("source", help="Video file or directory of frames")
+    p.add_argument("--budget-ms", type=float, default=33.0)
+    p.add_argument("--load", type=float, default=3.0, help="Slowdown factor of the loaded phase")
+
+    args = parser.parse_args()
+
+    if args.command == "tracking":
+        for clip in args.clips:
+            _print_tracking(clip, bench_tracking(clip))
+    elif args.command == "landmarks":
+        for numHands, r in bench_landmarks(args.iterations).items():
+            print(f"{numHands} hand(s): legacy {r['legacy_us']:7.1f} us/frame | "
+                  f"array {r['array_us']:7.1f} us/frame")
+    elif args.command == "controller":
+        for mode, r in bench_controller(args.toggles, args.start_ms, args.stop_ms).items():
+            print(f"{mode:>10}: callback p50={r['callback_p50_us']:.1f} p99={r['callback_p99_us']:.1f} "
+                  f"max={r['callback_max_us']:.0f} us | events stalled >50 ms: {r['stalled_events']} | "
+                  f"transitions={r['transitions']} final state {'ok' if r['final_ok'] else 'WRONG'}")
+    elif args.command == "inject":
+        for backend, r in bench_inject(args.backends, args.repeats).items():
+            if "error" in r:
+                print(f"{backend:>15}: unavailable ({r['error']})")
+                continue
+            actions = " | ".join(f"{kind} p50={a['p50_ms']:.2f} p95={a['p95_ms']:.2f} ms"
+                                 for kind, a in r["actions"].items())
+            print(f"{backend:>15}: {r['events_per_s']:9.0f} events/s, {r['moves_per_s']:8.0f} moves/s | {actions}")
+    elif args.command == "quality":
+        report = bench_quality(args.source, args.budget_ms, args.load)
+        print(f"\n=== {args.source} ===")
+        for name, r in report["levels"].items():
+            print(f"{name:>12}: p50={r['p50_ms']:6.2f} p90={r['p90_ms']:6.2f} ms | "
+                  f"amortised {r['amortised_ms']:6.2f} ms/camera frame")
+        for swap in report["swaps"]:
+            print(f"model {swap['from']} -> {swap['to']}: call {swap['call_ms']:6.2f} ms, "
+                  f"ready after {swap['ready_ms']:6.1f} ms / {swap['frames']} frame(s), "
+                  f"slowest frame {swap['max_frame_ms']:6.1f} ms (inline rebuild: {swap['blocking_ms']:6.1f} ms)")
+        for phase in report["phases"]:
+            print(f"load x{phase['load']:.1f}: settled on {phase['level']:>12} after {phase['changes']} change(s) | "
+                  f"{phase['over_budget'] * 100:5.1f}% of frames over {args.budget_ms:.0f} ms")
+    elif args.command == "startup":
+        for mode, r in bench_startup(args.source, args.repeats).items():
+            listener = "listener ready" if r["listener_started"] else "imports done (no listener)"
+            print(f"{mode:>6}: {listener} at {r['listener_ready_s']:.2f}s, {r['listener_ready_rss_mb']:.0f} MB | "
+                  f"first gesture frame at {r['first_frame_s']:.2f}s, {r['first_frame_rss_mb']:.0f} MB")
+    elif args.command == "imu":
+        for rate, r in bench_imu(args.rates, args.seconds).items():
+            print(f"{rate:6.0f} Hz: fuse {r['samples_per_s'] / 1e3:8.0f} k samples/s, decode+fuse "
+                  f"{r['ingest_per_s'] / 1e3:8.0f} k samples/s | pointer error rms {r['rms_px']:6.1f} px, "
+                  f"end {r['end_px']:6.1f} px | firmware rms {r['firmware_rms_px']:6.1f} px, "
+                  f"end {r['firmware_end_px']:6.1f} px")
+    elif args.command == "switch":
+        for path, r in bench_switch(args.trials, args.transport).items():
+            print(f"{path:>25}: p50={r['p50_ms']:.2f} p95={r['p95_ms']:.2f} max={r['max_ms']:.2f} ms | "
+                  f"missed={r['missed']} | middle clicks leaked to apps={r['leaked_clicks']}")
+    elif args.command == "workers":
+        print(f"\n=== {args.source} ===")
+        for mode, r in bench_workers(args.source, args.loops).items():
+            print(f"{mode:>8}: {r['fps']:6.1f} FPS over {r['frames']} frames | listener wake-up late "
+                  f"p50={r['late_p50_ms']:.2f} p95={r['late_p95_ms']:.2f} max={r['late_max_ms']:.2f} ms | "
+                  f"callback p95={r['callback_p95_ms']:.3f} ms")
+    elif args.command == "cursor":
+        print(f"\n=== {args.source} ===")
+        for name, r in bench_cursor(args.source, args.landmarks).items():
+            print(f"{name:>20}: lag {r['lag_ms']:6.1f} ms | jitter {r['jitter_px']:5.2f} px | "
+                  f"motion-to-photon {r['motion_to_photon_ms']:6.1f} ms")
+    elif args.command == "replay":
+        report = bench_replay(args.source, args.landmarks, args.record_landmarks)
+        lat = report["latency"]
+        print(f"\n=== {args.source} ===")
+        print(f"frames={report['frames']}  {report['fps']:.1f} FPS  "
+              f"frame latency p50={lat.get('p50_ms', 0):.2f} p95={lat.get('p95_ms', 0):.2f} "
+              f"p99={lat.get('p99_ms', 0):.2f} ms")
+        for stage, summary in report["stages"].items():
+            if summary.get("count"):
+                print(f"  {stage:>14}: p50={summary['p50_ms']:.3f} p95={summary['p95_ms']:.3f} ms")
+        print(f"actions ({len(report['actions'])}):")
+        for action in report["actions"]:
+            print(f"  {action}")
+        if args.golden:
+            if args.update_golden:
+                sink = RecordingSink()
+                sink.actions = report["actions"]
+                sink.save(args.golden)
+                print(f"Golden file written: {args.golden}")
+            else:
+                problems = compare_actions(report["actions"], load_golden(args.golden))
+                if problems:
+                    print("❌ Action sequence differs from golden:")
+                    for problem in problems:
+                        print(f"  {problem}")
+                    raise SystemExit(1)
+                print("✅ Action sequence matches golden")
+
+
+if __name__ == "__main__":
+    main()
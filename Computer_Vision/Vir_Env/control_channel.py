@@ -0,0 +1,338 @@
+"""
+Dedicated control channel between the glove and the host.
+
+The ESP32 signals a mode switch with three BLE middle clicks, which costs at
+least 2 x 40 ms, leaks middle clicks to the foreground app and misfires under
+BLE jitter. This module carries mode-switch, heartbeat and telemetry messages
+in a small binary framed protocol over a pluggable transport instead:
+
+    SerialTransport     USB/UART (needs pyserial)
+    UdpTransport        Wi-Fi / loopback
+    UnixSocketTransport local datagram socket, for tests and simulators
+
+Frame (little-endian):
+    b"\\xa5\\x5a", u8 version, u8 type, u16 seq, u8 payload length, payload,
+    u16 CRC-16/CCITT over everything before it
+
+The decoder resynchronises on the magic bytes, so stream transports can drop
+or split frames freely. Sequence numbers let the receiver drop duplicates
+(senders may repeat a mode switch for reliability) and count lost frames.
+ClickSequenceDetector keeps the triple middle-click signal as a fallback.
+"""
+import binascii
+import collections
+import os
+import socket
+import struct
+import threading
+import time
+
+MAGIC = b"\xa5\x5a"
+VERSION = 1
+_HEADER = struct.Struct("<2sBBHB")
+_CRC = struct.Struct("<H")
+
+# Message types and their payload layouts
+MODE_SWITCH = 1
+HEARTBEAT = 2
+TELEMETRY = 3
+PAYLOADS = {
+    MODE_SWITCH: (struct.Struct("<BI"), ("mode", "device_ms")),
+    HEARTBEAT: (struct.Struct("<I"), ("device_ms",)),
+    TELEMETRY: (struct.Struct("<I3h2H"), ("device_ms", "gyro_x", "gyro_y", "gyro_z",
+                                          "flex_left", "flex_right")),
+}
+
+# MODE_SWITCH modes
+MODE_AIR_MOUSE = 0
+MODE_GESTURE = 1
+MODE_TOGGLE = 2
+
+# A decoded message; fields is a dict named after PAYLOADS, received is
+# time.monotonic() on arrival.
+Message = collections.namedtuple("Message", "type seq fields received")
+
+
+def encode_frame(msg_type, seq, **fields):
+    """Packs one message into a frame."""
+    layout, names = PAYLOADS[msg_type]
+    payload = layout.pack(*(fields.get(name, 0) for name in names))
+    body = _HEADER.pack(MAGIC, VERSION, msg_type, seq & 0xFFFF, len(payload)) + payload
+    return body + _CRC.pack(binascii.crc_hqx(body, 0xFFFF))
+
+
+class FrameDecoder:
+    """Incremental decoder: feed() raw bytes, get complete messages back."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.bad_frames = 0
+
+    def feed(self, data):
+        self._buf += data
+        messages = []
+        buf = self._buf
+        while True:
+            start = buf.find(MAGIC)
+            if start < 0:
+                del buf[:max(0, len(buf) - 1)]  # Keep a possible half magic
+                return messages
+            del buf[:start]
+            if len(buf) < _HEADER.size:
+                return messages
+            _, version, msg_type, seq, length = _HEADER.unpack_from(buf)
+            layout = PAYLOADS.get(msg_type)
+            if version != VERSION or layout is None or layout[0].size != length:
+                # Reject a bad header now rather than waiting for `length`
+                # bytes, which would hold back the valid frames behind it
+                self.bad_frames += 1
+                del buf[:1]  # Resync from the next byte
+                continue
+            end = _HEADER.size + length + _CRC.size
+            if len(buf) < end:
+                return messages
+            body = bytes(buf[:end - _CRC.size])
+            (crc,) = _CRC.unpack_from(buf, end - _CRC.size)
+            if crc != binascii.crc_hqx(body, 0xFFFF):
+                self.bad_frames += 1
+                del buf[:1]  # Resync from the next byte
+                continue
+            values = layout[0].unpack_from(body, _HEADER.size)
+            messages.append(Message(msg_type, seq, dict(zip(layout[1], values)), time.monotonic()))
+            del buf[:end]
+
+
+# ========== Transports ==========
+# A transport provides recv(timeout) -> bytes (b"" on timeout), send(data)
+# and close().
+
+class UdpTransport:
+    """
+    UDP socket. Bind to (host, port) to receive; give `peer` to send.
+    `bufsize` is the largest datagram recv() returns whole; longer ones are
+    truncated by the kernel.
+
+    Frames are not authenticated, so the default only accepts them from this
+    machine. Binding to a LAN address (e.g. "0.0.0.0" for a Wi-Fi glove) lets
+    anyone on that network switch modes; only do it on a trusted network.
+    """
+
+    def __init__(self, port=5005, host="127.0.0.1", peer=None, bufsize=512):
+        self.peer = peer
+        self.bufsize = bufsize
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if peer is None:
+            self._sock.bind((host, port))
+            self.port = self._sock.getsockname()[1]  # Resolves port=0
+
+    def recv(self, timeout=0.5):
+        self._sock.settimeout(timeout)
+        try:
+            return self._sock.recv(self.bufsize)
+        except socket.timeout:
+            return b""
+
+    def send(self, data):
+        self._sock.sendto(data, self.peer)
+
+    def close(self):
+        self._sock.close()
+
+
+class UnixSocketTransport:
+    """
+    Local datagram socket at `path`. The receiving side binds it (removing a
+    stale socket file); pass bind=False to send to it. `bufsize` as for
+    UdpTransport.
+    """
+
+    def __init__(self, path, bind=True, bufsize=512):
+        self.path = path
+        self.bound = bind
+        self.bufsize = bufsize
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        if bind:
+            if os.path.exists(path):
+                os.unlink(path)
+            self._sock.bind(path)
+
+    def recv(self, timeout=0.5):
+        self._sock.settimeout(timeout)
+        try:
+            return self._sock.recv(self.bufsize)
+        except socket.timeout:
+            return b""
+
+    def send(self, data):
+        self._sock.sendto(data, self.path)
+
+    def close(self):
+        self._sock.close()
+        if self.bound and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class SerialTransport:
+    """Serial port (e.g. the ESP32's USB UART). Requires pyserial."""
+
+    def __init__(self, port, baudrate=115200):
+        try:
+            import serial
+        except ImportError:
+            raise ImportError("SerialTransport needs pyserial: pip install pyserial")
+        self._serial = serial.Serial(port, baudrate, timeout=0.5)
+
+    def recv(self, timeout=0.5):
+        self._serial.timeout = timeout
+        first = self._serial.read(1)  # Blocks up to timeout
+        return first + self._serial.read(self._serial.in_waiting) if first else b""
+
+    def send(self, data):
+        self._serial.write(data)
+
+    def close(self):
+        self._serial.close()
+
+
+def open_transport(spec, bufsize=512):
+    """
+    Opens a receiving transport from a spec string:
+    "udp:[<host>:]<port>", "unix:<path>" or "serial:<device>[@<baud>]".
+    UDP binds to 127.0.0.1 unless a host is given (see UdpTransport).
+    `bufsize` must cover the largest datagram the sender produces.
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "udp":
+        host, _, port = arg.rpartition(":")
+        return UdpTransport(int(port), host or "127.0.0.1", bufsize=bufsize)
+    if kind == "unix":
+        return UnixSocketTransport(arg, bufsize=bufsize)
+    if kind == "serial":
+        device, _, baud = arg.partition("@")
+        return SerialTransport(device, int(baud) if baud else 115200)
+    raise ValueError(f"Unknown control transport: {spec!r}")
+
+
+# ========== Channel ==========
+
+class ControlChannel:
+    """
+    Receives control messages on a background thread and dispatches them.
+
+    Args:
+        transport: Receiving transport (see open_transport).
+        on_mode_switch (callable): Called with (mode, message) for each new
+            MODE_SWITCH; duplicates (same or older seq) are dropped.
+        on_telemetry (callable): Optional, called with each TELEMETRY message.
+        heartbeat_timeout (float): Seconds without any message after which
+            the link is reported down.
+    """
+
+    def __init__(self, transport, on_mode_switch, on_telemetry=None, heartbeat_timeout=3.0):
+        self.transport = transport
+        self.on_mode_switch = on_mode_switch
+        self.on_telemetry = on_telemetry
+        self.heartbeat_timeout = heartbeat_timeout
+        self.decoder = FrameDecoder()
+        self.telemetry = None  # Latest TELEMETRY fields
+        self.received = 0
+        self.duplicates = 0
+        self.lost = 0
+        self._last_seq = None
+        self._last_seen = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ControlChannel", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.transport.close()
+
+    def link_up(self):
+        """True if a message arrived within heartbeat_timeout."""
+        return self._last_seen is not None and time.monotonic() - self._last_seen < self.heartbeat_timeout
+
+    def stats(self):
+        return {
+            "link_up": self.link_up(),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "lost": self.lost,
+            "bad_frames": self.decoder.bad_frames,
+            "telemetry": self.telemetry,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data = self.transport.recv(timeout=0.2)
+            except OSError as e:
+                if self._stop.is_set():
+                    return
+                print(f"⚠️ Control channel read failed: {e}", flush=True)
+                time.sleep(0.5)
+                continue
+            if data:
+                for message in self.decoder.feed(data):
+                    self.handle(message)
+
+    def _is_new(self, seq):
+        # u16 sequence with wrap-around: "newer" means 1..32767 ahead
+        if self._last_seq is None:
+            return True
+        ahead = (seq - self._last_seq) & 0xFFFF
+        if ahead == 0 or ahead >= 0x8000:
+            return False
+        self.lost += ahead - 1
+        return True
+
+    def handle(self, message):
+        """Dedupes and dispatches one decoded message."""
+        if not self.link_up():
+            self._last_seq = None  # Link was down (e.g. device reboot): resync on this seq
+        self._last_seen = message.received
+        if not self._is_new(message.seq):
+            self.duplicates += 1
+            return
+        self._last_seq = message.seq
+        self.received += 1
+        if message.type == MODE_SWITCH:
+            self.on_mode_switch(message.fields["mode"], message)
+        elif message.type == TELEMETRY:
+            self.telemetry = message.fields
+            if self.on_telemetry is not None:
+                self.on_telemetry(message)
+
+
+class ClickSequenceDetector:
+    """
+    Fallback mode-switch signal: `count` clicks, each within `threshold`
+    seconds of the previous one.
+    """
+
+    def __init__(self, threshold=0.20, count=3):
+        self.threshold = threshold
+        self.count = count
+        self.clicks = 0
+        self.last_click = 0.0
+
+    def click(self, now=None):
+        """Registers one click; True when it completes a sequence."""
+        now = time.monotonic() if now is None else now
+        interval = now - self.last_click
+        self.clicks = self.clicks + 1 if interval < self.threshold else 1
+        self.last_click = now
+        if self.clicks >= self.count:
+            self.clicks = 0
+            self.last_click = 0.0
+            return True
+        return False
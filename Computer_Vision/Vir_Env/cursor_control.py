@@ -0,0 +1,122 @@
+"""
+Camera-driven cursor control: maps the index fingertip from the frameR box to
+screen coordinates through an adaptive One-Euro filter, with optional
+prediction ahead by the measured pipeline latency.
+
+One-Euro filter: Casiez, Roussel & Vogel, CHI 2012. The cutoff frequency rises
+with speed, so slow movements are smoothed hard (no jitter) while fast
+movements pass through with little lag.
+"""
+import math
+
+import numpy as np
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter over a fixed-size vector (e.g. x, y).
+
+    Args:
+        min_cutoff (float): Cutoff (Hz) at rest; lower = steadier when still.
+        beta (float): How fast the cutoff rises with speed; higher = less lag.
+        d_cutoff (float): Cutoff (Hz) for the derivative estimate.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None   # Filtered value
+        self.dx = None  # Filtered derivative (units per second)
+        self.t = None
+
+    def __call__(self, value, t):
+        value = np.asarray(value, dtype=np.float64)
+        if self.x is None or t <= self.t:
+            self.x = value.copy()
+            self.dx = np.zeros_like(value)
+            self.t = t
+            return self.x
+        dt = t - self.t
+        self.t = t
+
+        a_d = _alpha(self.d_cutoff, dt)
+        self.dx = self.dx + a_d * ((value - self.x) / dt - self.dx)
+        cutoff = self.min_cutoff + self.beta * float(np.hypot(*self.dx[:2]))
+        a = _alpha(cutoff, dt)
+        self.x = self.x + a * (value - self.x)
+        return self.x
+
+
+class CursorMapper:
+    """
+    Maps fingertip pixels inside the frameR box to screen coordinates.
+
+    Args:
+        frame_size (tuple): Camera frame (w, h).
+        screen_size (tuple): Screen (w, h).
+        frameR (int): Margin in pixels; the inner box maps to the full screen.
+        min_cutoff, beta: One-Euro parameters, applied in screen pixels.
+        mirror (bool): Flip x so moving the hand right moves the cursor right
+            on an unflipped webcam image.
+        reset_gap (float): Seconds without updates after which the filter restarts.
+        inset (int): Pixels kept clear of the screen edges. The default 1
+            stays off pyautogui's FAILSAFE corners, which would otherwise
+            make every later injected action raise.
+    """
+
+    def __init__(self, frame_size, screen_size, frameR=100, min_cutoff=1.0, beta=0.01,
+                 mirror=True, reset_gap=0.25, inset=1):
+        self.frame_w, self.frame_h = frame_size
+        self.screen_w, self.screen_h = screen_size
+        self.frameR = frameR
+        self.mirror = mirror
+        self.reset_gap = reset_gap
+        self.inset = inset
+        self.filter = OneEuroFilter(min_cutoff, beta)
+        self._last_t = None
+
+    def map_raw(self, x, y):
+        """Fingertip pixels -> unfiltered screen coordinates."""
+        r = self.frameR
+        sx = np.interp(x, (r, self.frame_w - r), (0, self.screen_w - 1))
+        sy = np.interp(y, (r, self.frame_h - r), (0, self.screen_h - 1))
+        if self.mirror:
+            sx = self.screen_w - 1 - sx
+        return sx, sy
+
+    def update(self, x, y, t, lead=0.0):
+        """
+        Feeds one fingertip sample and returns the cursor position.
+
+        Args:
+            x, y: Fingertip in frame pixels.
+            t (float): Capture timestamp in seconds.
+            lead (float): Seconds to predict ahead (e.g. measured
+                capture-to-injection latency), using the filtered velocity.
+
+        Returns:
+            tuple: Integer screen (x, y), clamped to the screen less `inset`.
+        """
+        if self._last_t is not None and t - self._last_t > self.reset_gap:
+            self.filter.reset()
+        self._last_t = t
+        pos = self.filter(self.map_raw(x, y), t)
+        if lead > 0:
+            pos = pos + self.filter.dx * lead
+        e = self.inset
+        sx = int(min(max(pos[0], e), self.screen_w - 1 - e))
+        sy = int(min(max(pos[1], e), self.screen_h - 1 - e))
+        return sx, sy
+
+    def reset(self):
+        self.filter.reset()
+        self._last_t = None
@@ -0,0 +1,102 @@
+import threading
+import time
+
+
+class FrameGrabber:
+    """
+    Reads frames from a capture device on its own thread and keeps only the
+    newest one (a 1-slot, drop-oldest buffer), so the consumer never works on
+    frames that queued up while it was busy.
+
+    Args:
+        cap: An opened cv2.VideoCapture (or anything with read()/isOpened()).
+        metrics (PipelineMetrics): Optional; cap.read() time is recorded as "capture".
+    """
+
+    def __init__(self, cap, metrics=None):
+        self.cap = cap
+        self.metrics = metrics
+        self._cond = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._seq = 0          # Sequence number of the frame in the slot
+        self._last_taken = 0    # Sequence number last handed to the consumer
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        """Starts the capture thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """Stops the capture thread. Does not release the capture device."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            success, img = self.cap.read()
+            timestamp = time.monotonic()
+            if self.metrics is not None:
+                self.metrics.record("capture", time.perf_counter() - start)
+            if not success:
+                self.failed += 1
+                time.sleep(0.01)  # Prevent tight loop on error
+                continue
+            with self._cond:
+                if self._seq != self._last_taken:
+                    self.dropped += 1  # Previous frame was never consumed
+                self._frame = img
+                self._timestamp = timestamp
+                self._seq += 1
+                self.captured += 1
+                self._cond.notify()
+
+    def read(self, timeout=1.0):
+        """
+        Waits for a frame newer than the last one returned.
+
+        Args:
+            timeout (float): Max seconds to wait for a new frame.
+
+        Returns:
+            tuple: (success, img, timestamp) where timestamp is the
+            time.monotonic() value taken right after the frame was captured.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self._seq != self._last_taken or self._stop_event.is_set(),
+                    timeout=timeout):
+                return False, None, 0.0
+            if self._seq == self._last_taken:  # Woken by stop()
+                return False, None, 0.0
+            img, timestamp = self._frame, self._timestamp
+            self._frame = None  # Hand ownership to the consumer
+            self._last_taken = self._seq
+            self.processed += 1
+        return True, img, timestamp
+
+    def stats(self):
+        """Returns the frame counters."""
+        return {
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
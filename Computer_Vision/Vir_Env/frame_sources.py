@@ -0,0 +1,160 @@
+"""
+Pluggable frame sources for the gesture pipeline.
+
+Every source looks like a cv2.VideoCapture (read/isOpened/set/release) plus:
+    realtime (bool): True for live cameras. Live sources are read through a
+        FrameGrabber thread that drops stale frames; recorded sources are read
+        frame by frame so replays are deterministic.
+    frame_time (float): Media time in seconds of the last frame read (recorded
+        sources only), used in place of the wall clock during replays.
+"""
+import os
+import time
+
+import cv2
+
+from frame_grabber import FrameGrabber
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class WebcamSource:
+    """Live camera via cv2.VideoCapture."""
+
+    realtime = True
+
+    def __init__(self, index=0, width=640, height=480):
+        self.cap = cv2.VideoCapture(index)
+        if self.cap.isOpened():
+            self.cap.set(3, width)
+            self.cap.set(4, height)
+        self.frame_time = None
+
+    def read(self):
+        return self.cap.read()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource:
+    """Recorded clip, read at whatever speed the consumer asks for frames."""
+
+    realtime = False
+
+    def __init__(self, path):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.index = 0
+        self.frame_time = 0.0
+
+    def read(self):
+        success, img = self.cap.read()
+        if success:
+            # Frame index based, so it is exact even for containers with poor timestamps
+            self.frame_time = self.index / self.fps
+            self.index += 1
+        return success, img
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return False  # Size is fixed by the recording
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirSource:
+    """Directory of frames (sorted by file name) played back at `fps`."""
+
+    realtime = False
+
+    def __init__(self, path, fps=30.0):
+        self.path = path
+        self.fps = fps
+        self.files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.index = 0
+        self.frame_time = 0.0
+
+    def read(self):
+        while self.index < len(self.files):
+            img = cv2.imread(self.files[self.index])
+            self.frame_time = self.index / self.fps
+            self.index += 1
+            if img is not None:
+                return True, img
+        return False, None
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.index = len(self.files)
+
+
+def open_frame_source(spec=0, width=640, height=480):
+    """
+    Opens a frame source from a spec: a webcam index (int or digit string),
+    a video file path, or a directory of images.
+    """
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return WebcamSource(int(spec), width, height)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec)
+    return VideoFileSource(spec)
+
+
+class SequentialReader:
+    """
+    Non-threaded counterpart of FrameGrabber for recorded sources: every frame
+    is delivered, in order, tagged with its media time. Sets `exhausted` at the
+    end of the recording.
+    """
+
+    def __init__(self, source, metrics=None):
+        self.source = source
+        self.metrics = metrics
+        self.exhausted = False
+        self.captured = 0
+        self.processed = 0
+
+    def start(self):
+        return self
+
+    def stop(self, timeout=1.0):
+        pass
+
+    def read(self, timeout=1.0):
+        start = time.perf_counter()
+        success, img = self.source.read()
+        if self.metrics is not None:
+            self.metrics.record("capture", time.perf_counter() - start)
+        if not success:
+            self.exhausted = True
+            return False, None, 0.0
+        self.captured += 1
+        self.processed += 1
+        return True, img, self.source.frame_time
+
+    def stats(self):
+        return {"captured": self.captured, "dropped": 0, "processed": self.processed, "failed": 0}
+
+
+def make_reader(source, metrics=None):
+    """FrameGrabber for live sources, SequentialReader for recordings."""
+    if getattr(source, "realtime", True):
+        return FrameGrabber(source, metrics=metrics).start()
+    return SequentialReader(source, metrics=metrics)
@@ -0,0 +1,179 @@
+"""
+Temporal gesture recognition: a declarative gesture table evaluated against a
+fixed-size ring buffer of recent landmark frames.
+
+Each gesture has enter/exit hysteresis: its finger pattern must hold for
+`enter` seconds before it activates, and it stays active until the pattern
+has been missing for `exit` seconds, so a single misdetected frame neither
+fires nor cancels a gesture. Motion gestures (e.g. the volume swipe) use a
+least-squares velocity over the window instead of frame-to-frame diffs.
+Every update touches the same number of samples and table rows, so the
+per-frame cost does not depend on how long a gesture has been held.
+"""
+import collections
+
+import numpy as np
+
+import HandTrackingModule as htm
+
+# A gesture definition.
+#   name: Unique name; also the dispatcher cooldown key.
+#   fingers: 5-tuple from fingersUp() (thumb..pinky); None = don't care.
+#   action: (kind, target, amount) for ActionDispatcher.submit. For motion
+#       gestures target is a (negative, positive) velocity pair.
+#   message: Console message (a pair for motion gestures), or None.
+#   enter: Seconds the pattern must hold before the gesture activates.
+#   exit: Seconds the pattern must be missing before it deactivates.
+#   repeat: None fires once on activation, 0 every matching frame, otherwise
+#       at most every `repeat` seconds while active.
+#   points: Landmark ids whose mean is the gesture's control point.
+#   axis: 0 (x) or 1 (y) for motion gestures, else None.
+#   threshold: Min |velocity| in px/s along `axis` for a motion gesture to fire.
+GestureSpec = collections.namedtuple(
+    "GestureSpec", "name fingers action message enter exit repeat points axis threshold",
+    defaults=(0.1, 0.15, None, None, None, None))
+
+# Emitted when a gesture should act. velocity is the control point's px/s
+# (x, y) over the window; point is its current pixel position.
+GestureEvent = collections.namedtuple("GestureEvent", "spec phase point velocity")
+
+
+class LandmarkHistory:
+    """
+    Ring buffer of the last `size` frames: timestamps, pixel landmarks,
+    finger states and whether a hand was present.
+    """
+
+    def __init__(self, size=16):
+        self.size = size
+        self.times = np.full(size, -np.inf)
+        self.points = np.zeros((size, htm.NUM_LANDMARKS, 2), dtype=np.float32)
+        self.fingers = np.zeros((size, 5), dtype=np.int8)
+        self.valid = np.zeros(size, dtype=bool)
+        self.head = 0  # Next slot to write
+        self._back = np.arange(size)  # Offsets newest -> oldest
+
+    def push(self, t, pixels=None, fingers=None):
+        """Stores one frame; pixels/fingers are None when no hand was found."""
+        i = self.head
+        self.times[i] = t
+        self.valid[i] = pixels is not None and len(pixels) > 0
+        if self.valid[i]:
+            self.points[i] = pixels
+            self.fingers[i] = fingers
+        self.head = (i + 1) % self.size
+
+    def latest(self):
+        return (self.head - 1) % self.size
+
+    def velocity(self, points, since):
+        """
+        Least-squares velocity (px/s, x and y) of the mean of `points` over the
+        buffered frames newer than `since`. Zero with fewer than 3 samples.
+        """
+        idx = (self.head - 1 - self._back) % self.size
+        t = self.times[idx]
+        ok = self.valid[idx] & (t >= since)
+        if np.count_nonzero(ok) < 3:
+            return np.zeros(2)
+        t = t[ok]
+        p = self.points[idx[ok]][:, points].mean(axis=1)
+        tc = t - t.mean()
+        denom = float((tc * tc).sum())
+        if denom <= 0:
+            return np.zeros(2)
+        return (tc[:, None] * (p - p.mean(axis=0))).sum(axis=0) / denom
+
+    def reset(self):
+        self.times[:] = -np.inf
+        self.valid[:] = False
+
+
+class GestureStateMachine:
+    """
+    Tracks which gesture in `specs` is active and decides when it fires.
+
+    Table order is priority: the first row whose pattern matches wins.
+
+    Args:
+        specs: Sequence of GestureSpec.
+        window (int): Ring buffer length in frames (velocity window).
+    """
+
+    def __init__(self, specs, window=16):
+        self.specs = tuple(specs)
+        self.history = LandmarkHistory(window)
+        pattern = np.array([[-1 if f is None else f for f in s.fingers] for s in self.specs],
+                           dtype=np.int8).reshape(-1, 5)
+        self._pattern = pattern
+        self._care = pattern >= 0
+        self.reset()
+
+    def reset(self):
+        self.history.reset()
+        self.active = None        # Index of the active spec
+        self.candidate = -1       # Spec matched by the latest frames (-1 = none)
+        self.candidate_since = 0.0
+        self.entered_at = 0.0
+        self.last_match = 0.0
+        self.next_fire = 0.0
+        self._fired_once = False
+
+    @property
+    def active_name(self):
+        return None if self.active is None else self.specs[self.active].name
+
+    def match(self, fingers):
+        """Index of the first spec matching `fingers`, or -1."""
+        if fingers is None or not len(self._pattern):
+            return -1
+        hits = ((self._pattern == np.asarray(fingers, dtype=np.int8)) | ~self._care).all(axis=1)
+        return int(np.argmax(hits)) if hits.any() else -1
+
+    def update(self, t, pixels=None, fingers=None):
+        """
+        Feeds one frame and returns a GestureEvent if the active gesture
+        should act on it, else None.
+
+        Args:
+            t (float): Frame timestamp in seconds.
+            pixels: (21, 2) landmark pixels, or None without a hand.
+            fingers: fingersUp() list for the hand, or None.
+        """
+        self.history.push(t, pixels, fingers)
+        m = self.match(fingers)
+        if m != self.candidate:
+            self.candidate, self.candidate_since = m, t
+
+        phase = None
+        if self.active is not None:
+            if m == self.active:
+                self.last_match = t
+            elif t - self.last_match >= self.specs[self.active].exit:
+                self.active = None
+        if self.active is None and m >= 0 and t - self.candidate_since >= self.specs[m].enter:
+            self.active, phase = m, "enter"
+            self.entered_at = self.last_match = self.next_fire = t
+            self._fired_once = False
+
+        # Only act on frames that actually show the gesture
+        if self.active is None or m != self.active:
+            return None
+        spec = self.specs[self.active]
+        if spec.repeat is None:
+            if self._fired_once:
+                return None
+        elif t < self.next_fire:
+            return None
+
+        point = velocity = None
+        if spec.points is not None:
+            point = self.history.points[self.history.latest()][list(spec.points)].mean(axis=0)
+            if spec.threshold is not None:
+                velocity = self.history.velocity(list(spec.points), self.entered_at)
+                if abs(velocity[spec.axis]) < spec.threshold:
+                    return None
+        self._fired_once = True
+        if spec.repeat:
+            self.next_fire = t + spec.repeat
+        return GestureEvent(spec, phase or "hold", point, velocity)
@@ -7,188 +7,561 @@ except ImportError:
     print("Ensure HandTrackingModule.py is in the same directory.")
     exit()
 import time
-import pyautogui
 import threading # Needed for stop_event check
-
-def run_gesture_control(stop_event):
+import signal
+from frame_sources import open_frame_source, make_reader
+from action_dispatcher import ActionDispatcher
+from action_sinks import open_sink
+from cursor_control import CursorMapper
+from gesture_fsm import GestureSpec, GestureStateMachine
+from pipeline_metrics import PipelineMetrics, JsonLinesExporter, MetricsHttpServer
+from preview_stream import PreviewStream
+from quality_governor import QualityGovernor
+
+WINDOW_NAME = "Gesture Control Active"
+
+# ========== Gesture Table ==========
+# Fingers are (thumb, index, middle, ring, pinky) from fingersUp(); None = any.
+# Earlier rows win when patterns overlap. See gesture_fsm.GestureSpec.
+GESTURES = (
+    # Index finger up only: cursor follows the fingertip every frame
+    GestureSpec("cursor", (0, 1, 0, 0, 0), ("move", None, 1), None,
+                enter=0.05, exit=0.15, repeat=0, points=(8,)),
+    # Index + middle up, swiped vertically: volume (hand up = louder)
+    GestureSpec("volume", (None, 1, 1, 0, 0), ("press", ("volumeup", "volumedown"), 3),
+                ("🔊 Volume Up", "🔉 Volume Down"),
+                enter=0.1, exit=0.15, repeat=0.15, points=(8, 12), axis=1, threshold=400.0),
+    GestureSpec("scroll_up", (1, 1, 1, 1, 1), ("scroll", None, 80), "📜 Scrolling Up",
+                enter=0.1, exit=0.15, repeat=0.15),
+    GestureSpec("scroll_down", (0, 0, 0, 0, 0), ("scroll", None, -80), "📜 Scrolling Down",
+                enter=0.1, exit=0.15, repeat=0.15),
+    # Thumb + index up: one tab per entry into the pose
+    GestureSpec("next_tab", (1, 1, 0, 0, 0), ("hotkey", ("ctrl", "tab"), 1), "📄 Next Tab",
+                enter=0.15, exit=0.2),
+    GestureSpec("prev_window", (1, 1, 0, 0, 1), ("hotkey", ("alt", "tab"), 1), "📄 Window change",
+                enter=0.15, exit=0.2),
+)
+
+
+class GestureEngine:
     """
-    Runs the hand gesture recognition loop.
+    Long-lived gesture recognition engine.
+
+    The camera and the MediaPipe model are initialised once (at warm_up() or
+    lazily on the first resume()), so toggling Gesture Mode only pauses or
+    resumes processing. While paused the camera stays open; after
+    `idle_timeout` seconds paused it is released and re-opened on the next
+    resume.
 
     Args:
-        stop_event (threading.Event): An event that signals when this function should stop.
+        cam_index (int): Webcam index passed to cv2.VideoCapture.
+        source: Frame source spec for frame_sources.open_frame_source (webcam
+            index, video file or image directory). Defaults to cam_index.
+            Recorded sources are processed frame by frame with media-time
+            timestamps and the loop ends when they run out.
+        sink: Action sink (see action_sinks). Defaults to
+            open_sink(input_backend).
+        input_backend (str): "auto", "xtest", "uinput" or "pyautogui"; used
+            when no sink is given.
+        landmark_cache (str): Replay landmarks from this cache file instead of
+            running MediaPipe.
+        record_landmarks (str): Write every frame's landmarks to this cache file.
+        synchronous_actions (bool): Inject actions inline instead of on the
+            dispatcher thread (deterministic replays).
+        inference_process (bool): Run MediaPipe in a separate worker process
+            (inference_worker.ProcessDetector) so it doesn't share the GIL
+            with the mouse listener and action injection.
+        latency_budget (float): Per-frame processing budget in ms held by the
+            quality governor on live sources, which lowers inference
+            resolution, model complexity, overlay drawing and frame rate when
+            it is exceeded. None keeps full quality.
+        idle_timeout (float): Seconds paused before the camera is released.
+            None keeps it open until shutdown().
+        metrics_path (str): Append per-stage latency snapshots as JSON lines
+            to this file ("-" for stdout). None disables the export.
+        metrics_interval (float): Seconds between JSON-line snapshots.
+        metrics_port (int): Serve snapshots at http://127.0.0.1:<port>/metrics.
+        headless (bool): No HighGUI window and no overlay drawing; stop only
+            via shutdown()/stop_event (e.g. from a signal handler).
+        preview_port (int): Serve a low-rate MJPEG debug preview at
+            http://127.0.0.1:<port>/preview.mjpg. Overlays are only drawn on
+            the frames that go out on it.
+        preview_fps (float): Max preview frame rate.
     """
-    print("--- GESTURE CONTROL: Initializing... ---", flush=True)
 
-    # ========== Config ==========
-    wCam, hCam = 640, 480
-    frameR = 100  # Frame Reduction for cursor movement zone
-    smoothening = 5 # Factor to smoothen mouse movement (adjust as needed)
-    # prevYScroll = 0 # No longer needed for scroll gesture itself
-    prevYVol = 0 # Previous vertical position for volume control
-    pTime = 0
-    plocX, plocY = 0, 0 # Previous location (for potential mouse move)
-    clocX, clocY = 0, 0 # Current location (for potential mouse move)
+    def __init__(self, cam_index=0, idle_timeout=None,
+                 metrics_path=None, metrics_interval=5.0, metrics_port=None,
+                 headless=False, preview_port=None, preview_fps=5.0,
+                 source=None, sink=None, landmark_cache=None, record_landmarks=None,
+                 synchronous_actions=False, inference_process=False, latency_budget=33.0,
+                 input_backend="auto"):
+        # ========== Config ==========
+        self.cam_index = cam_index
+        self.source_spec = cam_index if source is None else source
+        self.sink = sink
+        self.input_backend = input_backend
+        self._own_sink = sink is None # Close only a sink we opened
+        self.landmark_cache = landmark_cache
+        self.record_landmarks = record_landmarks
+        self.synchronous_actions = synchronous_actions
+        self.inference_process = inference_process
+        self.idle_timeout = idle_timeout
+        self.wCam, self.hCam = 640, 480
+        self.inferRes = None # e.g. (320, 240) to trade landmark accuracy for latency on weak machines
+        self.motionThreshold = 3.0 # Mean grey-level change in the hand bbox below which inference is skipped (None = off)
+        self.motionMaxReuse = 5 # Max consecutive frames that may reuse cached landmarks
+        self.frameR = 100  # Frame Reduction for cursor movement zone
+        self.cursorMode = True # Index finger alone moves the cursor
+        self.cursorMinCutoff = 1.0 # One-Euro cutoff at rest (Hz); lower = steadier when still
+        self.cursorBeta = 0.01 # One-Euro speed coefficient; higher = less lag on fast moves
+        self.cursorPredict = True # Predict ahead by the measured capture-to-injection latency
+        self.gestureWindow = 16 # Frames of landmark history for hysteresis and swipe velocity
+        self.latencyBudget = latency_budget # ms per frame the quality governor holds (None = fixed full quality)
+        self.headless = headless
+
+        # ========== State ==========
+        self.cap = None
+        self.grabber = None
+        self.detector = None
+        self.dispatcher = None
+        self.screenW, self.screenH = 0, 0
+        self.frame_now = 0.0 # Timestamp of the frame being processed (media time on replays)
+        self.cursor = None
+        self.gestures = GestureStateMachine(GESTURES, window=self.gestureWindow)
+        # Spec indices of gestures that follow the hand every frame ("move")
+        self._trackingSpecs = {i for i, s in enumerate(GESTURES) if s.action[0] == "move"}
+        self._frameAge = 0.0 # EWMA of capture -> decision seconds (live sources)
+        self.quality = None # QualityGovernor, live sources only so replays stay deterministic
+        self._skipFrames = 0 # Frames still to drop at the governor's skip level
+        self._init_lock = threading.Lock()
+        self._active = threading.Event()
+        self._shutdown = threading.Event()
+        self._thread = None
+        self._window_open = False
+        self._paused_at = time.monotonic()
+        self._reset_gesture_state()
+
+        # ========== Pipeline metrics ==========
+        self.metrics = PipelineMetrics()
+        self.metrics.add_source("toggle", lambda: self.toggle_metrics)
+        self._exporters = []
+        if metrics_path is not None:
+            self._exporters.append(JsonLinesExporter(self.metrics, metrics_path, metrics_interval))
+        if metrics_port is not None:
+            self._exporters.append(MetricsHttpServer(self.metrics, metrics_port))
+        self.preview = None
+        self._preview_due = False
+        if preview_port is not None:
+            self.preview = PreviewStream(preview_port, preview_fps)
+            self._exporters.append(self.preview)
+
+        # ========== Toggle metrics ==========
+        self._resumed_at = None
+        self._first_frame_pending = False
+        self._first_action_pending = False
+        self.toggle_metrics = {"first_frame_ms": None, "first_action_ms": None}
+
+    def _reset_gesture_state(self):
+        self.pTime = 0
+        self.gestures.reset()
+        if self.cursor is not None:
+            self.cursor.reset()
 
     # ========== Init ==========
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("❌ Error: Cannot open webcam.")
-        return # Exit the function if camera fails
-
-    cap.set(3, wCam)
-    cap.set(4, hCam)
-    try:
-        detector = htm.handDetector(maxHands=1, detectionCon=0.75, trackCon=0.6) # Adjusted confidence
-    except Exception as e:
-        print(f"❌ Error initializing hand detector: {e}")
-        cap.release()
-        return
 
-    print("--- GESTURE CONTROL: Camera and Detector Initialized ---", flush=True)
-    screenW, screenH = pyautogui.size() # Get screen size for mapping
+    def _init_detector(self):
+        if self.detector is None:
+            if self.landmark_cache is not None:
+                from landmark_cache import CachedLandmarkDetector
+                self.detector = CachedLandmarkDetector(self.landmark_cache, maxHands=1,
+                                                       outSize=(self.wCam, self.hCam), metrics=self.metrics)
+            else:
+                detectorClass = htm.handDetector
+                if self.inference_process:
+                    from inference_worker import ProcessDetector as detectorClass
+                self.detector = detectorClass(maxHands=1, detectionCon=0.75, trackCon=0.6, # Adjusted confidence
+                                              outSize=(self.wCam, self.hCam), inferSize=self.inferRes,
+                                              metrics=self.metrics, motionThreshold=self.motionThreshold,
+                                              maxReuse=self.motionMaxReuse)
+                if self.inference_process:
+                    self.metrics.add_source("inference_worker", self.detector.workerStats)
+            if self.record_landmarks is not None:
+                from landmark_cache import LandmarkRecorder
+                self.detector.recorder = LandmarkRecorder(self.record_landmarks, self.detector.maxHands)
+            self.metrics.add_source("tracking", self.detector.trackingStats)
+            self.metrics.add_source("motion_cache", self.detector.motionCacheStats)
+        if self.quality is None and self.latencyBudget is not None:
+            self.quality = QualityGovernor(self.latencyBudget)
+            self.metrics.add_source("quality", self.quality.stats)
+        if self.sink is None:
+            self.sink = open_sink(self.input_backend)
+            print(f"Input backend: {self.sink.name}", flush=True)
+        self.screenW, self.screenH = self.sink.size() # Get screen size for mapping
+        if self.cursor is None:
+            self.cursor = CursorMapper((self.wCam, self.hCam), (self.screenW, self.screenH), self.frameR,
+                                       min_cutoff=self.cursorMinCutoff, beta=self.cursorBeta)
+        if self.dispatcher is None:
+            # Actions run on a worker thread with timestamp cooldowns, so
+            # injecting input never blocks the vision loop.
+            self.dispatcher = ActionDispatcher(self.sink, metrics=self.metrics,
+                                               synchronous=self.synchronous_actions).start()
+            self.metrics.add_source("actions", self.dispatcher.stats)
+        for exporter in self._exporters:
+            exporter.start()
+
+    def _open_camera(self):
+        if self.cap is not None and self.cap.isOpened():
+            return True
+        cap = open_frame_source(self.source_spec, self.wCam, self.hCam)
+        if not cap.isOpened():
+            print(f"❌ Error: Cannot open frame source {self.source_spec!r}.", flush=True)
+            return False
+        self.cap = cap
+        # Live capture runs on its own thread and keeps only the newest frame,
+        # so stalls below never make us act on stale hand poses. Recordings
+        # are read frame by frame.
+        self.grabber = make_reader(cap, metrics=self.metrics)
+        self.metrics.add_source("frames", self.grabber.stats)
+        return True
+
+    def _release_camera(self):
+        if self.grabber is not None:
+            self.grabber.stop()
+            print(f"Frame stats: {self.grabber.stats()}", flush=True)
+            self.metrics.remove_source("frames")
+            self.grabber = None
+        if self.cap is not None:
+            if self.cap.isOpened():
+                self.cap.release()
+            self.cap = None
+
+    def warm_up(self):
+        """
+        Loads the hand detector and opens the camera.
+
+        Returns:
+            bool: True if both are ready.
+        """
+        with self._init_lock:
+            try:
+                self._init_detector()
+            except Exception as e:
+                print(f"❌ Error initializing hand detector: {e}", flush=True)
+                return False
+            if not self._open_camera():
+                return False
+        print("--- GESTURE CONTROL: Camera and Detector Initialized ---", flush=True)
+        return True
+
+    # ========== Lifecycle ==========
+
+    def start(self):
+        """Starts the engine thread (paused until resume() is called)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._shutdown.clear()
+            self._thread = threading.Thread(target=self.run, name="GestureEngine", daemon=True)
+            self._thread.start()
+        return self
+
+    def resume(self):
+        """Starts acting on gestures."""
+        if self._active.is_set():
+            return
+        self._reset_gesture_state()
+        self._skipFrames = 0
+        self._resumed_at = time.monotonic()
+        self._first_frame_pending = True
+        self._first_action_pending = True
+        self.toggle_metrics = {"first_frame_ms": None, "first_action_ms": None}
+        self._active.set()
+
+    def pause(self):
+        """Stops acting on gestures but keeps the camera and model warm."""
+        if self._active.is_set():
+            self._paused_at = time.monotonic()
+            self._active.clear()
+
+    def is_active(self):
+        return self._active.is_set()
+
+    def shutdown(self, timeout=3.0):
+        """Stops the engine thread and releases the camera and workers."""
+        self._active.clear()
+        self._shutdown.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                print("⚠️ Warning: Gesture engine thread did not stop cleanly after timeout.", flush=True)
+        self._thread = None
+        self.close()
+
+    def close(self):
+        """Releases the camera, the dispatcher worker and the window."""
+        print("--- GESTURE CONTROL: Cleaning up... ---", flush=True)
+        self._release_camera()
+        if self.detector is not None and self.detector.recorder is not None:
+            self.detector.recorder.close()
+        if self.detector is not None and hasattr(self.detector, "close"):
+            self.detector.close() # Stops the inference worker process
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+            print(f"Action stats: {self.dispatcher.stats()}", flush=True)
+            self.metrics.remove_source("actions")
+            self.dispatcher = None
+        if self._own_sink and self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        for exporter in self._exporters:
+            exporter.stop()
+        self._close_window()
+        print("--- GESTURE CONTROL: Cleanup Complete ---", flush=True)
 
-    try:
-        # ========== Loop ==========
-        while not stop_event.is_set(): # Loop until the stop_event is set
-            success, img = cap.read()
-            if not success:
-                print("⚠️ Failed to grab frame. Trying again...", flush=True)
-                time.sleep(0.1) # Prevent tight loop on error
-                continue
-
-            # Find Hand
-            img = detector.findHands(img)
-            lmList, bbox = detector.findPosition(img, draw=False) # Don't draw default positions
-
-            if lmList:
-                # Get tip of index and middle fingers (needed for volume control)
-                x1, y1 = lmList[8][1:]   # Index finger tip
-                x2, y2 = lmList[12][1:]  # Middle finger tip
-
-                # Check which fingers are up
-                fingers = detector.fingersUp()
-                # print(f"Fingers: {fingers}") # Debug print
-
-                # Draw movement region
+    def _close_window(self):
+        if self._window_open:
+            cv2.destroyAllWindows()
+            # Need multiple waitKeys to ensure window closes on all OS sometimes
+            for _ in range(4):
+                cv2.waitKey(1)
+            self._window_open = False
+
+    # ========== Loop ==========
+
+    def run(self, stop_event=None):
+        """
+        Runs the processing loop in the calling thread until shutdown() is
+        called or `stop_event` is set. Frames are only processed while active.
+        """
+        try:
+            while not self._shutdown.is_set() and not (stop_event and stop_event.is_set()):
+                if not self._active.is_set():
+                    self._idle()
+                    continue
+
+                if self.grabber is None and not self.warm_up():
+                    print("❌ Gesture engine could not start; pausing.", flush=True)
+                    self.pause()
+                    continue
+
+                success, img, frameTime = self.grabber.read(timeout=1.0)
+                if not success:
+                    if getattr(self.grabber, "exhausted", False):
+                        print("--- GESTURE CONTROL: End of recording ---", flush=True)
+                        break
+                    if self._active.is_set():
+                        print("⚠️ Failed to grab frame. Trying again...", flush=True)
+                    continue
+                if self.cap.realtime and frameTime < self._resumed_at:
+                    continue # Captured before the toggle; pose is stale
+                if self._skipFrames:
+                    self._skipFrames -= 1 # Dropped by the quality governor
+                    continue
+
+                img = self.process_frame(img, frameTime)
+                if self._first_frame_pending:
+                    self._first_frame_pending = False
+                    self.toggle_metrics["first_frame_ms"] = (time.monotonic() - self._resumed_at) * 1000
+
+                if self._preview_due:
+                    self.preview.publish(img)
+                if not self.headless:
+                    self._show(img, stop_event)
+
+        except Exception as e:
+            print(f"###### ERROR in gesture control loop: {e} ######", flush=True)
+            import traceback
+            traceback.print_exc() # Print detailed traceback
+
+    def _idle(self):
+        # Window is owned by this thread, so it's closed here rather than in pause()
+        self._close_window()
+        if (self.idle_timeout is not None and self.cap is not None
+                and time.monotonic() - self._paused_at > self.idle_timeout):
+            print(f"--- GESTURE CONTROL: Idle for {self.idle_timeout:g}s, releasing camera ---", flush=True)
+            with self._init_lock:
+                self._release_camera()
+        self._active.wait(timeout=0.1)
+
+    def _show(self, img, stop_event):
+        cv2.imshow(WINDOW_NAME, img)
+        self._window_open = True
+
+        # Check for exit key ('q') or ESC in the window
+        key = cv2.waitKey(1) & 0xFF
+        if key in (ord('q'), 27):
+            print(" 'q'/ESC pressed in Gesture window, stopping.", flush=True)
+            self.pause()
+            if stop_event is not None:
+                stop_event.set() # Signal the caller to stop
+
+    def _action_fired(self, message=None):
+        if message:
+            print(message, flush=True)
+        if self._first_action_pending:
+            self._first_action_pending = False
+            self.toggle_metrics["first_action_ms"] = (time.monotonic() - self._resumed_at) * 1000
+            print(f"⏱️ Time to first action after toggle: {self.toggle_metrics['first_action_ms']:.0f} ms", flush=True)
+
+    def _fire_gesture(self, event, now, realtime):
+        """Turns a GestureEvent into its dispatcher action."""
+        spec = event.spec
+        kind, target, amount = spec.action
+        message = spec.message
+        if spec.threshold is not None:
+            # Motion gesture: pick the (negative, positive) entry by velocity sign
+            i = int(event.velocity[spec.axis] > 0)
+            target = target[i]
+            message = message[i] if message else None
+        if kind == "move":
+            if not self.cursorMode:
+                return
+            # Predict ahead by how stale this frame will be when the move lands
+            lead = self._frameAge + self.dispatcher.latency_ewma if (self.cursorPredict and realtime) else 0.0
+            target = self.cursor.update(event.point[0], event.point[1], now, lead)
+        if self.dispatcher.submit(kind, target, amount, key=spec.name, now=now):
+            self._action_fired(message)
+
+    def _apply_quality(self, level):
+        print(f"⚙️ Quality -> {level.name} ({self.quality.reason}, p90 "
+              f"{self.quality.p90 * 1000:.1f} ms / {self.latencyBudget:.0f} ms)", flush=True)
+        self.detector.inferSize = level.inferSize or self.inferRes
+        self.detector.setModelComplexity(level.modelComplexity)
+
+    def process_frame(self, img, frameTime=None):
+        """
+        Detects the hand in one frame and dispatches the matching gesture action.
+
+        Args:
+            img: BGR frame.
+            frameTime (float): time.monotonic() at capture (media time for
+                recordings). Action cooldowns are measured against it.
+        """
+        detector = self.detector
+        realtime = self.cap is not None and self.cap.realtime
+        frameStart = time.perf_counter()
+        now = self.frame_now = frameTime if frameTime is not None else time.monotonic()
+        wCam, hCam, frameR = self.wCam, self.hCam, self.frameR
+        # Headless runs skip all drawing except on frames sent to the debug preview
+        self._preview_due = self.preview is not None and self.preview.due()
+        draw = not self.headless or self._preview_due
+        governed = self.quality is not None and realtime
+        level = self.quality.level if governed else None
+
+        # Find Hand
+        img = detector.findHands(img, draw=draw and (level is None or level.draw))
+        lmList, bbox = detector.findPosition(img, draw=False) # Don't draw default positions
+
+        classifyStart = time.perf_counter()
+        if lmList:
+            fingers = detector.fingersUp() # Which fingers are up
+            event = self.gestures.update(now, detector.lmPixels, fingers)
+            # Draw movement region
+            if draw:
                 cv2.rectangle(img, (frameR, frameR), (wCam - frameR, hCam - frameR), (255, 0, 255), 2)
-
-
-                # ========== Volume Control (Index + Middle up + Vertical Movement) ==========
-                if fingers[1] == 1 and fingers[2] == 1 and fingers[3] == 0 and fingers[4] == 0:
-                    # Calculate the average vertical position of the index and middle fingers
-                    yVol = (y1 + y2) // 2
-                    # Draw a circle for visual feedback on the control point
-                    cv2.circle(img, ( (x1+x2)//2, yVol ), 10, (0, 255, 0), cv2.FILLED)
-
-                    if prevYVol != 0:
-                        diff = yVol - prevYVol
-                        vol_action = None
-                        vol_threshold = 15 # Sensitivity for volume change detection (adjust as needed)
-
-                        if abs(diff) > vol_threshold:
-                            if diff > 0: # Hand moved DOWN on screen
-                                vol_action = "volumedown"
-                                print("🔉 Volume Down", flush=True)
-                            else: # Hand moved UP on screen
-                                vol_action = "volumeup"
-                                print("🔊 Volume Up", flush=True)
-
-                            if vol_action:
-                                pyautogui.press(vol_action)
-                                pyautogui.press(vol_action)
-                                pyautogui.press(vol_action)
-                                time.sleep(0.15) # Add delay to prevent rapid repeats
-
-                    prevYVol = yVol # Update previous position for next frame's comparison
-
-                # ========== Scroll Up (All fingers up) ==========
-                elif fingers == [1, 1, 1, 1, 1]:
-                    pyautogui.scroll(80) # Positive value scrolls UP (adjust amount as needed)
-                    print("📜 Scrolling Up", flush=True)
-                    time.sleep(0.15) # Add delay to prevent rapid repeats
-                    prevYVol = 0 # Reset volume tracking when scrolling
-
-                # ========== Scroll Down (All fingers down / Fist) ==========
-                elif fingers == [0, 0, 0, 0, 0]:
-                    pyautogui.scroll(-80) # Negative value scrolls DOWN (adjust amount as needed)
-                    print("📜 Scrolling Down", flush=True)
-                    time.sleep(0.15) # Add delay to prevent rapid repeats
-                    prevYVol = 0 # Reset volume tracking when scrolling
-
-                # ========== CHANGED: Next Tab (Thumb + Index Finger Up Only) ==========
-                elif fingers == [1, 1, 0, 0, 0]: # Condition changed here
-                    pyautogui.hotkey('ctrl', 'tab')
-                    print("📄 Next Tab", flush=True)
-                    time.sleep(0.3) # Add longer delay for tab switching
-                    prevYVol = 0 # Reset volume tracking
-
-                # ========== CHANGED: Previous Tab (Thumb + Index + Pinky Finger Up Only) ==========
-                elif fingers == [1, 1, 0, 0, 1]: # Condition changed here
-                    pyautogui.hotkey('alt', 'tab')
-                    print("📄 Window change", flush=True)
-                    time.sleep(0.3) # Add longer delay for tab switching
-                    prevYVol = 0 # Reset volume tracking
-
-                # ========== Reset previous vertical position if not in Volume gesture ==========
-                else:
-                     prevYVol = 0 # Reset if not in Index+Middle finger up state or other specific gestures
-
-
-                # ========== (No change below this point regarding gestures) ==========
-
-            else: # No hand detected
-                prevYVol = 0 # Reset if no hand is found
-
-
-            # ========== FPS Calculation ==========
-            cTime = time.time()
-            fps = 1 / (cTime - pTime) if (cTime - pTime) > 0 else 0
-            pTime = cTime
+        else: # No hand detected
+            event = self.gestures.update(now)
+
+        # Steering the cursor needs fresh landmarks every frame: reused ones
+        # would hold it still and then jump once the drift crosses the gate
+        gestures = self.gestures
+        detector.motionPaused = self.cursorMode and (
+            gestures.candidate in self._trackingSpecs or gestures.active in self._trackingSpecs)
+
+        if event is not None:
+            self._fire_gesture(event, now, realtime)
+            if draw and event.point is not None:
+                cv2.circle(img, tuple(int(v) for v in event.point), 10, (255, 0, 255), cv2.FILLED)
+        if draw and self.gestures.active_name:
+            cv2.putText(img, self.gestures.active_name, (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        end = time.perf_counter()
+        self.metrics.record("classify", end - classifyStart)
+        self.metrics.record("frame", end - frameStart)
+        if frameTime is not None and realtime:
+            age = time.monotonic() - frameTime
+            self._frameAge += 0.1 * (age - self._frameAge)
+            self.metrics.record("frame_age", age)
+        if governed:
+            changed = self.quality.record(end - frameStart)
+            if changed is not None:
+                self._apply_quality(changed)
+            self._skipFrames = self.quality.level.skip
+
+        # ========== FPS Calculation ==========
+        cTime = time.time()
+        fps = 1 / (cTime - self.pTime) if (cTime - self.pTime) > 0 else 0
+        self.pTime = cTime
+        if draw:
             cv2.putText(img, f'FPS: {int(fps)}', (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            if governed:
+                cv2.putText(img, f'Q: {self.quality.level.name} {self.quality.p90 * 1000:.0f}/{self.latencyBudget:.0f} ms',
+                            (20, hCam - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        return img
 
-            # ========== Show Image ==========
-            cv2.imshow("Gesture Control Active", img)
-
-            # Check for exit key ('q') or if stop event is set by the other thread
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                print(" 'q' pressed in Gesture window, stopping.", flush=True)
-                stop_event.set() # Signal the main thread (or itself) to stop
-            elif key == 27: # ESC key
-                 print(" ESC pressed in Gesture window, stopping.", flush=True)
-                 stop_event.set()
-
-            # Give the CPU a tiny break
-            # time.sleep(0.01)
 
+def run_gesture_control(stop_event, headless=False, preview_port=None, source=None,
+                        inference_process=False, latency_budget=33.0, input_backend="auto"):
+    """
+    Runs the hand gesture recognition loop.
 
-    except Exception as e:
-        print(f"###### ERROR in gesture control loop: {e} ######", flush=True)
-        import traceback
-        traceback.print_exc() # Print detailed traceback
+    Args:
+        stop_event (threading.Event): An event that signals when this function should stop.
+        headless (bool): Skip the OpenCV window and all overlay drawing.
+        preview_port (int): Optional port for a low-rate MJPEG debug preview.
+        source: Webcam index, video file or image directory (default: webcam 0).
+        inference_process (bool): Run MediaPipe in a separate worker process.
+        latency_budget (float): Per-frame budget in ms for the quality
+            governor; None disables it.
+        input_backend (str): Input injection backend (see action_sinks.open_sink).
+    """
+    print("--- GESTURE CONTROL: Initializing... ---", flush=True)
+    engine = GestureEngine(headless=headless, preview_port=preview_port, source=source,
+                           inference_process=inference_process, latency_budget=latency_budget,
+                           input_backend=input_backend)
+    if not engine.warm_up():
+        engine.close()
+        return # Exit the function if camera or detector fails
+    engine.resume()
+    try:
+        engine.run(stop_event)
     finally:
-        # ========== Cleanup ==========
-        print("--- GESTURE CONTROL: Cleaning up... ---", flush=True)
-        if cap.isOpened():
-            cap.release()
-        cv2.destroyAllWindows()
-        # Need multiple waitKeys to ensure window closes on all OS sometimes
-        for _ in range(4):
-            cv2.waitKey(1)
-        print("--- GESTURE CONTROL: Cleanup Complete ---", flush=True)
+        engine.close()
 
 # Optional: Add a block to test this file standalone
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Standalone gesture control")
+    parser.add_argument("--headless", action="store_true", help="No window or overlays; stop with Ctrl+C / SIGTERM")
+    parser.add_argument("--preview-port", type=int, default=None, help="Serve a 5 fps MJPEG debug preview on this port")
+    parser.add_argument("--source", default=None, help="Webcam index, video file or image directory")
+    parser.add_argument("--process", action="store_true", help="Run MediaPipe in a separate worker process")
+    parser.add_argument("--budget-ms", type=float, default=33.0,
+                        help="Per-frame latency budget for the quality governor (0 = fixed full quality)")
+    parser.add_argument("--input", default="auto", choices=("auto", "xtest", "uinput", "pyautogui"),
+                        help="Input injection backend")
+    args = parser.parse_args()
+
     print("Running gesture_logic.py standalone test...")
     # Updated print statement for new tab gestures
-    print("Gestures: Open Hand=Scroll Up, Fist=Scroll Down, Index+Middle+Move=Volume, Thumb+Index=Next Tab, Thumb+Index+Pinky=Prev Tab")
-    print("Press 'q' or ESC in the OpenCV window to stop.")
+    print("Gestures: Index only=Move Cursor, Open Hand=Scroll Up, Fist=Scroll Down, Index+Middle+Move=Volume, Thumb+Index=Next Tab, Thumb+Index+Pinky=Prev Tab")
+    if args.headless:
+        print("Headless: press Ctrl+C or send SIGTERM to stop.")
+    else:
+        print("Press 'q' or ESC in the OpenCV window to stop.")
     # Create a dummy stop event for standalone testing
     stop_event = threading.Event()
+
+    def _handle_stop_signal(signum, frame):
+        print(f"\nSignal {signum} received, stopping.", flush=True)
+        stop_event.set()
+    signal.signal(signal.SIGINT, _handle_stop_signal)
+    signal.signal(signal.SIGTERM, _handle_stop_signal)
+
     try:
         # Run the gesture control function directly
-        run_gesture_control(stop_event)
+        run_gesture_control(stop_event, headless=args.headless, preview_port=args.preview_port,
+                            source=args.source, inference_process=args.process,
+                            latency_budget=args.budget_ms or None, input_backend=args.input)
     except KeyboardInterrupt:
         print("\nStandalone test interrupted by Ctrl+C.")
         stop_event.set() # Signal the function to stop if running
-    print("Standalone test finished.")
\ No newline at end of file
+    print("Standalone test finished.")
@@ -0,0 +1,438 @@
+"""
+Host-side IMU fusion for Air Mouse mode.
+
+The firmware turns gyro readings into pointer motion with `gz / 650` integer
+division once per 10 ms loop, which drops everything below ~5 deg/s (dead
+zone), stair-steps slow movements and ignores the accelerometer. Here the
+ESP32 only streams raw MPU6050 getMotion6 samples in batches and the host:
+
+    1. estimates gyro bias while the hand is still,
+    2. tracks hand roll with a vectorised complementary filter (gyro
+       integration corrected by the gravity direction from the accelerometer)
+       and rotates yaw/pitch rates into the upright frame, so tilting the hand
+       doesn't bend pointer paths,
+    3. integrates the rates per batch and carries the sub-pixel remainder
+       over, so slow motion accumulates into whole pixels instead of being
+       truncated away.
+
+Batch record (little-endian), used on the wire and in recorded files:
+    b"IM", u16 count, count x (u32 t_us, 6 x i16 ax ay az gx gy gz),
+    u16 CRC-16/CCITT over the samples
+"""
+import binascii
+import math
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"IM"
+_HEADER = struct.Struct("<2sH")
+_CRC = struct.Struct("<H")
+MAX_BATCH = 1024        # Largest count the record format allows
+STREAM_MAX_BATCH = 128  # Default cap for live streams (80 samples per 10 ms at 8 kHz)
+SAMPLE_DTYPE = np.dtype([("t_us", "<u4"), ("ax", "<i2"), ("ay", "<i2"), ("az", "<i2"),
+                         ("gx", "<i2"), ("gy", "<i2"), ("gz", "<i2")])
+
+# MPU6050 defaults (+-2 g, +-250 deg/s)
+ACCEL_LSB_PER_G = 16384.0
+GYRO_LSB_PER_DPS = 131.0
+
+
+def record_size(count):
+    """Bytes in a batch record of `count` samples."""
+    return _HEADER.size + count * SAMPLE_DTYPE.itemsize + _CRC.size
+
+
+def encode_batch(samples):
+    """Packs a SAMPLE_DTYPE array into one batch record."""
+    data = np.ascontiguousarray(samples, dtype=SAMPLE_DTYPE).tobytes()
+    return _HEADER.pack(MAGIC, len(samples)) + data + _CRC.pack(binascii.crc_hqx(data, 0xFFFF))
+
+
+class BatchDecoder:
+    """
+    Incremental decoder for batch records; resyncs on the magic bytes.
+
+    Args:
+        max_batch (int): Largest sample count accepted. A header claiming
+            more is rejected before its payload is waited for, so a false
+            "IM" match in a stream can hold back at most record_size(max_batch)
+            bytes.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH):
+        self.max_batch = min(max_batch, MAX_BATCH)
+        self._buf = bytearray()
+        self.bad_batches = 0
+
+    def feed(self, data):
+        self._buf += data
+        buf = self._buf
+        batches = []
+        while True:
+            start = buf.find(MAGIC)
+            if start < 0:
+                del buf[:max(0, len(buf) - 1)]
+                return batches
+            del buf[:start]
+            if len(buf) < _HEADER.size:
+                return batches
+            _, count = _HEADER.unpack_from(buf)
+            if count > self.max_batch:
+                self.bad_batches += 1
+                del buf[:1]  # Resync from the next byte
+                continue
+            end = record_size(count)
+            if len(buf) < end:
+                return batches
+            data = bytes(buf[_HEADER.size:end - _CRC.size])
+            if _CRC.unpack_from(buf, end - _CRC.size)[0] != binascii.crc_hqx(data, 0xFFFF):
+                self.bad_batches += 1
+                del buf[:1]
+                continue
+            batches.append(np.frombuffer(data, dtype=SAMPLE_DTYPE))
+            del buf[:end]
+
+
+# ========== Sources ==========
+# A source yields SAMPLE_DTYPE batches from batches() until it runs out.
+
+class StreamSource:
+    """
+    Batches arriving on a control_channel transport (udp/serial/unix).
+    Open datagram transports with bufsize=record_size(max_batch).
+    """
+
+    def __init__(self, transport, max_batch=STREAM_MAX_BATCH):
+        self.transport = transport
+        self.decoder = BatchDecoder(max_batch)
+        self.running = True
+
+    def batches(self):
+        while self.running:
+            data = self.transport.recv(timeout=0.5)
+            if data:
+                yield from self.decoder.feed(data)
+
+    def close(self):
+        self.running = False
+        self.transport.close()
+
+
+class RecordedSource:
+    """A file of concatenated batch records (see IMURecorder)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def batches(self):
+        decoder = BatchDecoder()
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    return
+                yield from decoder.feed(chunk)
+
+    def close(self):
+        pass
+
+
+class IMURecorder:
+    """Writes batches to a file that RecordedSource can replay."""
+
+    def __init__(self, path):
+        self._f = open(path, "wb")
+
+    def write(self, samples):
+        self._f.write(encode_batch(samples))
+
+    def close(self):
+        self._f.close()
+
+
+class SyntheticSource:
+    """
+    Simulated glove at `rate` Hz: still for `still` seconds, then slow and
+    fast sweeps with the hand rolled by ~20 deg, plus gyro bias and noise.
+
+    The intended pointer motion is kept in `truth` (deg, per sample: upright
+    yaw and pitch angle) so benchmarks can score the output.
+
+    Args:
+        rate (float): Sample rate in Hz.
+        seconds (float): Length of the recording.
+        batch (int): Samples per batch.
+        bias_dps (tuple): Gyro bias (gx, gy, gz) in deg/s.
+        noise_dps (float): Gyro noise standard deviation in deg/s.
+    """
+
+    def __init__(self, rate=1000.0, seconds=10.0, batch=10, bias_dps=(1.2, -0.8, 1.5),
+                 noise_dps=0.3, still=1.0, seed=0):
+        rng = np.random.default_rng(seed)
+        n = int(rate * seconds)
+        t = np.arange(n) / rate
+        moving = t >= still
+        tm = np.where(moving, t - still, 0.0)
+        # Upright-frame rates (deg/s): a slow drift well under the firmware's
+        # 5 deg/s dead zone plus faster sweeps
+        yaw_rate = moving * (3.0 * np.sin(2 * np.pi * 0.2 * tm) + 40.0 * np.sin(2 * np.pi * 0.7 * tm) ** 3)
+        pitch_rate = moving * (2.0 * np.cos(2 * np.pi * 0.15 * tm) + 25.0 * np.sin(2 * np.pi * 0.5 * tm) ** 3)
+        roll = np.radians(20.0 + 10.0 * np.sin(2 * np.pi * 0.1 * tm))
+        roll_rate = np.degrees(np.gradient(roll, t))
+        # Body-frame gyro: rotate the upright rates back by the roll angle
+        c, s = np.cos(roll), np.sin(roll)
+        gz = c * yaw_rate - s * pitch_rate
+        gx = s * yaw_rate + c * pitch_rate
+        gyro = np.stack([gx, roll_rate, gz], axis=1) + bias_dps + rng.normal(0, noise_dps, (n, 3))
+        accel = np.stack([np.sin(roll), np.zeros(n), np.cos(roll)], axis=1) + rng.normal(0, 0.01, (n, 3))
+
+        self.rate = rate
+        self.batch = batch
+        self.truth = np.stack([np.cumsum(yaw_rate), np.cumsum(pitch_rate)], axis=1) / rate
+        self.samples = np.empty(n, dtype=SAMPLE_DTYPE)
+        self.samples["t_us"] = (t * 1e6).astype(np.uint64) & 0xFFFFFFFF
+        for i, name in enumerate(("ax", "ay", "az")):
+            self.samples[name] = np.clip(np.round(accel[:, i] * ACCEL_LSB_PER_G), -32768, 32767)
+        for i, name in enumerate(("gx", "gy", "gz")):
+            self.samples[name] = np.clip(np.round(gyro[:, i] * GYRO_LSB_PER_DPS), -32768, 32767)
+
+    def batches(self):
+        for i in range(0, len(self.samples), self.batch):
+            yield self.samples[i:i + self.batch]
+
+    def close(self):
+        pass
+
+
+def open_imu_source(spec, max_batch=STREAM_MAX_BATCH):
+    """
+    "synthetic", a recorded file path, or a control_channel transport spec
+    ("udp:[<host>:]<port>", "serial:<device>[@<baud>]", "unix:<path>").
+    Streams accept batches of up to `max_batch` samples.
+    """
+    if spec == "synthetic":
+        return SyntheticSource()
+    if spec.split(":", 1)[0] in ("udp", "serial", "unix"):
+        from control_channel import open_transport
+        return StreamSource(open_transport(spec, bufsize=record_size(max_batch)), max_batch)
+    return RecordedSource(spec)
+
+
+# ========== Fusion ==========
+
+def _complementary(prev, rate, meas, dt, alpha, block=512):
+    """
+    Vectorised y[k] = alpha * (y[k-1] + rate[k] * dt) + (1 - alpha) * meas[k].
+
+    The recurrence is linear, so y[k] = alpha^(k+1) * (prev + cumsum(u / alpha^(j+1)))
+    with u = alpha * rate * dt + (1 - alpha) * meas. Blocks bound alpha^-n, and
+    are shortened for small alpha so alpha^n stays a normal float64.
+    """
+    u = alpha * rate * dt + (1 - alpha) * meas
+    if alpha <= 0:
+        return u
+    if alpha < 1:
+        block = max(1, min(block, int(-700 / math.log(alpha))))
+    out = np.empty_like(meas)
+    powers = alpha ** np.arange(1, block + 1)
+    for i in range(0, len(u), block):
+        p = powers[:len(u[i:i + block])]
+        out[i:i + block] = p * (prev + np.cumsum(u[i:i + block] / p))
+        prev = out[i + len(p) - 1]
+    return out
+
+
+class AirMouseFusion:
+    """
+    Turns batches of raw getMotion6 samples into pointer deltas.
+
+    Args:
+        gain (float): Pointer pixels per degree of hand rotation. The
+            firmware's gz / 650 every 10 ms is about 20 px/deg.
+        tau (float): Complementary filter time constant (s) for the roll
+            estimate; shorter trusts the accelerometer more.
+        deadband (float): Soft dead band on the rates (deg/s) against
+            residual noise while still.
+        still_gyro (float): Max |rate - bias| (deg/s) for a sample to count
+            as still once calibrated. Kept tight so slow, deliberate motion
+            isn't learned as bias.
+        still_accel (float): Max | |a| - 1 g | for a sample to count as still.
+        bias_tau (float): Time constant (s) of the gyro bias estimate.
+        calib_gyro (float): Looser still threshold (deg/s, around zero)
+            until `calib_seconds` of stillness have given a first bias.
+        tilt_compensation (bool): Rotate rates into the upright frame by roll.
+        max_dt (float): Longest step (s) a single sample may integrate; longer
+            gaps are replaced by the nominal sample period.
+    """
+
+    def __init__(self, gain=20.0, tau=0.5, deadband=0.3, still_gyro=0.75, still_accel=0.05,
+                 bias_tau=5.0, calib_gyro=5.0, calib_seconds=0.5, tilt_compensation=True, max_dt=0.05):
+        self.gain = gain
+        self.tau = tau
+        self.deadband = deadband
+        self.still_gyro = still_gyro
+        self.still_accel = still_accel
+        self.bias_tau = bias_tau
+        self.calib_gyro = calib_gyro
+        self.calib_seconds = calib_seconds
+        self.tilt_compensation = tilt_compensation
+        self.max_dt = max_dt
+        self.reset()
+
+    def reset(self):
+        self.bias = np.zeros(3)       # deg/s (gx, gy, gz)
+        self.calibrated = 0.0         # Seconds of stillness seen while calibrating
+        self.roll = None              # radians
+        self.remainder = np.zeros(2)  # Sub-pixel carry (dx, dy)
+        self._last_t = None
+        self._nominal = 1e-3          # Last trusted sample period (s)
+        self.samples = 0
+        self.batches = 0
+        self.still_samples = 0
+        self.gaps = 0
+
+    def _times(self, t_us):
+        # Seconds since the previous sample, unwrapping the u32 microsecond clock
+        t = t_us.astype(np.int64)
+        prev = t[0] - 1000 if self._last_t is None else self._last_t
+        dt = np.diff(t, prepend=prev) % (1 << 32) / 1e6
+        self._last_t = int(t[-1])
+        # A gap (dropped batch, reconnect) must not integrate as one huge step.
+        # A batch whose median is itself a gap (one sample after a reconnect)
+        # falls back to the last trusted period.
+        nominal = float(np.median(dt))
+        if 0 < nominal <= self.max_dt:
+            self._nominal = nominal
+        else:
+            nominal = self._nominal
+        gap = (dt > 10 * nominal) | (dt > self.max_dt)
+        if gap.any():
+            self.gaps += int(gap.sum())
+            dt[gap] = nominal
+        return dt
+
+    def process(self, batch):
+        """
+        Fuses one batch.
+
+        Args:
+            batch: SAMPLE_DTYPE array.
+
+        Returns:
+            tuple: Integer pointer (dx, dy) for this batch.
+        """
+        if len(batch) == 0:
+            return 0, 0
+        dt = self._times(batch["t_us"])
+        gyro = np.stack([batch["gx"], batch["gy"], batch["gz"]], axis=1) / GYRO_LSB_PER_DPS
+        accel = np.stack([batch["ax"], batch["ay"], batch["az"]], axis=1) / ACCEL_LSB_PER_G
+
+        # ---------- Gyro bias while still ----------
+        calibrating = self.calibrated < self.calib_seconds
+        if calibrating:
+            still = (np.abs(gyro) < self.calib_gyro).all(axis=1)
+        else:
+            still = (np.abs(gyro - self.bias) < self.still_gyro).all(axis=1)
+        still &= np.abs(np.linalg.norm(accel, axis=1) - 1.0) < self.still_accel
+        n_still = int(np.count_nonzero(still))
+        if n_still:
+            seconds = float(dt[still].sum())
+            if calibrating:
+                # Running mean over the calibration window
+                self.calibrated += seconds
+                self.bias += seconds / self.calibrated * (gyro[still].mean(axis=0) - self.bias)
+            else:
+                k = 1.0 - math.exp(-seconds / self.bias_tau)
+                self.bias += k * (gyro[still].mean(axis=0) - self.bias)
+        self.still_samples += n_still
+        rates = gyro - self.bias
+
+        # ---------- Roll (complementary filter) ----------
+        acc_roll = np.arctan2(accel[:, 0], accel[:, 2])
+        if self.roll is None:
+            self.roll = float(acc_roll[0])
+        step = float(dt.mean())
+        alpha = self.tau / (self.tau + step)
+        roll = _complementary(self.roll, np.radians(rates[:, 1]), acc_roll, step, alpha)
+        self.roll = float(roll[-1])
+
+        # ---------- Upright-frame yaw / pitch rates ----------
+        gx, gz = rates[:, 0], rates[:, 2]
+        if self.tilt_compensation:
+            c, s = np.cos(roll), np.sin(roll)
+            yaw, pitch = c * gz + s * gx, c * gx - s * gz
+        else:
+            yaw, pitch = gz, gx
+        if self.deadband:
+            yaw = np.sign(yaw) * np.maximum(np.abs(yaw) - self.deadband, 0.0)
+            pitch = np.sign(pitch) * np.maximum(np.abs(pitch) - self.deadband, 0.0)
+
+        # ---------- Integrate, keeping the sub-pixel remainder ----------
+        # Same directions as the firmware: -gz -> mouse x, gx -> mouse y
+        motion = self.remainder + self.gain * np.array([-(yaw * dt).sum(), (pitch * dt).sum()])
+        whole = np.trunc(motion)
+        self.remainder = motion - whole
+        self.samples += len(batch)
+        self.batches += 1
+        return int(whole[0]), int(whole[1])
+
+    def stats(self):
+        return {
+            "samples": self.samples,
+            "batches": self.batches,
+            "stillFraction": self.still_samples / self.samples if self.samples else 0.0,
+            "calibrated": self.calibrated >= self.calib_seconds,
+            "biasDps": [round(b, 3) for b in self.bias],
+            "rollDeg": None if self.roll is None else round(math.degrees(self.roll), 1),
+            "gaps": self.gaps,
+        }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Host-side Air Mouse IMU fusion")
+    parser.add_argument("source", nargs="?", default="synthetic",
+                        help='"synthetic", a recorded file, or udp:[<host>:]<port> / serial:<dev> / unix:<path>')
+    parser.add_argument("--gain", type=float, default=20.0, help="Pointer pixels per degree")
+    parser.add_argument("--inject", nargs="?", const="auto", default=None,
+                        help="Move the real pointer through this input backend (default: auto)")
+    parser.add_argument("--record", help="Also write the incoming batches to this file")
+    parser.add_argument("--max-batch", type=int, default=STREAM_MAX_BATCH,
+                        help=f"Largest batch (samples) accepted from a stream (at most {MAX_BATCH})")
+    args = parser.parse_args()
+
+    source = open_imu_source(args.source, args.max_batch)
+    fusion = AirMouseFusion(gain=args.gain)
+    recorder = IMURecorder(args.record) if args.record else None
+    sink = None
+    if args.inject:
+        from action_sinks import open_sink
+        sink = open_sink(args.inject)
+    print(f"🖐️ IMU fusion reading {args.source} (Ctrl+C to stop)", flush=True)
+    last_report = time.monotonic()
+    try:
+        for batch in source.batches():
+            if recorder is not None:
+                recorder.write(batch)
+            dx, dy = fusion.process(batch)
+            if sink is not None and (dx or dy):
+                sink.moveRel(dx, dy)
+            if time.monotonic() - last_report > 2.0:
+                last_report = time.monotonic()
+                print(f"IMU stats: {fusion.stats()}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
+        if recorder is not None:
+            recorder.close()
+        if sink is not None:
+            sink.close()
+    print(f"IMU stats: {fusion.stats()}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
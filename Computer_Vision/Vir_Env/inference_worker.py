@@ -0,0 +1,331 @@
+"""
+Runs MediaPipe hand detection in a separate worker process, so inference
+does not compete with the mouse listener, drawing and input injection for the
+GIL of the main process.
+
+Frames are written into a multiprocessing.shared_memory ring of `slots`
+outSize BGR images; only a (seq, slot) pair crosses the request queue.
+Results come back as fixed-size records in a second shared-memory block
+(result_dtype), so neither direction pickles image or landmark data.
+ProcessDetector supervises the worker without stalling the caller: if it
+dies or stops answering it is killed, frames are detected in-process while a
+replacement loads in the background, and restarts back off exponentially
+until `max_restarts` consecutive failures leave detection in-process.
+"""
+import multiprocessing as mp
+import queue
+import signal
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import HandTrackingModule as htm
+
+
+def result_dtype(maxHands):
+    """Fixed-size landmark record, one per ring slot."""
+    return np.dtype([
+        ("seq", "<i8"),          # Request this record answers
+        ("numHands", "<i4"),
+        ("detected", "<i4"),     # 1 if palm detection ran (tracking stats)
+        ("inferSec", "<f8"),     # Worker-side colour conversion + inference time
+        ("landmarks", "<f4", (maxHands, htm.NUM_LANDMARKS, 3)),  # Normalised
+    ])
+
+
+class _WorkerDetector(htm.handDetector):
+    """handDetector that skips the pixel conversion; the parent does it."""
+
+    def _scaleLandmarks(self, shape):
+        pass
+
+
+def _worker_main(frame_name, result_name, slots, frame_shape, options, requests, done):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the parent
+    frame_shm = shared_memory.SharedMemory(name=frame_name)
+    result_shm = shared_memory.SharedMemory(name=result_name)
+    frames = np.ndarray((slots,) + frame_shape, dtype=np.uint8, buffer=frame_shm.buf)
+    results = np.ndarray((slots,), dtype=result_dtype(options["maxHands"]), buffer=result_shm.buf)
+    try:
+        h, w = frame_shape[:2]
+        detector = _WorkerDetector(outSize=(w, h), **options)
+        done.put(-1)  # Model loaded
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            seq, slot, detector.inferSize = request
+            start = time.perf_counter()
+            detections = detector.detectionCount
+            detector._detect(frames[slot])
+            record = results[slot]
+            record["numHands"] = detector.numHands
+            record["detected"] = int(detector.detectionCount != detections)
+            record["landmarks"][:detector.numHands] = detector.lmArray[:detector.numHands]
+            record["inferSec"] = time.perf_counter() - start
+            record["seq"] = seq  # Written last: the record is complete
+            done.put(seq)
+    finally:
+        del frames, results
+        frame_shm.close()
+        result_shm.close()
+
+
+class ProcessDetector(htm.handDetector):
+    """
+    handDetector whose MediaPipe model lives in a worker process.
+
+    Drop-in for handDetector: findHands/findPosition/fingersUp work the same,
+    and the motion-gated cache still runs in this process so static frames
+    never cross to the worker.
+
+    Args:
+        slots (int): Frames in the shared-memory ring. A slot is only reused
+            `slots` requests later, so a request that timed out can't have
+            its frame overwritten while the worker still reads it.
+        timeout (float): Seconds to wait for a result before the worker is
+            considered hung and restarted.
+        first_timeout (float): Timeout for the first result after a (re)start,
+            which pays for MediaPipe's graph warm-up.
+        start_timeout (float): Seconds to wait for the worker to load the model.
+        max_restarts (int): Consecutive failed workers after which detection
+            stays in-process for good.
+        backoff (float): Seconds before the first restart; doubles with each
+            consecutive failure. Frames are detected in-process meanwhile.
+        Remaining arguments are passed to handDetector.
+    """
+
+    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, trackCon=0.5,
+                 outSize=(640, 480), inferSize=None, metrics=None, motionThreshold=None,
+                 maxReuse=5, modelComplexity=1, slots=3, timeout=1.0, first_timeout=10.0,
+                 start_timeout=30.0, max_restarts=5, backoff=1.0):
+        self.slots = slots
+        self.timeout = timeout
+        self.first_timeout = first_timeout
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.restarts = 0
+        self.timeouts = 0
+        self.fallbackFrames = 0     # Frames detected in-process while the worker was down
+        self._failures = 0          # Consecutive workers that died, hung or failed to start
+        self._retry_at = 0.0
+        self._ready = False         # Worker has loaded its model
+        self._warm = False          # Worker has answered since it started
+        self._start_deadline = 0.0
+        self._ctx = mp.get_context("spawn")  # MediaPipe's threads don't survive fork
+        self._process = None
+        self._frame_shm = None
+        self._result_shm = None
+        self._seq = 0
+        super().__init__(mode, maxHands, detectionCon, trackCon, outSize, inferSize, metrics,
+                         motionThreshold, maxReuse, modelComplexity)
+        self._options = {"mode": mode, "maxHands": self.maxHands, "detectionCon": self.detectionCon,
+                         "trackCon": self.trackCon, "modelComplexity": modelComplexity}
+
+    def _createModel(self):
+        return None  # The model is created inside the worker (or on fallback)
+
+    # ---------- Worker supervision ----------
+
+    def _launch_worker(self):
+        # Spawns the worker without waiting for it; _poll_start() picks up readiness
+        w, h = self.outSize
+        frame_shape = (h, w, 3)
+        if self._frame_shm is None:
+            self._frame_shm = shared_memory.SharedMemory(create=True, size=self.slots * h * w * 3)
+            rdtype = result_dtype(self.maxHands)
+            self._result_shm = shared_memory.SharedMemory(create=True, size=self.slots * rdtype.itemsize)
+            self._frames = np.ndarray((self.slots,) + frame_shape, dtype=np.uint8, buffer=self._frame_shm.buf)
+            self._records = np.ndarray((self.slots,), dtype=rdtype, buffer=self._result_shm.buf)
+        self._records["seq"] = -1
+        self._requests = self._ctx.Queue()
+        self._done = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_worker_main, name="HandInferenceWorker", daemon=True,
+            args=(self._frame_shm.name, self._result_shm.name, self.slots, frame_shape,
+                  self._options, self._requests, self._done))
+        self._process.start()
+        self._ready = self._warm = False
+        self._start_deadline = time.monotonic() + self.start_timeout
+
+    def _start_worker(self):
+        """Starts the worker and waits for its model, like handDetector's constructor."""
+        self._launch_worker()
+        while self._process is not None and not self._ready:
+            if not self._process.is_alive():
+                self._worker_failed(f"exited with code {self._process.exitcode}")
+                break
+            self._poll_start(0.1)
+
+    def _poll_start(self, timeout=0.0):
+        try:
+            self._done.get(timeout=timeout)  # -1 once the model is loaded
+        except queue.Empty:
+            if time.monotonic() >= self._start_deadline:
+                self._worker_failed(f"did not start within {self.start_timeout:.0f}s")
+            return
+        self._ready = True
+        self.prevHandCount = 0  # The new worker starts with palm detection
+        self._closeFallback()  # Don't keep a second model in this process
+
+    def _stop_worker(self, timeout=1.0):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.is_alive():
+            try:
+                self._requests.put(None)
+            except (OSError, ValueError):
+                pass
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout)
+        for q in (self._requests, self._done):
+            q.close()
+            q.cancel_join_thread()
+
+    def _worker_failed(self, reason):
+        # Kills the worker and schedules the next attempt instead of waiting for one
+        self._stop_worker(timeout=0.05)
+        self._ready = False
+        self._failures += 1
+        if self._failures > self.max_restarts:
+            self._retry_at = float("inf")
+            print(f"⚠️ Hand inference worker {reason}; gave up after {self.max_restarts} restarts, "
+                  f"detecting in-process.", flush=True)
+        else:
+            delay = self.backoff * 2 ** (self._failures - 1)
+            self._retry_at = time.monotonic() + delay
+            print(f"⚠️ Hand inference worker {reason}; detecting in-process, restarting it in {delay:.0f}s.",
+                  flush=True)
+
+    def setModelComplexity(self, modelComplexity):
+        """Restarts the worker with the lite (0) or full (1) landmark model."""
+        if modelComplexity == self.modelComplexity:
+            return
+        self.modelComplexity = self._options["modelComplexity"] = modelComplexity
+        self._closeFallback()  # Recreated with the new model if it's needed again
+        if self._process is not None:
+            # Frames are detected in-process while the new worker loads
+            self._stop_worker(timeout=0.2)
+            self._launch_worker()
+
+    def _closeFallback(self):
+        if self.hands is not None:
+            self.hands.close()
+            self.hands = None
+
+    def close(self):
+        """Stops the worker and frees the shared memory (restarted on next use)."""
+        self._stop_worker()
+        self._closeFallback()
+        if self._frame_shm is not None:
+            del self._frames, self._records
+            for shm in (self._frame_shm, self._result_shm):
+                shm.close()
+                shm.unlink()
+            self._frame_shm = self._result_shm = None
+
+    def workerStats(self):
+        return {
+            "alive": self._process is not None and self._process.is_alive(),
+            "pid": self._process.pid if self._process is not None else None,
+            "ready": self._ready,
+            "restarts": self.restarts,
+            "timeouts": self.timeouts,
+            "failures": self._failures,
+            "fallbackFrames": self.fallbackFrames,
+        }
+
+    # ---------- Detection ----------
+
+    def _detect(self, img):
+        if self._process is None:
+            if not self._failures:
+                self._start_worker()  # First use: wait for the model like handDetector does
+            elif time.monotonic() >= self._retry_at:
+                self.restarts += 1
+                self._launch_worker()
+        elif not self._process.is_alive():
+            self._worker_failed(f"exited with code {self._process.exitcode}")
+        if self._process is not None and not self._ready:
+            self._poll_start()
+        if not self._ready:
+            self._detectInProcess(img)
+            return
+        t0 = time.perf_counter()
+
+        self._seq += 1
+        seq, slot = self._seq, self._seq % self.slots
+        np.copyto(self._frames[slot], img)
+        self._requests.put((seq, slot, self.inferSize))  # inferSize may change at runtime
+        record = self._wait_result(seq, slot)
+        if record is None and not self._ready:
+            self._detectInProcess(img)  # The worker just failed on this frame
+            return
+
+        self.results = None
+        self.numHands = 0
+        self.frameCount += 1
+        if record is not None:
+            self.numHands = int(record["numHands"])
+            self.lmArray[:self.numHands] = record["landmarks"][:self.numHands]
+            self.detectionCount += int(record["detected"])
+        if self.numHands < self.prevHandCount:
+            self.lostCount += 1
+        self.prevHandCount = self.numHands
+        if self.recorder is not None:
+            self.recorder.write(self.lmArray[:self.numHands])
+        self._scaleLandmarks(img.shape)
+        if self.metrics is not None:
+            total = time.perf_counter() - t0
+            inference = float(record["inferSec"]) if record is not None else total
+            self.metrics.record("inference", inference)
+            self.metrics.record("ipc", total - inference)
+
+    def _detectInProcess(self, img):
+        if self.hands is None:
+            self.hands = htm.handDetector._createModel(self)
+        self.fallbackFrames += 1
+        htm.handDetector._detect(self, img)
+
+    def _wait_result(self, seq, slot):
+        timeout = self.timeout if self._warm else self.first_timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                done = self._done.get(timeout=min(max(remaining, 0), 0.1))
+            except queue.Empty:
+                if not self._process.is_alive():
+                    self._worker_failed(f"exited with code {self._process.exitcode}")
+                    return None
+                if remaining > 0:
+                    continue
+                self.timeouts += 1
+                self._worker_failed(f"did not answer within {timeout:.1f}s")
+                return None
+            if done == seq:
+                self._warm = True
+                self._failures = 0  # Healthy again: the next failure restarts without delay
+                record = self._records[slot]
+                return record if record["seq"] == seq else None
+            # Stale answer to a request that already timed out; keep waiting
+
+    def findHands(self, img, draw=True):
+        img = super().findHands(img, draw=False)
+        if draw:
+            self._drawLandmarks(img)
+        return img
+
+    def _drawLandmarks(self, img):
+        # No MediaPipe results object in this process; draw from lmInt
+        for hand in self.lmInt[:self.numHands, :, 1:]:
+            for a, b in self.mpHands.HAND_CONNECTIONS:
+                cv2.line(img, tuple(hand[a]), tuple(hand[b]), (0, 255, 0), 2)
+            for x, y in hand:
+                cv2.circle(img, (int(x), int(y)), 3, (0, 0, 255), cv2.FILLED)
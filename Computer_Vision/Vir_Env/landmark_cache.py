@@ -0,0 +1,95 @@
+"""
+Compact binary cache of MediaPipe hand landmarks, so recorded sessions can be
+replayed without re-running inference.
+
+File layout (little-endian):
+    header: b"AMLM", u8 version, u8 maxHands
+    frame:  u8 numHands, then numHands x 21 x 3 float32 normalised (x, y, z)
+"""
+import struct
+import time
+
+import numpy as np
+
+import HandTrackingModule as htm
+
+MAGIC = b"AMLM"
+VERSION = 1
+_HEADER = struct.Struct("<4sBB")
+_HAND_FLOATS = htm.NUM_LANDMARKS * 3
+
+
+class LandmarkRecorder:
+    """Appends one record per frame; handDetector calls write() via its recorder attribute."""
+
+    def __init__(self, path, maxHands):
+        self.path = path
+        self.frames = 0
+        self._f = open(path, "wb")
+        self._f.write(_HEADER.pack(MAGIC, VERSION, maxHands))
+
+    def write(self, hands):
+        """hands: (numHands, 21, 3) normalised landmarks (numHands may be 0)."""
+        self._f.write(bytes((len(hands),)))
+        if len(hands):
+            self._f.write(np.ascontiguousarray(hands, dtype="<f4").tobytes())
+        self.frames += 1
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+def load_landmarks(path):
+    """
+    Reads a landmark cache.
+
+    Returns:
+        tuple: (maxHands, list of (numHands, 21, 3) float32 arrays, one per frame)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, maxHands = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a landmark cache (v{VERSION})")
+    frames = []
+    offset = _HEADER.size
+    while offset < len(data):
+        numHands = data[offset]
+        offset += 1
+        count = numHands * _HAND_FLOATS
+        hands = np.frombuffer(data, dtype="<f4", count=count, offset=offset)
+        frames.append(hands.reshape(numHands, htm.NUM_LANDMARKS, 3))
+        offset += count * 4
+    return maxHands, frames
+
+
+class CachedLandmarkDetector(htm.handDetector):
+    """
+    handDetector that replays landmarks from a cache file instead of running
+    MediaPipe. Frames are consumed in order, one per findHands call; past the
+    end of the cache it reports no hands.
+    """
+
+    def __init__(self, cache_path, maxHands=1, outSize=(640, 480), metrics=None):
+        self.cache_path = cache_path
+        self.cachedMaxHands, self.cachedFrames = load_landmarks(cache_path)
+        self.cacheIndex = 0
+        super().__init__(maxHands=maxHands, outSize=outSize, metrics=metrics)
+
+    def _createModel(self):
+        return None  # No MediaPipe graph needed
+
+    def _detect(self, img):
+        start = time.perf_counter()
+        self.results = None
+        self.numHands = 0
+        if self.cacheIndex < len(self.cachedFrames):
+            hands = self.cachedFrames[self.cacheIndex]
+            self.cacheIndex += 1
+            self.numHands = min(len(hands), self.maxHands)
+            self.lmArray[:self.numHands] = hands[:self.numHands]
+        self.frameCount += 1
+        self._scaleLandmarks(img.shape)
+        if self.metrics is not None:
+            self.metrics.record("landmarks", time.perf_counter() - start)
@@ -0,0 +1,201 @@
+"""
+Mode controller: runs Gesture Mode switches off the mouse listener thread.
+
+pynput calls on_click inside its listener thread, and every mouse event on
+the system waits until the callback returns, so a switch that loads the
+vision stack or waits on the camera would freeze input. The listener only
+timestamps middle presses into a SimpleQueue (click()). A controller thread
+turns them into triple-click toggles, applies control-channel requests and
+runs the start/stop callables.
+
+States: air_mouse -> starting -> gesture -> stopping -> air_mouse. Requests
+that arrive during a transition wait in the queue; once it finishes, the
+controller folds everything queued into one target against the settled state
+(two toggles cancel out) and makes at most one more transition.
+"""
+import collections
+import queue
+import threading
+import time
+
+from control_channel import ClickSequenceDetector
+
+AIR_MOUSE = "air_mouse"
+STARTING = "starting"
+GESTURE = "gesture"
+STOPPING = "stopping"
+
+# Queue items: (kind, timestamp, payload)
+_CLICK = 0     # payload: None
+_REQUEST = 1   # payload: (active, source, from_channel)
+_SYNC = 2      # payload: threading.Event set once everything before it is handled
+_STOP = 3
+
+
+def _summary(samples, scale, unit):
+    samples = sorted(samples)
+    if not samples:
+        return {f"p50_{unit}": None, f"p99_{unit}": None, f"max_{unit}": None}
+    n = len(samples)
+    return {f"p50_{unit}": samples[n // 2] * scale, f"p99_{unit}": samples[min(n - 1, int(n * 0.99))] * scale,
+            f"max_{unit}": samples[-1] * scale}
+
+
+class ModeController:
+    """
+    Owns the Air Mouse / Gesture Mode state.
+
+    Args:
+        start (callable): Enters Gesture Mode; returns False if it can't.
+        stop (callable): Leaves Gesture Mode.
+        clicks (ClickSequenceDetector): Turns middle-press timestamps into
+            toggles. Defaults to three clicks 0.2 s apart.
+        dedupe_window (float): Seconds after a control-channel request during
+            which a completed click sequence is ignored (firmware that sends
+            both signals for one switch).
+    """
+
+    def __init__(self, start, stop, clicks=None, dedupe_window=1.0):
+        self._start = start
+        self._stop = stop
+        self.clicks = clicks if clicks is not None else ClickSequenceDetector()
+        self.dedupe_window = dedupe_window
+        self.state = AIR_MOUSE
+        self._events = queue.SimpleQueue()
+        self._thread = None
+        self._last_channel = float("-inf")  # Timestamp of the last control-channel request
+
+        # Metrics
+        self.transitions = 0
+        self.coalesced = 0       # Accepted requests that needed no transition of their own
+        self.ignored_clicks = 0  # Click sequences dropped by the dedupe window
+        self.failed_starts = 0
+        self._callback_times = collections.deque(maxlen=1024)  # Listener callback seconds
+        self._switch_times = collections.deque(maxlen=64)      # Request -> transition done, seconds
+
+    # ---------- Listener / channel side (never blocks) ----------
+
+    def click(self, t=None):
+        """Queues one middle press. Safe to call from the listener callback."""
+        self._events.put((_CLICK, time.monotonic() if t is None else t, None))
+
+    def record_callback(self, seconds):
+        """Records how long one listener callback took."""
+        self._callback_times.append(seconds)
+
+    def request(self, active, source, from_channel=False, t=None):
+        """
+        Queues a switch to Gesture Mode (True), Air Mouse (False) or a toggle (None).
+
+        Args:
+            source (str): What asked for the switch, for the log.
+            from_channel (bool): Came from the control channel; opens the
+                click dedupe window.
+        """
+        self._events.put((_REQUEST, time.monotonic() if t is None else t, (active, source, from_channel)))
+
+    def wait_idle(self, timeout=None):
+        """Blocks until every request queued so far has been handled."""
+        done = threading.Event()
+        self._events.put((_SYNC, time.monotonic(), done))
+        return done.wait(timeout)
+
+    @property
+    def active(self):
+        """True while in (or entering) Gesture Mode."""
+        return self.state in (STARTING, GESTURE)
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ModeController", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stops the controller thread; requests still queued are dropped."""
+        if self._thread is not None:
+            self._events.put((_STOP, time.monotonic(), None))
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---------- Controller thread ----------
+
+    def _run(self):
+        while True:
+            batch = [self._events.get()]
+            while True:
+                try:
+                    batch.append(self._events.get_nowait())
+                except queue.Empty:
+                    break
+
+            settled = self.state == GESTURE
+            target, source, requested_at, accepted = settled, None, None, 0
+            syncs, stopping = [], False
+            for kind, t, payload in batch:
+                if kind == _CLICK:
+                    if not self.clicks.click(t):
+                        continue
+                    print(f"\n*** Detected {self.clicks.count} rapid middle clicks! ***", flush=True)
+                    if t - self._last_channel < self.dedupe_window:
+                        self.ignored_clicks += 1
+                        print("Ignored: mode already switched via the control channel.", flush=True)
+                        continue
+                    active, why = None, "middle clicks"
+                elif kind == _REQUEST:
+                    active, why, from_channel = payload
+                    if from_channel:
+                        self._last_channel = t
+                elif kind == _SYNC:
+                    syncs.append(payload)
+                    continue
+                else:
+                    stopping = True
+                    break
+                target = (not target) if active is None else active
+                source, requested_at = why, t
+                accepted += 1
+
+            if stopping:
+                return
+            if target != settled:
+                self._transition(target, source, requested_at)
+            self.coalesced += max(0, accepted - (target != settled))
+            for done in syncs:
+                done.set()
+
+    def _transition(self, target, source, requested_at):
+        self.transitions += 1
+        if target:
+            self.state = STARTING
+            print(f"🟢 Switching to GESTURE MODE ({source})", flush=True)
+        else:
+            self.state = STOPPING
+            print(f"🔵 Switching back to default mouse mode ({source})", flush=True)
+        try:
+            ok = (self._start() if target else self._stop()) is not False
+        except Exception as e:
+            print(f"⚠️ Mode switch failed: {e}", flush=True)
+            ok = False
+        if target and not ok:
+            self.failed_starts += 1
+            self.state = AIR_MOUSE
+        else:
+            self.state = GESTURE if target else AIR_MOUSE  # A failed stop still leaves Gesture Mode
+        self._switch_times.append(time.monotonic() - requested_at)
+
+    def stats(self):
+        """Returns the state, counters, listener callback time (us) and switch time (ms)."""
+        report = {
+            "state": self.state,
+            "transitions": self.transitions,
+            "coalesced": self.coalesced,
+            "ignored_clicks": self.ignored_clicks,
+            "failed_starts": self.failed_starts,
+            "queue_depth": self._events.qsize(),
+        }
+        report.update({f"callback_{k}": v for k, v in _summary(list(self._callback_times), 1e6, "us").items()})
+        report.update({f"switch_{k}": v for k, v in _summary(list(self._switch_times), 1e3, "ms").items()})
+        return report
@@ -0,0 +1,200 @@
+import collections
+import contextlib
+import http.server
+import json
+import sys
+import threading
+import time
+
+# Stages timed on the gesture hot path, in pipeline order
+STAGES = ("capture", "color", "inference", "landmarks", "classify", "inject")
+
+
+class RollingHistogram:
+    """
+    Keeps the last `window` samples (seconds) and reports percentiles on demand.
+    Recording is a single deque append, so it is cheap enough for the hot path.
+    """
+
+    def __init__(self, window=1000):
+        self._samples = collections.deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        """Returns count and mean/p50/p95/p99/max in milliseconds."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": self.count}
+        n = len(samples)
+
+        def pct(p):
+            return samples[min(n - 1, int(p * n))] * 1000
+
+        return {
+            "count": self.count,
+            "mean_ms": sum(samples) / n * 1000,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": samples[-1] * 1000,
+        }
+
+
+class PipelineMetrics:
+    """
+    Per-stage latency histograms for the gesture pipeline plus pluggable
+    counter sources (e.g. FrameGrabber.stats, ActionDispatcher.stats).
+
+    Args:
+        window (int): Samples kept per stage.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._hists = {name: RollingHistogram(window) for name in STAGES}
+        self._sources = {}
+        self._lock = threading.Lock()  # Guards creating new histograms/sources
+        self.started = time.time()
+
+    def record(self, stage, seconds):
+        hist = self._hists.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(stage, RollingHistogram(self.window))
+        hist.record(seconds)
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        """Context manager that records the wall time of its block under `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def add_source(self, name, fn):
+        """Registers a callable returning a dict of counters to include in snapshots."""
+        with self._lock:
+            self._sources[name] = fn
+
+    def remove_source(self, name):
+        with self._lock:
+            self._sources.pop(name, None)
+
+    def snapshot(self):
+        """Returns a JSON-serialisable view of all histograms and sources."""
+        with self._lock:
+            hists = dict(self._hists)
+            sources = dict(self._sources)
+        snap = {
+            "ts": time.time(),
+            "uptime_s": time.time() - self.started,
+            "stages": {name: hist.summary() for name, hist in hists.items()},
+        }
+        for name, fn in sources.items():
+            try:
+                snap[name] = fn()
+            except Exception as e:
+                snap[name] = {"error": str(e)}
+        return snap
+
+
+class JsonLinesExporter:
+    """
+    Writes a metrics snapshot as one JSON line every `interval` seconds.
+
+    Args:
+        metrics (PipelineMetrics): Metrics to export.
+        path (str): File to append to; "-" or None writes to stdout.
+        interval (float): Seconds between snapshots.
+    """
+
+    def __init__(self, metrics, path=None, interval=5.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def write_once(self):
+        line = json.dumps(self.metrics.snapshot())
+        if self.path in (None, "-"):
+            print(line, file=sys.stdout, flush=True)
+        else:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write_once()
+            except Exception as e:
+                print(f"⚠️ Metrics export failed: {e}", flush=True)
+
+
+class MetricsHttpServer:
+    """
+    Serves the latest snapshot as JSON at http://<host>:<port>/metrics.
+    Binds to localhost by default.
+    """
+
+    def __init__(self, metrics, port=8765, host="127.0.0.1"):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep the console for gesture output
+
+        return Handler
+
+    def start(self):
+        if self._server is None:
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), self._handler())
+            self.port = self._server.server_address[1]  # Resolves port=0
+            self._thread = threading.Thread(target=self._server.serve_forever,
+                                            name="MetricsHttpServer", daemon=True)
+            self._thread.start()
+            print(f"📈 Metrics at http://{self.host}:{self.port}/metrics", flush=True)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
@@ -0,0 +1,118 @@
+import http.server
+import threading
+import time
+
+import cv2
+
+BOUNDARY = b"airmouseframe"
+
+
+class PreviewStream:
+    """
+    Low-rate MJPEG debug preview for headless runs.
+
+    The gesture loop asks due() once per frame; only when it returns True does
+    it draw overlays and publish() the frame, so the preview costs nothing on
+    the other frames. View it at http://<host>:<port>/preview.mjpg (or grab a
+    single frame from /preview.jpg).
+
+    Args:
+        port (int): Port to serve on (0 picks a free one).
+        fps (float): Max preview frame rate.
+        host (str): Bind address; localhost by default.
+        quality (int): JPEG quality 0-100.
+    """
+
+    def __init__(self, port=8766, fps=5.0, host="127.0.0.1", quality=70):
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / fps
+        self.quality = quality
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._next_due = 0.0
+        self._server = None
+        self._thread = None
+
+    def due(self):
+        """True if enough time has passed to publish another preview frame."""
+        return time.monotonic() >= self._next_due
+
+    def publish(self, img):
+        """JPEG-encodes `img` and hands it to connected viewers."""
+        self._next_due = time.monotonic() + self.interval
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._cond:
+            self._jpeg = buf.tobytes()
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _wait_frame(self, last_seq, timeout=2.0):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_seq or self._server is None, timeout=timeout)
+            return self._seq, self._jpeg
+
+    def _handler(self):
+        stream = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                if path == "/preview.jpg":
+                    _, jpeg = stream._wait_frame(-1, timeout=0)
+                    if jpeg is None:
+                        self.send_error(503, "No preview frame yet")
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(jpeg)))
+                    self.end_headers()
+                    self.wfile.write(jpeg)
+                elif path in ("", "/preview.mjpg"):
+                    self.send_response(200)
+                    self.send_header("Content-Type",
+                                     "multipart/x-mixed-replace; boundary=" + BOUNDARY.decode())
+                    self.end_headers()
+                    seq = 0
+                    try:
+                        while stream._server is not None:
+                            new_seq, jpeg = stream._wait_frame(seq)
+                            if jpeg is None or new_seq == seq:
+                                continue
+                            seq = new_seq
+                            self.wfile.write(b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\n"
+                                             + f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                                             + jpeg + b"\r\n")
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass  # Viewer went away
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass  # Keep the console for gesture output
+
+        return Handler
+
+    def start(self):
+        if self._server is None:
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), self._handler())
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]  # Resolves port=0
+            self._thread = threading.Thread(target=self._server.serve_forever,
+                                            name="PreviewStream", daemon=True)
+            self._thread.start()
+            print(f"🎥 Debug preview at http://{self.host}:{self.port}/preview.mjpg", flush=True)
+        return self
+
+    def stop(self):
+        server = self._server
+        if server is not None:
+            with self._cond:
+                self._server = None
+                self._cond.notify_all()
+            server.shutdown()
+            server.server_close()
+            self._thread = None
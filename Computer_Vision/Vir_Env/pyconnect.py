@@ -4,110 +4,189 @@ from pynput import mouse
 import sys # For flushing print output
 import platform
 import os
+import signal
 
-# --- Try importing the gesture logic ---
+# --- Gesture logic is imported lazily (see load_gesture_logic) ---
+# It pulls in cv2, numpy and mediapipe: seconds of startup and hundreds of MB
+# that the mouse listener doesn't need.
 current_dir = os.path.dirname(os.path.abspath(__file__))
 print(current_dir)
 sys.path.insert(0, current_dir)
 
-try:
-    import gesture_logic
-except ImportError:
-    print("❌ Error: gesture_logic.py not found.")
-    print("Ensure gesture_logic.py is in the same directory.")
-    sys.exit(1)
+from control_channel import (ControlChannel, ClickSequenceDetector, open_transport,
+                             MODE_AIR_MOUSE, MODE_GESTURE, MODE_TOGGLE)
+from mode_controller import ModeController
 
 # --- Configuration ---
 MIDDLE_CLICK_THRESHOLD = 0.20 # Max seconds between clicks (tune this!)
 MIDDLE_CLICK_COUNT_TARGET = 3 # Number of rapid clicks to detect
+PREWARM_GESTURE_ENGINE = True # Load camera + model in the background once the listener is live, so the first toggle is instant
+CAMERA_IDLE_TIMEOUT = 60.0 # Seconds out of Gesture Mode before the webcam is released (None = never)
+METRICS_JSONL_PATH = None # e.g. "gesture_metrics.jsonl" or "-" (stdout) for periodic per-stage latency snapshots
+METRICS_HTTP_PORT = None # e.g. 8765 to serve the same snapshot at http://127.0.0.1:8765/metrics
+HEADLESS_MODE = os.environ.get("AIRMOUSE_HEADLESS", "0") == "1" # No gesture window/overlays (kiosk deployments)
+PREVIEW_PORT = None # e.g. 8766 for a 5 fps MJPEG debug preview at http://127.0.0.1:8766/preview.mjpg
+INFERENCE_PROCESS = os.environ.get("AIRMOUSE_INFERENCE_PROCESS", "0") == "1" # MediaPipe in a worker process, off the listener's GIL
+CONTROL_CHANNEL = os.environ.get("AIRMOUSE_CONTROL") # e.g. "udp:5005" (localhost only), "udp:0.0.0.0:5005" (LAN, unauthenticated), "serial:/dev/ttyUSB0@115200" or "unix:/tmp/airmouse.sock" (None = middle clicks only)
+CONTROL_DEDUPE_WINDOW = 1.0 # Seconds after a control-channel switch during which a middle-click switch is ignored
+GESTURE_SOURCE = os.environ.get("AIRMOUSE_SOURCE") # Webcam index, video file or image directory (None = webcam 0)
+INPUT_BACKEND = os.environ.get("AIRMOUSE_INPUT", "auto") # "auto", "xtest", "uinput" or "pyautogui" for gesture actions
 
 # --- Global State ---
-is_cv_mode_active = False # Start in Air Mouse mode (Python perspective)
-gesture_processing_thread = None # Thread object for CV task
-cv_stop_event = threading.Event() # Event to signal CV thread to stop
-
-# --- Variables for Click Detection ---
-last_middle_click_time = 0
-middle_click_count = 0
+gesture_logic = None # Module, set by load_gesture_logic()
+gesture_engine = None # Long-lived gesture_logic.GestureEngine
+gesture_engine_lock = threading.Lock()
+startup_times = {} # Seconds since process start at listener-ready / vision-loaded
+mode_controller = None # ModeController: owns the mode and runs switches off the listener thread
+control_channel = None
 
 # --- Core Functions ---
 
+_module_loaded_at = time.monotonic()
+
+def seconds_since_start():
+    """Seconds since this process started (falls back to module import time)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _module_loaded_at
+
+def load_gesture_logic():
+    """Imports the vision stack (cv2, numpy, mediapipe) on first use."""
+    global gesture_logic
+    if gesture_logic is None:
+        try:
+            import gesture_logic as module
+        except ImportError as e:
+            print(f"❌ Error: could not import gesture_logic ({e}).", flush=True)
+            print("Ensure gesture_logic.py is in the same directory and OpenCV/MediaPipe are installed.", flush=True)
+            raise
+        gesture_logic = module
+        startup_times["vision_loaded"] = seconds_since_start()
+    return gesture_logic
+
+def get_gesture_engine():
+    """Returns the shared gesture engine, creating and starting it on first use."""
+    global gesture_engine
+    with gesture_engine_lock:
+        if gesture_engine is None:
+            gesture_engine = load_gesture_logic().GestureEngine(idle_timeout=CAMERA_IDLE_TIMEOUT,
+                                                                metrics_path=METRICS_JSONL_PATH,
+                                                                metrics_port=METRICS_HTTP_PORT,
+                                                                headless=HEADLESS_MODE,
+                                                                preview_port=PREVIEW_PORT,
+                                                                inference_process=INFERENCE_PROCESS,
+                                                                source=GESTURE_SOURCE,
+                                                                input_backend=INPUT_BACKEND)
+            if mode_controller is not None:
+                gesture_engine.metrics.add_source("mode_controller", mode_controller.stats)
+        gesture_engine.start() # No-op if the engine thread is already running
+        return gesture_engine
+
+def prewarm_gesture_engine():
+    """Imports the vision stack and initialises the camera and hand detector in the background."""
+    def _warm():
+        try:
+            get_gesture_engine().warm_up()
+        except ImportError:
+            pass # Reported by load_gesture_logic; Gesture Mode stays unavailable
+    threading.Thread(target=_warm, name="GestureWarmup", daemon=True).start()
+
+def on_listener_ready():
+    """Called once the mouse listener is live; only then is the vision stack loaded."""
+    startup_times["listener_ready"] = seconds_since_start()
+    print(f"Mouse listener ready after {startup_times['listener_ready']:.2f}s.", flush=True)
+    if PREWARM_GESTURE_ENGINE:
+        prewarm_gesture_engine()
+
 def start_cv_processing():
-    """Starts the gesture recognition thread if not already running."""
-    global gesture_processing_thread, cv_stop_event
-    if gesture_processing_thread is None or not gesture_processing_thread.is_alive():
-        print("\n--- Starting GESTURE RECOGNITION Thread ---", flush=True)
-        cv_stop_event.clear() # Ensure stop event is cleared before starting
-        # Create and start the thread, running the function from gesture_logic.py
-        gesture_processing_thread = threading.Thread(
-            target=gesture_logic.run_gesture_control,
-            args=(cv_stop_event,), # Pass the stop event to the function
-            daemon=True # Allows main program to exit even if this thread is stuck
-        )
-        gesture_processing_thread.start()
-    else:
-        print("Gesture processing thread already running.", flush=True)
+    """Resumes gesture recognition on the warm engine. Returns False if it can't load."""
+    print("\n--- Resuming GESTURE RECOGNITION ---", flush=True)
+    try:
+        get_gesture_engine().resume()
+    except ImportError:
+        print("Gesture Mode unavailable.", flush=True)
+        return False
+    return True
 
 def stop_cv_processing():
-    """Signals the gesture recognition thread to stop and waits for it."""
-    global gesture_processing_thread, cv_stop_event
-    if gesture_processing_thread and gesture_processing_thread.is_alive():
-        print("Signalling Gesture Processing thread to stop...", flush=True)
-        cv_stop_event.set() # <<< Signal the loop in gesture_logic.py to stop
-        gesture_processing_thread.join(timeout=3.0) # Wait max 3 seconds for thread to finish
-        if gesture_processing_thread.is_alive():
-            print("⚠️ Warning: Gesture processing thread did not stop cleanly after timeout.", flush=True)
-            # You might consider more forceful termination if needed, but it's risky
-        else:
-             print("Gesture Processing thread stopped.", flush=True)
-        gesture_processing_thread = None # Clear the thread object
-        cv_stop_event.clear() # Clear event for next time (optional, handled in start)
+    """Pauses gesture recognition; the camera and model stay loaded."""
+    if gesture_engine is not None and gesture_engine.is_active():
+        gesture_engine.pause()
+        print("Gesture recognition paused.", flush=True)
+        metrics = gesture_engine.toggle_metrics
+        if metrics["first_frame_ms"] is not None:
+            first_action = metrics["first_action_ms"]
+            print(f"Last toggle: first frame {metrics['first_frame_ms']:.0f} ms, first action "
+                  f"{'n/a' if first_action is None else f'{first_action:.0f} ms'}", flush=True)
     else:
-         print("Gesture Processing thread not running or already stopped.", flush=True)
+         print("Gesture recognition not running.", flush=True)
+
+def shutdown_cv_processing():
+    """Stops the gesture engine thread and releases the camera."""
+    global gesture_engine
+    with gesture_engine_lock:
+        if gesture_engine is not None:
+            gesture_engine.shutdown()
+            gesture_engine = None
+
+
+def start_mode_controller():
+    """Starts the thread that owns the mode; middle clicks are the fallback switch signal."""
+    global mode_controller
+    if mode_controller is None:
+        clicks = ClickSequenceDetector(MIDDLE_CLICK_THRESHOLD, MIDDLE_CLICK_COUNT_TARGET)
+        mode_controller = ModeController(start_cv_processing, stop_cv_processing, clicks,
+                                         CONTROL_DEDUPE_WINDOW).start()
+    return mode_controller
+
+
+def set_cv_mode(active, source):
+    """
+    Requests a switch between Gesture Mode and default mouse mode. Returns
+    immediately; the mode controller thread performs it.
+
+    Args:
+        active (bool): True for Gesture Mode; None toggles.
+        source (str): What asked for the switch, for the log.
+    """
+    mode_controller.request(active, source)
+
+
+def on_control_mode_switch(mode, message):
+    """ControlChannel callback for MODE_SWITCH messages."""
+    targets = {MODE_AIR_MOUSE: False, MODE_GESTURE: True, MODE_TOGGLE: None}
+    if mode not in targets:
+        print(f"⚠️ Unknown mode {mode} in control message #{message.seq}", flush=True)
+        return
+    mode_controller.request(targets[mode], f"control channel #{message.seq}", from_channel=True,
+                            t=message.received)
+
+
+def start_control_channel():
+    """Opens CONTROL_CHANNEL, if configured, and starts receiving on it."""
+    global control_channel
+    if not CONTROL_CHANNEL:
+        return
+    try:
+        control_channel = ControlChannel(open_transport(CONTROL_CHANNEL), on_control_mode_switch).start()
+        print(f"Control channel listening on {CONTROL_CHANNEL} (middle clicks remain as fallback).", flush=True)
+    except (OSError, ImportError, ValueError) as e:
+        print(f"⚠️ Control channel {CONTROL_CHANNEL!r} unavailable ({e}); using middle clicks only.", flush=True)
 
 
 def on_click(x, y, button, pressed):
     """Callback executed when a mouse button is clicked."""
-    global is_cv_mode_active, last_middle_click_time, middle_click_count
-
-    # We only care about the press event for detection
+    # Runs in pynput's thread and every mouse event waits for it: only queue
+    # the press; the mode controller detects the sequence and switches.
+    start = time.perf_counter()
     if button == mouse.Button.middle and pressed:
-        current_time = time.time()
-        time_diff = current_time - last_middle_click_time
-
-        # Check if this click is close enough to the previous one
-        if time_diff < MIDDLE_CLICK_THRESHOLD:
-            middle_click_count += 1
-            print(f"Middle click #{middle_click_count} (Interval: {time_diff:.3f}s)", flush=True) # Debug
-        else:
-            # Reset counter if the click is too far apart in time
-            # print(f"Middle click reset (Interval too long: {time_diff:.3f}s)", flush=True) # Debug
-            middle_click_count = 1 # This click is the start of a new potential sequence
-
-        last_middle_click_time = current_time # Update time of the last middle click
-
-        # Check if we reached the target number of clicks
-        if middle_click_count >= MIDDLE_CLICK_COUNT_TARGET:
-            print(f"\n*** Detected {MIDDLE_CLICK_COUNT_TARGET} rapid middle clicks! ***", flush=True)
-
-            # Toggle the mode state
-            is_cv_mode_active = not is_cv_mode_active
-
-            if is_cv_mode_active:
-                print("🟢 Switching to GESTURE MODE", flush=True)
-                # Stop any previous instance cleanly before starting a new one (important!)
-                stop_cv_processing()
-                time.sleep(0.2) # Small delay to ensure resources are released
-                # Start the CV processing in its thread
-                start_cv_processing()
-            else:
-                print("🔵 Switching back to default mouse mode (or stopping gestures)", flush=True)
-                # Stop the CV processing thread
-                stop_cv_processing()
-
-            # IMPORTANT: Reset click count and time immediately after detection and mode switch
-            middle_click_count = 0
-            last_middle_click_time = 0
+        mode_controller.click(time.monotonic())
+    mode_controller.record_callback(time.perf_counter() - start)
 
 
 def start_mouse_listener():
@@ -118,6 +197,8 @@ def start_mouse_listener():
     try:
         # Use 'with' statement for proper cleanup
         with mouse.Listener(on_click=on_click) as listener:
+            listener.wait() # Until the listener is actually receiving events
+            on_listener_ready()
             listener.join() # Blocks until the listener stops
     except Exception as e:
          # Permissions errors often occur here on Linux/macOS
@@ -130,18 +211,28 @@ def start_mouse_listener():
               traceback.print_exc()
          print("###### Exiting due to listener error. ######", flush=True)
          # Attempt to stop CV thread if it somehow started before listener error
-         stop_cv_processing()
+         shutdown_cv_processing()
          sys.exit(1) # Exit if listener fails
 
+def handle_stop_signal(signum, frame):
+    """Turns SIGTERM into the same clean shutdown path as Ctrl+C."""
+    raise KeyboardInterrupt
+
 # --- Main Execution ---
 if __name__ == "__main__":
     print("--- Hybrid Mouse/Gesture Client Starting ---", flush=True)
     print(f"Platform: {platform.system()}", flush=True)
     print(f"Listening for {MIDDLE_CLICK_COUNT_TARGET} middle clicks within {MIDDLE_CLICK_THRESHOLD*1000:.0f}ms intervals to toggle Gesture Mode.", flush=True)
     print("Initially in default mouse mode.")
+    if HEADLESS_MODE:
+        print("Headless mode: no gesture window will be shown.", flush=True)
+    signal.signal(signal.SIGTERM, handle_stop_signal)
     print("Press Ctrl+C in the console to exit.", flush=True)
     print("--------------------------------------------------", flush=True)
 
+    start_mode_controller()
+    start_control_channel()
+
     # Run the mouse listener in the main thread. It will block here.
     # The gesture logic runs in a separate thread when activated.
     try:
@@ -153,5 +244,11 @@ if __name__ == "__main__":
     finally:
         print("--- Main thread initiating cleanup. ---", flush=True)
         # Ensure the CV thread is stopped on exit, regardless of how we got here
-        stop_cv_processing()
+        if control_channel is not None:
+            control_channel.stop()
+            print(f"Control channel stats: {control_channel.stats()}", flush=True)
+        if mode_controller is not None:
+            mode_controller.stop()
+            print(f"Mode controller stats: {mode_controller.stats()}", flush=True)
+        shutdown_cv_processing()
         print("--- Client Stopped ---", flush=True)
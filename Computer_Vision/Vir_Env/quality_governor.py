@@ -0,0 +1,133 @@
+"""
+Adaptive quality governor: trades detector quality for latency so the gesture
+loop keeps up with the camera on a loaded laptop, and takes the quality back
+when there is headroom.
+
+It watches the processing time of each frame (amortised over skipped frames)
+and walks a ladder of QualityLevels, cheapest last. Hysteresis keeps it from
+oscillating:
+    - it only degrades after the p90 has been over budget for `degrade_after`
+      seconds, and only improves after it has been under `low_water` x budget
+      for `improve_after` seconds,
+    - after any change it waits `settle` seconds before judging the new level,
+    - if an improvement has to be undone within `improve_after`, the wait
+      before trying that level again doubles (up to 8x).
+"""
+import collections
+import time
+
+# One rung of the ladder.
+#   inferSize: (w, h) MediaPipe runs on, or None for the engine's own setting
+#   modelComplexity: 1 = full landmark model, 0 = lite
+#   skip: frames dropped after each processed one (0 = process every frame)
+#   draw: draw hand landmarks on the overlay
+QualityLevel = collections.namedtuple("QualityLevel", "name inferSize modelComplexity skip draw")
+
+QUALITY_LEVELS = (
+    QualityLevel("full", None, 1, 0, True),
+    QualityLevel("lite", None, 0, 0, True),
+    QualityLevel("lite-nodraw", None, 0, 0, False),
+    QualityLevel("320p", (320, 240), 0, 0, False),
+    QualityLevel("320p-skip1", (320, 240), 0, 1, False),
+    QualityLevel("320p-skip2", (320, 240), 0, 2, False),
+)
+
+
+class QualityGovernor:
+    """
+    Args:
+        budget_ms (float): Processing time allowed per camera frame, e.g.
+            33 for 30 FPS.
+        levels: Ladder of QualityLevel, best first.
+        window (int): Frames in the rolling p90.
+        low_water (float): Fraction of the budget below which it improves.
+        degrade_after (float): Seconds over budget before degrading.
+        improve_after (float): Seconds under low water before improving.
+        settle (float): Seconds after a change before measuring again.
+        start_level (int): Index of the initial level.
+        clock: Time source (seconds).
+    """
+
+    def __init__(self, budget_ms=33.0, levels=QUALITY_LEVELS, window=30, low_water=0.6,
+                 degrade_after=0.5, improve_after=3.0, settle=0.5, start_level=0,
+                 clock=time.monotonic):
+        self.budget = budget_ms / 1000.0
+        self.levels = tuple(levels)
+        self.low_water = low_water
+        self.degrade_after = degrade_after
+        self.improve_after = improve_after
+        self.settle = settle
+        self.clock = clock
+        self.index = start_level
+        self.changes = 0
+        self.reason = "start"
+        self._samples = collections.deque(maxlen=window)
+        self._changed_at = clock()
+        self._over_since = None
+        self._under_since = None
+        self._improved_at = None
+        self._backoff = [1.0] * len(self.levels)  # Multiplier on improve_after to re-enter a level
+        self.p90 = 0.0
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    def record(self, seconds):
+        """
+        Feeds one processed frame's time.
+
+        Returns:
+            QualityLevel: The new level if it changed, else None.
+        """
+        now = self.clock()
+        self._samples.append(seconds / (self.level.skip + 1))
+        if now - self._changed_at < self.settle or len(self._samples) < self._samples.maxlen // 2:
+            return None
+        ordered = sorted(self._samples)
+        self.p90 = ordered[int(len(ordered) * 0.9)]
+
+        if self.p90 > self.budget:
+            self._under_since = None
+            self._over_since = self._over_since if self._over_since is not None else now
+            if now - self._over_since >= self.degrade_after and self.index < len(self.levels) - 1:
+                if self._improved_at is not None and now - self._improved_at < self.improve_after * 2:
+                    # The last improvement didn't hold: wait longer before retrying it
+                    self._backoff[self.index] = min(self._backoff[self.index] * 2, 8.0)
+                return self._change(self.index + 1, now, "over budget")
+        elif self.p90 < self.budget * self.low_water:
+            self._over_since = None
+            self._under_since = self._under_since if self._under_since is not None else now
+            wait = self.improve_after * (self._backoff[self.index - 1] if self.index else 1.0)
+            if now - self._under_since >= wait and self.index > 0:
+                level = self._change(self.index - 1, now, "headroom")
+                self._improved_at = now
+                return level
+        else:
+            self._over_since = self._under_since = None
+        return None
+
+    def _change(self, index, now, reason):
+        self.index = index
+        self.changes += 1
+        self.reason = reason
+        self._samples.clear()
+        self._changed_at = now
+        self._over_since = self._under_since = None
+        if reason != "headroom":
+            self._improved_at = None
+        return self.level
+
+    def stats(self):
+        level = self.level
+        return {
+            "level": level.name,
+            "inferSize": level.inferSize,
+            "modelComplexity": level.modelComplexity,
+            "skip": level.skip,
+            "draw": level.draw,
+            "p90_ms": self.p90 * 1000,
+            "budget_ms": self.budget * 1000,
+            "changes": self.changes,
+            "reason": self.reason,
+        }
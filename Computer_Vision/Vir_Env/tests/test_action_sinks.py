@@ -0,0 +1,39 @@
+import os
+import struct
+
+import pytest
+
+from action_sinks import UinputSink
+
+evdev = pytest.importorskip("evdev")
+ecodes = evdev.ecodes
+
+
+class _FakeUInput:
+    # Stands in for /dev/uinput: events land in a pipe we can read back
+    def __init__(self, capabilities, name):
+        self.name = name
+        self._read, self.fd = os.pipe()
+
+    def events(self):
+        data = os.read(self._read, 4096)
+        return [e[2:] for e in struct.iter_unpack(UinputSink._EVENT.format, data)]
+
+    def close(self):
+        os.close(self.fd)
+        os.close(self._read)
+
+
+def test_relative_moves_send_deltas_not_tracked_positions(monkeypatch):
+    monkeypatch.setattr(evdev, "UInput", _FakeUInput)
+    sink = UinputSink(screen_size=(1920, 1080))
+    try:
+        sink.moveTo(100, 200)
+        assert sink._pointer.events() == [(ecodes.EV_ABS, ecodes.ABS_X, 100), (ecodes.EV_ABS, ecodes.ABS_Y, 200),
+                                          (ecodes.EV_SYN, ecodes.SYN_REPORT, 0)]
+        # The physical mouse may have moved the pointer since: only the delta goes out
+        sink.moveRel(-3.7, 5)
+        assert sink._mouse.events() == [(ecodes.EV_REL, ecodes.REL_X, -3), (ecodes.EV_REL, ecodes.REL_Y, 5),
+                                        (ecodes.EV_SYN, ecodes.SYN_REPORT, 0)]
+    finally:
+        sink.close()
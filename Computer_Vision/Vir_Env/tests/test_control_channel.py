@@ -0,0 +1,44 @@
+import control_channel as cc
+
+
+def test_corrupt_header_does_not_hold_back_next_frame():
+    good = cc.encode_frame(cc.MODE_SWITCH, 5, mode=cc.MODE_GESTURE)
+    # Valid magic and version, unknown type 0 with a bogus length of 255
+    corrupt = cc.MAGIC + bytes([cc.VERSION, 0]) + b"\x00\x00\xff"
+    decoder = cc.FrameDecoder()
+    messages = decoder.feed(corrupt + good)
+    assert [(m.type, m.seq, m.fields["mode"]) for m in messages] == [(cc.MODE_SWITCH, 5, cc.MODE_GESTURE)]
+    assert decoder.bad_frames == 1
+
+
+def test_wrong_length_for_type_is_rejected_at_header():
+    good = cc.encode_frame(cc.HEARTBEAT, 7, device_ms=42)
+    corrupt = cc.MAGIC + bytes([cc.VERSION, cc.MODE_SWITCH]) + b"\x01\x00\xff"
+    decoder = cc.FrameDecoder()
+    messages = decoder.feed(corrupt + good)
+    assert [(m.type, m.fields["device_ms"]) for m in messages] == [(cc.HEARTBEAT, 42)]
+    assert decoder.bad_frames == 1
+
+
+def test_bad_crc_is_dropped_byte_by_byte_feed():
+    good = cc.encode_frame(cc.MODE_SWITCH, 1, mode=cc.MODE_TOGGLE)
+    damaged = good[:-1] + bytes([good[-1] ^ 0xFF])
+    decoder = cc.FrameDecoder()
+    messages = []
+    for byte in damaged + good:
+        messages += decoder.feed(bytes([byte]))
+    assert [m.seq for m in messages] == [1]
+    assert decoder.bad_frames == 1
+
+
+def test_udp_binds_to_localhost_by_default():
+    transport = cc.open_transport("udp:0")
+    try:
+        assert transport._sock.getsockname()[0] == "127.0.0.1"
+    finally:
+        transport.close()
+    transport = cc.open_transport("udp:0.0.0.0:0")
+    try:
+        assert transport._sock.getsockname()[0] == "0.0.0.0"
+    finally:
+        transport.close()
@@ -0,0 +1,13 @@
+from cursor_control import CursorMapper
+
+
+def test_corners_stay_off_the_failsafe_points():
+    mapper = CursorMapper((640, 480), (1920, 1080), 100)
+    assert mapper.update(560, 50, 0.0) == (1, 1)
+    mapper.reset()
+    assert mapper.update(50, 470, 0.0) == (1918, 1078)
+
+
+def test_inset_zero_reaches_the_edge():
+    mapper = CursorMapper((640, 480), (1920, 1080), 100, inset=0)
+    assert mapper.update(560, 50, 0.0) == (0, 0)
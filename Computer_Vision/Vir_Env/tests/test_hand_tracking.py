@@ -0,0 +1,114 @@
+import math
+import threading
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+import HandTrackingModule as htm
+
+IMG = np.zeros((480, 640, 3), np.uint8)
+
+
+def _results(coords, visibility=False):
+    hands = []
+    for hand_coords in coords:
+        hand = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z in hand_coords.tolist():
+            lm = hand.landmark.add(x=x, y=y, z=z)
+            if visibility:
+                lm.visibility = 0.9
+        hands.append(hand)
+    return SimpleNamespace(multi_hand_landmarks=hands)
+
+
+def _original(hand):
+    # The per-landmark loop findPosition/fingersUp used to run
+    h, w, _ = IMG.shape
+    lmList = [[id, int(lm.x * w), int(lm.y * h)] for id, lm in enumerate(hand.landmark)]
+    xs, ys = [p[1] for p in lmList], [p[2] for p in lmList]
+    fingers = [1 if lmList[4][1] > lmList[3][1] else 0]
+    fingers += [1 if lmList[tip][2] < lmList[tip - 2][2] else 0 for tip in (8, 12, 16, 20)]
+    return lmList, (min(xs), min(ys), max(xs), max(ys)), fingers
+
+
+def _check(detector, results):
+    detector.results = results
+    detector._fillLandmarks(IMG.shape)
+    for handNo, hand in enumerate(results.multi_hand_landmarks):
+        lmList, bbox = detector.findPosition(IMG, handNo=handNo, draw=False)
+        expected = _original(hand)
+        assert (lmList, bbox, detector.fingersUp()) == expected
+        assert detector.fingersUpAll()[handNo].tolist() == expected[2]
+        length = detector.findDistance(4, 8, IMG, draw=False)[0]
+        assert length == math.hypot(lmList[8][1] - lmList[4][1], lmList[8][2] - lmList[4][2])
+
+
+def test_serialised_landmarks_match_the_original_loop():
+    coords = np.random.default_rng(1).uniform(0, 1, (2, 21, 3))
+    results = _results(coords)
+    wire = htm._wireLandmarks(results.multi_hand_landmarks)
+    np.testing.assert_array_equal(wire, coords.reshape(-1, 3).astype(np.float32))
+    _check(htm.handDetector(maxHands=2), results)
+
+
+def test_other_layouts_fall_back_to_attributes():
+    coords = np.random.default_rng(2).uniform(0, 1, (1, 21, 3))
+    results = _results(coords, visibility=True)
+    assert htm._wireLandmarks(results.multi_hand_landmarks) is None
+    _check(htm.handDetector(maxHands=1), results)
+
+
+def test_motion_pause_forces_inference_on_slow_drift():
+    # A textured frame shifted 1 px per frame stays under the gate threshold,
+    # so reuse only stops at maxReuse unless the caller pauses the gate
+    texture = np.random.default_rng(3).integers(0, 256, (480, 700, 3), dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (31, 31), 0)
+    coords = np.random.default_rng(4).uniform(0.3, 0.6, (1, 21, 3))
+    results = _results(coords)
+    for paused, expected in ((False, 1), (True, 6)):
+        detector = htm.handDetector(maxHands=1, motionThreshold=3.0, maxReuse=5)
+        calls = []
+        detector.hands = SimpleNamespace(process=lambda img: calls.append(1) or results)
+        detector.motionPaused = paused
+        for shift in range(6):
+            detector.findHands(np.ascontiguousarray(texture[:, shift:shift + 640]), draw=False)
+        assert len(calls) == expected
+
+
+class _FakeHands:
+    def __init__(self, model_complexity, **kwargs):
+        self.complexity = model_complexity
+        self.frames = 0
+        self.closed = threading.Event()
+
+    def process(self, img):
+        self.frames += 1
+        return SimpleNamespace(multi_hand_landmarks=None)
+
+    def close(self):
+        self.closed.set()
+
+
+def test_model_complexity_swaps_in_a_graph_built_off_thread():
+    detector = htm.handDetector(maxHands=1)
+    detector.mpHands = SimpleNamespace(Hands=_FakeHands)
+    detector.hands = old = _FakeHands(1)
+    detector.setModelComplexity(0)
+    assert detector.hands is old and detector.modelSwapPending
+    new = detector._pendingModel.result(timeout=5)
+    assert new.complexity == 0 and new.frames == 1  # Warmed up by the builder
+
+    detector.findHands(IMG, draw=False)
+    assert detector.hands is new and not detector.modelSwapPending
+    assert new.frames == 2 and old.frames == 0
+    assert old.closed.wait(5)
+
+    # Switching again before a build finishes drops (and closes) that graph
+    detector.setModelComplexity(1)
+    pending = detector._pendingModel
+    detector.setModelComplexity(0)
+    assert not detector.modelSwapPending and detector.hands is new
+    if not pending.cancelled():
+        assert pending.result(timeout=5).closed.wait(5)
@@ -0,0 +1,82 @@
+import numpy as np
+
+import imu_fusion as imu
+
+
+def _recursive(prev, rate, meas, dt, alpha):
+    out = np.empty_like(meas)
+    for k in range(len(meas)):
+        prev = alpha * (prev + rate[k] * dt) + (1 - alpha) * meas[k]
+        out[k] = prev
+    return out
+
+
+def test_complementary_matches_recursion_for_small_alpha():
+    rng = np.random.default_rng(0)
+    rate, meas = rng.normal(size=3000), rng.normal(size=3000)
+    for alpha in (0.2, 0.01, 0.5, 0.999):
+        fast = imu._complementary(0.3, rate, meas, 1e-3, alpha)
+        assert np.isfinite(fast).all()
+        np.testing.assert_allclose(fast, _recursive(0.3, rate, meas, 1e-3, alpha), rtol=1e-9, atol=1e-9)
+
+
+def test_complementary_alpha_zero_tracks_measurement():
+    meas = np.linspace(-1, 1, 10)
+    np.testing.assert_array_equal(imu._complementary(5.0, np.ones(10), meas, 1e-3, 0.0), meas)
+
+
+def _batch(t_us):
+    batch = np.zeros(len(t_us), dtype=imu.SAMPLE_DTYPE)
+    batch["t_us"] = t_us
+    batch["az"] = int(imu.ACCEL_LSB_PER_G)
+    return batch
+
+
+def test_single_sample_after_long_gap_is_clamped():
+    fusion = imu.AirMouseFusion()
+    fusion.process(_batch(np.arange(10) * 1000))
+    dt = fusion._times(np.array([9000 + 2_000_000], dtype=np.uint32))
+    assert dt.tolist() == [1e-3]
+    assert fusion.gaps == 1
+
+
+def test_slow_batches_are_capped_at_max_dt():
+    fusion = imu.AirMouseFusion(max_dt=0.05)
+    dt = fusion._times(np.arange(1, 5, dtype=np.uint32) * 200_000)
+    assert (dt <= 0.05).all()
+
+
+def _samples(n):
+    samples = np.zeros(n, dtype=imu.SAMPLE_DTYPE)
+    samples["t_us"] = np.arange(n) * 1000
+    samples["gz"] = np.arange(n)
+    return samples
+
+
+def test_udp_stream_delivers_batches_over_512_bytes():
+    from control_channel import UdpTransport
+
+    source = imu.open_imu_source("udp:127.0.0.1:0")
+    sender = UdpTransport(peer=("127.0.0.1", source.transport.port))
+    try:
+        for _ in range(3):
+            sender.send(imu.encode_batch(_samples(50)))
+        got = []
+        for batch in source.batches():
+            got.append(batch)
+            if len(got) == 3:
+                break
+        assert [len(b) for b in got] == [50] * 3
+        assert source.decoder.bad_batches == 0
+    finally:
+        sender.close()
+        source.close()
+
+
+def test_oversized_count_is_rejected_at_header():
+    good = imu.encode_batch(_samples(10))
+    false_header = imu.MAGIC + (imu.STREAM_MAX_BATCH + 1).to_bytes(2, "little")
+    decoder = imu.BatchDecoder(imu.STREAM_MAX_BATCH)
+    batches = decoder.feed(false_header + good)
+    assert [b["gz"].tolist() for b in batches] == [list(range(10))]
+    assert decoder.bad_batches == 1
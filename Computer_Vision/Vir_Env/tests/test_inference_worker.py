@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+
+import inference_worker as iw
+
+
+def _hung_worker(frame_name, result_name, slots, frame_shape, options, requests, done):
+    done.put(-1)  # Claims to be ready, then never answers
+    time.sleep(60)
+
+
+def _dead_worker(*args):
+    raise SystemExit(3)
+
+
+def test_hung_worker_falls_back_in_process_without_blocking(monkeypatch):
+    monkeypatch.setattr(iw, "_worker_main", _hung_worker)
+    detector = iw.ProcessDetector(outSize=(320, 240), timeout=0.2, first_timeout=0.3, backoff=30.0)
+    frame = np.zeros((240, 320, 3), np.uint8)
+    try:
+        detector.findHands(frame, draw=False)
+        start = time.monotonic()
+        detector.findHands(frame, draw=False)
+        assert time.monotonic() - start < 1.0  # In-process, no restart wait
+        stats = detector.workerStats()
+        assert (stats["timeouts"], stats["failures"], stats["restarts"]) == (1, 1, 0)
+        assert stats["fallbackFrames"] == 2 and not stats["alive"]
+    finally:
+        detector.close()
+
+
+def test_dead_worker_gives_up_after_max_restarts(monkeypatch):
+    monkeypatch.setattr(iw, "_worker_main", _dead_worker)
+    detector = iw.ProcessDetector(outSize=(320, 240), max_restarts=1, backoff=0.0)
+    frame = np.zeros((240, 320, 3), np.uint8)
+    try:
+        for _ in range(6):
+            detector.findHands(frame, draw=False)
+            if detector._process is not None:
+                detector._process.join(5)
+        stats = detector.workerStats()
+        assert stats["restarts"] == 1 and stats["failures"] == 2
+        assert stats["fallbackFrames"] == 6
+    finally:
+        detector.close()
+
+
+def _answering_worker(frame_name, result_name, slots, frame_shape, options, requests, done):
+    result_shm = iw.shared_memory.SharedMemory(name=result_name)
+    results = np.ndarray((slots,), dtype=iw.result_dtype(options["maxHands"]), buffer=result_shm.buf)
+    done.put(-1)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        seq, slot, _ = request
+        results[slot]["numHands"] = 0
+        results[slot]["seq"] = seq
+        done.put(seq)
+    del results
+    result_shm.close()
+
+
+def test_fallback_model_is_released_once_the_worker_is_back(monkeypatch):
+    monkeypatch.setattr(iw, "_worker_main", _dead_worker)
+    detector = iw.ProcessDetector(outSize=(320, 240), backoff=0.0)
+    frame = np.zeros((240, 320, 3), np.uint8)
+    try:
+        detector.findHands(frame, draw=False)
+        assert detector.hands is not None  # Detected in-process
+        monkeypatch.setattr(iw, "_worker_main", _answering_worker)
+        deadline = time.monotonic() + 30
+        while not detector._warm and time.monotonic() < deadline:
+            detector.findHands(frame, draw=False)
+        assert detector._warm
+        assert detector.hands is None
+    finally:
+        detector.close()